@@ -6,6 +6,7 @@ from aio_pika import connect, Message
 from config import Config
 from parts import Part
 from axies import Axie
+from retry import RetryQueues
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,6 +17,7 @@ logging.basicConfig(
 # Global variables
 db_connection = None
 axie_api_key = None
+retry_queues = None
 dependencies_lock = asyncio.Lock()
 dependencies_initialized = False
 
@@ -91,11 +93,17 @@ async def process_message(message: Message):
     except Exception as e:
         logging.error(f"Error processing message: {e}")
 
-        # Negative acknowledge and requeue the message for retry
-        await message.nack(requeue=True)
+        if retry_queues:
+            # The message is retried after a delay instead of being redelivered right away.
+            await retry_queues.retry(message, e)
+        else:
+            # Negative acknowledge and requeue the message for retry
+            await message.nack(requeue=True)
 
 
 async def store_axies():
+    global retry_queues
+
     # Ensure dependencies are initialized
     await init_dependencies()
 
@@ -108,6 +116,12 @@ async def store_axies():
             queue = await channel.declare_queue(
                 Config.get_rabbitmq_queue_axies_name(), durable=True
             )
+            retry_queues = RetryQueues(
+                channel,
+                Config.get_rabbitmq_queue_axies_name(),
+                Config.get_retry_delays(),
+            )
+            await retry_queues.declare()
 
             await queue.consume(process_message)
             await asyncio.Future()
@@ -3,6 +3,17 @@ import os
 from urllib.parse import quote_plus
 
 
+def get_int_env(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.critical(f"{name} is not a valid integer.")
+        raise ValueError(f"{name} environment variable must be an integer.")
+
+
 class Config:
     @staticmethod
     def get_rabbitmq_connection_string() -> str:
@@ -76,3 +87,16 @@ class Config:
         except Exception as e:
             logging.error("Error retrieving the Axie API key.")
             raise e
+
+    @staticmethod
+    def get_retry_delays() -> list[int]:
+        """
+        Seconds a failed message waits before each retry, growing exponentially from RETRY_BASE_DELAY.
+        The message is moved to the dead-letter queue after RETRY_MAX_ATTEMPTS retries.
+        """
+        base_delay = get_int_env("RETRY_BASE_DELAY", 5)
+        backoff_factor = get_int_env("RETRY_BACKOFF_FACTOR", 3)
+        return [
+            base_delay * backoff_factor**attempt
+            for attempt in range(get_int_env("RETRY_MAX_ATTEMPTS", 5))
+        ]
@@ -3,7 +3,14 @@ import asyncpg
 import asyncio
 import json
 from aio_pika import Message, connect
+from consumer import ConsumerEngine
+from http_session import create_http_session, get_http_pool_stats, get_request_timeout
+from outbox import OutboxRelay
+from publisher import get_publisher
 from transaction import Transaction
+from receipt_fetcher import ReceiptFetcher
+from retry import RetryQueues
+from rpc_pool import Endpoint, RPCProviderPool
 from sales import StoreSales
 from web3 import AsyncWeb3
 from config import Config
@@ -17,6 +24,9 @@ logging.basicConfig(
 # Global variables
 db_connection = None
 w3 = None
+http_session = None
+receipt_fetcher = None
+retry_queues = None
 dependencies_lock = asyncio.Lock()
 dependencies_initialized = False
 
@@ -26,7 +36,7 @@ async def init_dependencies():
     Initialize dependencies for the app.
     This function is called when the app starts.
     """
-    global db_connection, w3, dependencies_initialized
+    global db_connection, w3, http_session, receipt_fetcher, dependencies_initialized
 
     if dependencies_initialized:
         return
@@ -43,8 +53,8 @@ async def init_dependencies():
                 db_connection_string = await Config.get_pg_connection_string()
                 db_connection = await asyncpg.create_pool(
                     dsn=db_connection_string,
-                    min_size=1,
-                    max_size=10,
+                    min_size=Config.get_pg_pool_min_size(),
+                    max_size=Config.get_pg_pool_max_size(),
                 )
                 logging.info("PostgreSQL connection initialized.")
             except Exception as e:
@@ -54,12 +64,58 @@ async def init_dependencies():
         if not w3:
             # Initialize Web3 provider
             try:
-                w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(Config.get_node_provider()))
+                # Every node provider shares one keep-alive HTTP session with a limited number of connections.
+                http_session = create_http_session(
+                    limit=Config.get_http_pool_limit(),
+                    limit_per_host=Config.get_http_pool_limit_per_host(),
+                    keepalive_timeout=Config.get_http_keepalive_timeout(),
+                    dns_cache_ttl=Config.get_http_dns_cache_ttl(),
+                )
+                request_timeout = get_request_timeout(
+                    total=Config.get_http_request_timeout(),
+                    connect=Config.get_http_connect_timeout(),
+                )
+
+                node_providers = []
+                for node_provider_url in Config.get_node_providers():
+                    node_provider = AsyncWeb3.AsyncHTTPProvider(
+                        node_provider_url, request_kwargs={"timeout": request_timeout}
+                    )
+                    await node_provider.cache_async_session(http_session)
+                    node_providers.append(node_provider)
+
+                if len(node_providers) > 1:
+                    provider = RPCProviderPool(
+                        [
+                            Endpoint(
+                                node_provider,
+                                failure_threshold=Config.get_rpc_circuit_failure_threshold(),
+                                reset_timeout=Config.get_rpc_circuit_reset_timeout(),
+                            )
+                            for node_provider in node_providers
+                        ],
+                        hedge=Config.get_rpc_hedge_enabled(),
+                    )
+                    # The pool retries a failed request on another node, so the providers don't retry it.
+                    for node_provider in node_providers:
+                        node_provider.exception_retry_configuration = None
+                else:
+                    provider = node_providers[0]
+                w3 = AsyncWeb3(provider)
                 logging.info("Web3 provider initialized.")
             except Exception as e:
                 logging.error(f"Error initializing Web3 provider: {e}")
                 raise e
 
+        if not receipt_fetcher and Config.get_receipt_batch_window_ms() > 0:
+            # The receipts of the messages processed concurrently are fetched together.
+            receipt_fetcher = ReceiptFetcher(
+                w3,
+                batch_window=Config.get_receipt_batch_window_ms() / 1000,
+                max_batch_size=Config.get_receipt_batch_max_size(),
+            )
+            logging.info("Receipt fetcher initialized.")
+
         dependencies_initialized = True
 
 
@@ -72,16 +128,76 @@ async def process_message(message: Message):
 
     try:
         message_body = json.loads(message.body.decode("utf-8"))
-        transaction_hash = message_body["transactionHash"]
-        block_number = message_body["blockNumber"]
-        block_timestamp = message_body["blockTimestamp"]
 
-        # Call Transaction class to get the sales list from a transaction hash.
-        sales_list = await Transaction(db_connection, w3).process_logs(transaction_hash)
+        if "transactionHashes" in message_body:
+            # Block-level message, with every transaction of the block.
+            await process_block(message_body)
+        else:
+            await process_transaction(message_body)
+
+        # Acknowledge the message after successful processing.
+        await message.ack()
+
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+
+        if retry_queues:
+            # The message is retried after a delay instead of being redelivered right away.
+            await retry_queues.retry(message, e)
+        else:
+            # Negative acknowledge and requeue the message for retry
+            await message.nack(requeue=True)
 
-        # Call the StoreSales class to store the sales in the database and send message to the axies topic.
-        if sales_list:
-            await StoreSales(
+
+async def process_transaction(message_body: dict):
+    """
+    Process a message with a single transaction.
+    """
+    transaction_hash = message_body["transactionHash"]
+    block_number = message_body["blockNumber"]
+    block_timestamp = message_body["blockTimestamp"]
+
+    # Call Transaction class to get the sales list from a transaction hash.
+    sales_list = await Transaction(
+        db_connection, w3, receipt_fetcher=receipt_fetcher
+    ).process_logs(transaction_hash, block_number)
+
+    # Call the StoreSales class to store the sales in the database and send message to the axies topic.
+    if sales_list:
+        await StoreSales(
+            db_connection,
+            rabbitmq_connection=Config.get_rabbitmq_connection_string(),
+            rabbitmq_axies_queue_name=Config.get_rabbitmq_queue_axies_name(),
+            sales_list=sales_list,
+            block_number=block_number,
+            block_timestamp=block_timestamp,
+            transaction_hash=transaction_hash,
+            outbox=Config.get_outbox_enabled(),
+        ).add_to_db()
+    else:
+        logging.info("Sales list is empty.")
+
+    logging.info(
+        f"All sales of transaction {transaction_hash} have been processed successfully."
+    )
+
+
+async def process_block(message_body: dict):
+    """
+    Process a message with all the transactions of a block.
+    The receipts are fetched in one call and the sales are stored in one DB transaction.
+    """
+    block_number = message_body["blockNumber"]
+    block_timestamp = message_body["blockTimestamp"]
+
+    sales_by_transaction = await Transaction(
+        db_connection, w3, receipt_fetcher=receipt_fetcher
+    ).process_block(block_number, message_body["transactionHashes"])
+
+    await StoreSales.add_block_to_db(
+        db_connection,
+        [
+            StoreSales(
                 db_connection,
                 rabbitmq_connection=Config.get_rabbitmq_connection_string(),
                 rabbitmq_axies_queue_name=Config.get_rabbitmq_queue_axies_name(),
@@ -89,44 +205,151 @@ async def process_message(message: Message):
                 block_number=block_number,
                 block_timestamp=block_timestamp,
                 transaction_hash=transaction_hash,
-            ).add_to_db()
-        else:
-            logging.info("Sales list is empty.")
+                outbox=Config.get_outbox_enabled(),
+            )
+            for transaction_hash, sales_list in sales_by_transaction.items()
+            if sales_list
+        ],
+    )
 
-        logging.info(
-            f"All sales of transaction {transaction_hash} have been processed successfully."
+    logging.info(
+        f"All sales of the {len(sales_by_transaction)} transactions of block {block_number} have been processed successfully."
+    )
+
+
+async def process_batch(messages: list[Message]):
+    """
+    Process a batch of messages together.
+    The transactions are processed concurrently, their sales are stored with one bulk insert and the axies messages
+    are sent in one batch, then the whole batch is acknowledged at once.
+    If the batch fails, its messages are processed one by one so a failing message doesn't hold back the others.
+    """
+    try:
+        message_bodies = [
+            json.loads(message.body.decode("utf-8")) for message in messages
+        ]
+        sales_by_message = await asyncio.gather(
+            *[get_message_sales(message_body) for message_body in message_bodies]
         )
 
-        # Acknowledge the message after successful processing.
-        await message.ack()
+        # A transaction delivered twice in the batch is stored once.
+        store_sales_by_transaction = {}
+        for message_body, sales_by_transaction in zip(message_bodies, sales_by_message):
+            for transaction_hash, sales_list in sales_by_transaction.items():
+                if sales_list:
+                    store_sales_by_transaction[transaction_hash] = StoreSales(
+                        db_connection,
+                        rabbitmq_connection=Config.get_rabbitmq_connection_string(),
+                        rabbitmq_axies_queue_name=Config.get_rabbitmq_queue_axies_name(),
+                        sales_list=sales_list,
+                        block_number=message_body["blockNumber"],
+                        block_timestamp=message_body["blockTimestamp"],
+                        transaction_hash=transaction_hash,
+                        outbox=Config.get_outbox_enabled(),
+                    )
+
+        await StoreSales.add_block_to_db(
+            db_connection, list(store_sales_by_transaction.values())
+        )
+
+        # The last message has the highest delivery tag of the batch, acknowledging it acknowledges the whole batch.
+        await messages[-1].ack(multiple=True)
+        logging.info(
+            f"All sales of the batch of {len(messages)} messages have been processed successfully."
+        )
 
     except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+        logging.error(
+            f"An unexpected error occurred while processing a batch of {len(messages)} messages, processing them one by one: {e}"
+        )
+        for message in messages:
+            await process_message(message)
+
 
-        # Negative acknowledge and requeue the message for retry
-        await message.nack(requeue=True)
+async def get_message_sales(message_body: dict) -> dict:
+    """
+    Returns the sales of each transaction of a message, by transaction hash.
+    """
+    block_number = message_body["blockNumber"]
+
+    if "transactionHashes" in message_body:
+        return await Transaction(
+            db_connection, w3, receipt_fetcher=receipt_fetcher
+        ).process_block(block_number, message_body["transactionHashes"])
+
+    transaction_hash = message_body["transactionHash"]
+    sales_list = await Transaction(
+        db_connection, w3, receipt_fetcher=receipt_fetcher
+    ).process_logs(transaction_hash, block_number)
+    return {transaction_hash: sales_list}
 
 
 async def store_axie_sales():
+    global retry_queues
+
     # Ensure dependencies are initialized
     await init_dependencies()
 
+    # The outbox relay sends the axies messages written to the outbox with the sales.
+    outbox_relay = None
+    if Config.get_outbox_enabled():
+        outbox_relay = OutboxRelay(
+            db_connection,
+            get_publisher(
+                Config.get_rabbitmq_connection_string(),
+                Config.get_rabbitmq_queue_axies_name(),
+            ),
+            batch_size=Config.get_outbox_batch_size(),
+            interval=Config.get_outbox_relay_interval_ms() / 1000,
+        )
+        outbox_relay.start()
+
     try:
         connection = await connect(Config.get_rabbitmq_connection_string())
         async with connection:
             channel = await connection.channel()
-            await channel.set_qos(prefetch_count=5)  # Process 5 messages at a time.
+            await channel.set_qos(prefetch_count=Config.get_consumer_prefetch_count())
 
             queue = await channel.declare_queue(
                 Config.get_rabbitmq_queue_sales_name(), durable=True
             )
+            retry_queues = RetryQueues(
+                channel,
+                Config.get_rabbitmq_queue_sales_name(),
+                Config.get_retry_delays(),
+            )
+            await retry_queues.declare()
 
-            await queue.consume(process_message)
-            await asyncio.Future()  # Keep the connection open for consuming messages.
+            # The worker tasks keep the connection open for consuming messages.
+            # In micro-batching mode, the messages are processed in batches instead of one by one.
+            batch_size = Config.get_consumer_batch_size()
+            await ConsumerEngine(
+                process_batch if batch_size > 0 else process_message,
+                concurrency=Config.get_consumer_concurrency(),
+                gauge_interval=Config.get_consumer_gauge_interval(),
+                gauges=get_gauges(),
+                batch_size=batch_size,
+                batch_window=Config.get_consumer_batch_window_ms() / 1000,
+            ).consume(queue)
 
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
         raise e
+    finally:
+        if outbox_relay is not None:
+            await outbox_relay.stop()
+        if http_session is not None:
+            await http_session.close()
+
+
+def get_gauges() -> dict:
+    """
+    Returns the gauges of the node connections reported with the gauges of the consumer.
+    """
+    gauges = {"http_pool": lambda: get_http_pool_stats(http_session)}
+    if isinstance(w3.provider, RPCProviderPool):
+        gauges["rpc_pool"] = w3.provider.get_stats
+    return gauges
 
 
 if __name__ == "__main__":
@@ -0,0 +1,265 @@
+"""
+Backfill of the Axie sales of a block range, to fill the gaps the webhooks missed.
+
+The range is scanned with eth_getLogs for the Transfer logs of the Axie proxy contract, in chunks processed
+in parallel. The sales of the transactions found are decoded from their block receipts and go through the
+same bulk insert and publish path as the messages of the sales queue.
+The progress is saved in the sales_backfill_checkpoints table, a stopped backfill resumes where it left off.
+
+Usage:
+    python backfill.py --from-block 44000000 --to-block 44100000 [--chunk-size 2000] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import asyncpg
+import logging
+from datetime import datetime, timezone
+from web3 import AsyncWeb3, Web3
+import app
+from config import Config
+from publisher import publishers
+from sales import StoreSales
+from stages import RPC_STAGE, stage_limiter
+from transaction import AXIE_PROXY_ADDRESS, Transaction
+
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+
+
+class Backfill:
+    """
+    Scans a block range in chunks with eth_getLogs and stores the sales found, with a checkpoint after each chunk.
+    The chunk size adapts to the node: it is halved when a range fails, often because it has too many logs,
+    and doubled after a successful range, between min_chunk_size and max_chunk_size.
+    """
+
+    def __init__(
+        self,
+        conn: asyncpg.Pool,
+        w3: AsyncWeb3,
+        from_block: int,
+        to_block: int,
+        name: str | None = None,
+        chunk_size: int = 2000,
+        min_chunk_size: int = 1,
+        max_chunk_size: int = 10000,
+        concurrency: int = 4,
+    ):
+        self.__conn = conn
+        self.__w3 = w3
+        self.__from_block = from_block
+        self.__to_block = to_block
+        # The default name doesn't depend on to_block, which defaults to the latest block,
+        # so a backfill run again without --to-block resumes from its checkpoint.
+        self.__name = name or f"{AXIE_PROXY_ADDRESS}-{from_block}"
+        self.__chunk_size = chunk_size
+        self.__min_chunk_size = min_chunk_size
+        self.__max_chunk_size = max_chunk_size
+        self.__concurrency = concurrency
+        # The next block to scan, and the first block not yet stored. The chunks end in any order,
+        # so the checkpoint only moves forward once every chunk before it is done.
+        self.__next_block = from_block
+        self.__checkpoint = from_block
+        self.__completed_ranges: dict[int, int] = {}
+        self.__sales_count = 0
+
+    async def run(self) -> int:
+        """
+        Scans the range from its checkpoint and returns the number of sales found.
+        """
+        self.__next_block = self.__checkpoint = await self.__load_checkpoint()
+        if self.__next_block > self.__to_block:
+            logging.info(f"[run] Backfill {self.__name} is already done.")
+            return 0
+
+        logging.info(
+            f"[run] Backfilling blocks {self.__next_block} to {self.__to_block} with {self.__concurrency} workers."
+        )
+        # If a worker fails, the task group cancels the others.
+        async with asyncio.TaskGroup() as task_group:
+            for _ in range(self.__concurrency):
+                task_group.create_task(self.__worker())
+        logging.info(
+            f"[run] Backfill {self.__name} is done, {self.__sales_count} sales were found."
+        )
+        return self.__sales_count
+
+    async def __worker(self) -> None:
+        while self.__next_block <= self.__to_block:
+            start = self.__next_block
+            end = min(start + self.__chunk_size - 1, self.__to_block)
+            self.__next_block = end + 1
+
+            await self.__scan_range(start, end)
+
+    async def __scan_range(self, start: int, end: int) -> None:
+        try:
+            async with stage_limiter.stage(RPC_STAGE):
+                logs = await self.__w3.eth.get_logs(
+                    {
+                        "address": Web3.to_checksum_address(AXIE_PROXY_ADDRESS),
+                        "topics": [TRANSFER_TOPIC],
+                        "fromBlock": start,
+                        "toBlock": end,
+                    }
+                )
+        except Exception as e:
+            if end - start + 1 <= self.__min_chunk_size:
+                logging.error(
+                    f"[__scan_range] An unexpected error occured while getting the logs of blocks {start} to {end}: {e}"
+                )
+                raise e
+
+            # The range is split in two, and the next chunks are smaller.
+            self.__chunk_size = max(self.__min_chunk_size, (end - start + 1) // 2)
+            logging.warning(
+                f"[__scan_range] Getting the logs of blocks {start} to {end} failed, splitting the range: {e}"
+            )
+            middle = start + (end - start) // 2
+            await self.__scan_range(start, middle)
+            await self.__scan_range(middle + 1, end)
+            return
+
+        self.__chunk_size = min(self.__max_chunk_size, self.__chunk_size * 2)
+        await self.__store_sales(logs)
+        await self.__complete_range(start, end)
+
+    async def __store_sales(self, logs: list) -> None:
+        """
+        Decodes the sales of the transactions of the logs and stores them all with one bulk insert.
+        """
+        # {block number: transaction hashes}, in the order of the logs.
+        transactions_by_block: dict[int, dict[str, None]] = {}
+        for log in logs:
+            transactions_by_block.setdefault(log["blockNumber"], {})[
+                Web3.to_hex(log["transactionHash"])
+            ] = None
+
+        store_sales_by_block = await asyncio.gather(
+            *[
+                self.__get_block_sales(block_number, list(transaction_hashes))
+                for block_number, transaction_hashes in transactions_by_block.items()
+            ]
+        )
+        store_sales_list = [
+            store_sales
+            for block_store_sales in store_sales_by_block
+            for store_sales in block_store_sales
+        ]
+        await StoreSales.add_block_to_db(self.__conn, store_sales_list)
+
+    async def __get_block_sales(
+        self, block_number: int, transaction_hashes: list
+    ) -> list:
+        sales_by_transaction = await Transaction(self.__conn, self.__w3).process_block(
+            block_number, transaction_hashes
+        )
+        if not any(sales_by_transaction.values()):
+            return []
+        self.__sales_count += sum(
+            len(sales_list) for sales_list in sales_by_transaction.values()
+        )
+
+        # The sale date is the timestamp of the block, which the logs don't have.
+        async with stage_limiter.stage(RPC_STAGE):
+            block = await self.__w3.eth.get_block(block_number)
+
+        return [
+            StoreSales(
+                self.__conn,
+                rabbitmq_connection=Config.get_rabbitmq_connection_string(),
+                rabbitmq_axies_queue_name=Config.get_rabbitmq_queue_axies_name(),
+                sales_list=sales_list,
+                block_number=block_number,
+                block_timestamp=block["timestamp"],
+                transaction_hash=transaction_hash,
+                outbox=Config.get_outbox_enabled(),
+            )
+            for transaction_hash, sales_list in sales_by_transaction.items()
+            if sales_list
+        ]
+
+    async def __complete_range(self, start: int, end: int) -> None:
+        self.__completed_ranges[start] = end
+        checkpoint = self.__checkpoint
+        while checkpoint in self.__completed_ranges:
+            checkpoint = self.__completed_ranges.pop(checkpoint) + 1
+
+        if checkpoint != self.__checkpoint:
+            self.__checkpoint = checkpoint
+            await self.__save_checkpoint()
+
+    async def __load_checkpoint(self) -> int:
+        next_block = await self.__conn.fetchval(
+            "SELECT next_block FROM sales_backfill_checkpoints WHERE name = $1",
+            self.__name,
+        )
+        if next_block is not None:
+            logging.info(
+                f"[__load_checkpoint] Resuming backfill {self.__name} from block {next_block}."
+            )
+            return next_block
+        return self.__from_block
+
+    async def __save_checkpoint(self) -> None:
+        await self.__conn.execute(
+            """
+            INSERT INTO sales_backfill_checkpoints(name, from_block, to_block, next_block, updated_at)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (name) DO UPDATE
+            SET to_block = EXCLUDED.to_block, next_block = EXCLUDED.next_block, updated_at = EXCLUDED.updated_at
+            """,
+            self.__name,
+            self.__from_block,
+            self.__to_block,
+            self.__checkpoint,
+            datetime.now(timezone.utc),
+        )
+        logging.info(
+            f"[__save_checkpoint] Backfill {self.__name} stored every sale before block {self.__checkpoint}."
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--from-block", type=int, required=True)
+    parser.add_argument(
+        "--to-block", type=int, default=None, help="Defaults to the latest block."
+    )
+    parser.add_argument(
+        "--name",
+        default=None,
+        help="Name of the checkpoint, defaults to <contract address>-<from-block>.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--max-chunk-size", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    await app.init_dependencies()
+    try:
+        to_block = args.to_block
+        if to_block is None:
+            to_block = await app.w3.eth.block_number
+
+        await Backfill(
+            app.db_connection,
+            app.w3,
+            args.from_block,
+            to_block,
+            name=args.name,
+            chunk_size=args.chunk_size,
+            max_chunk_size=args.max_chunk_size,
+            concurrency=args.concurrency,
+        ).run()
+    finally:
+        for publisher in publishers.values():
+            await publisher.close()
+        await app.http_session.close()
+        await app.db_connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
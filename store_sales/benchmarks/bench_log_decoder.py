@@ -0,0 +1,176 @@
+"""
+Micro-benchmark of the sales extraction from a receipt: previous per-log ABI path vs the precompiled Transfer decoder.
+
+The recorded receipts in benchmarks/receipts are replayed with their logs repeated to get multi-sale receipts.
+The contracts are built from the WETH (ERC20) and Axie (ERC721) Transfer events without a database or a node.
+
+Usage: python benchmarks/bench_log_decoder.py [--sales 1 5 20 100] [--repeat 200]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+BENCHMARKS_DIRECTORY = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIRECTORY.parent))
+
+from contract import Contract  # noqa: E402
+from transaction import Transaction  # noqa: E402
+
+WETH_CONTRACT_ADDRESS = "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5"
+AXIE_CONTRACT_ADDRESS = "0x32950db2a7164ae833121501c797d79e7b79d74c"
+
+
+def create_contract(contract_address: str, names: list[str], indexed: list[bool]):
+    abi = [
+        {
+            "anonymous": False,
+            "inputs": [
+                {"indexed": is_indexed, "name": name, "type": input_type}
+                for is_indexed, name, input_type in zip(
+                    indexed, names, ["address", "address", "uint256"]
+                )
+            ],
+            "name": "Transfer",
+            "type": "event",
+        }
+    ]
+
+    contract = Contract(None, Web3(), contract_address)
+    contract._Contract__is_proxy = False
+    contract._Contract__abi = abi
+    contract._Contract__events_by_topic = {
+        Web3.to_hex(event_abi_to_log_topic(abi[0])): "Transfer"
+    }
+    contract._Contract__contract = contract._Contract__w3.eth.contract(
+        address=contract._Contract__contract_address, abi=abi
+    )
+    return contract
+
+
+def load_log(log: dict) -> AttributeDict:
+    return AttributeDict(
+        {
+            **log,
+            "topics": [HexBytes(topic) for topic in log["topics"]],
+            "data": HexBytes(log["data"]),
+            "transactionHash": HexBytes(log["transactionHash"]),
+            "blockHash": HexBytes(log["blockHash"]),
+        }
+    )
+
+
+def load_receipts(sales: int) -> list[AttributeDict]:
+    receipts = []
+    for path in sorted((BENCHMARKS_DIRECTORY / "receipts").glob("*.json")):
+        receipt = json.loads(path.read_text())
+        receipts.append(
+            AttributeDict(
+                {
+                    **receipt,
+                    "logs": [load_log(log) for log in receipt["logs"]] * sales,
+                }
+            )
+        )
+    return receipts
+
+
+def previous_get_sales(receipt, weth_contract, axie_proxy_contract) -> list:
+    """
+    Sales extraction before the Transfer decoder, every log is checksummed and decoded with the ABI.
+    """
+    recipient = receipt["to"]
+    weth_contract_address = weth_contract.get_contract_address()
+    weth_transfer_signature_hash = weth_contract.get_event_signature_hash("Transfer")
+    axie_proxy_contract_address = axie_proxy_contract.get_contract_address()
+    axie_transfer_signature_hash = axie_proxy_contract.get_event_signature_hash(
+        "Transfer"
+    )
+
+    prices = []
+    axies = []
+    for log in receipt["logs"]:
+        topic = f"0x{log['topics'][0].hex()}"
+        if (
+            Web3.to_checksum_address(log["address"]) == weth_contract_address
+            and topic == weth_transfer_signature_hash
+        ):
+            event_data = weth_contract.get_event_data(topic, log)
+            if event_data["args"]["_to"] == recipient:
+                if len(prices) > len(axies):
+                    prices.pop()
+                prices.append(
+                    float(Web3.from_wei(event_data["args"]["_value"], "ether"))
+                )
+        elif (
+            Web3.to_checksum_address(log["address"]) == axie_proxy_contract_address
+            and topic == axie_transfer_signature_hash
+        ):
+            event_data = axie_proxy_contract.get_event_data(topic, log)
+            axies.append(event_data["args"]["_tokenId"])
+
+    if len(prices) > len(axies):
+        prices.pop()
+    return [
+        {"price_weth": price, "axie_id": axie_id}
+        for price, axie_id in zip(prices, axies)
+    ]
+
+
+def measure(function, receipts, repeat: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for receipt in receipts:
+            function(receipt)
+    return (time.perf_counter() - start_time) / (repeat * len(receipts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sales", type=int, nargs="+", default=[1, 5, 20, 100])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # Both paths log every sale, which would dominate the measurements.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    weth_contract = create_contract(
+        WETH_CONTRACT_ADDRESS, ["_from", "_to", "_value"], [True, True, False]
+    )
+    axie_contract = create_contract(
+        AXIE_CONTRACT_ADDRESS, ["_from", "_to", "_tokenId"], [True, True, True]
+    )
+    get_sales = Transaction(None, None)._Transaction__get_sales
+
+    print(f"{'sales':>6} {'previous (us)':>14} {'current (us)':>13} {'speedup':>8}")
+    for sales in args.sales:
+        receipts = load_receipts(sales)
+        for receipt in receipts:
+            assert previous_get_sales(
+                receipt, weth_contract, axie_contract
+            ) == get_sales(receipt, weth_contract, axie_contract)
+
+        previous = measure(
+            lambda receipt: previous_get_sales(receipt, weth_contract, axie_contract),
+            receipts,
+            args.repeat,
+        )
+        current = measure(
+            lambda receipt: get_sales(receipt, weth_contract, axie_contract),
+            receipts,
+            args.repeat,
+        )
+        print(
+            f"{sales:>6} {previous * 1e6:>14.1f} {current * 1e6:>13.1f} {previous / current:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,24 @@ import os
 from urllib.parse import quote_plus
 
 
+def get_int_env(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.critical(f"{name} is not a valid integer.")
+        raise ValueError(f"{name} environment variable must be an integer.")
+
+
+def get_bool_env(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+
 class Config:
     @staticmethod
     def get_rabbitmq_connection_string() -> str:
@@ -79,3 +97,205 @@ class Config:
             logging.critical("NODE_PROVIDER is not set.")
             raise ValueError("NODE_PROVIDER environment variable is required.")
         return node_provider_url
+
+    @staticmethod
+    def get_node_providers() -> list[str]:
+        """
+        URLs of the node endpoints of the provider pool, comma-separated in NODE_PROVIDERS.
+        Without NODE_PROVIDERS, only NODE_PROVIDER is used.
+        """
+        node_provider_urls = os.getenv("NODE_PROVIDERS")
+        if not node_provider_urls:
+            return [Config.get_node_provider()]
+        return [url.strip() for url in node_provider_urls.split(",") if url.strip()]
+
+    @staticmethod
+    def get_rpc_hedge_enabled() -> bool:
+        return get_bool_env("RPC_HEDGE_ENABLED", False)
+
+    @staticmethod
+    def get_rpc_circuit_failure_threshold() -> int:
+        return get_int_env("RPC_CIRCUIT_FAILURE_THRESHOLD", 5)
+
+    @staticmethod
+    def get_rpc_circuit_reset_timeout() -> int:
+        return get_int_env("RPC_CIRCUIT_RESET_TIMEOUT", 30)
+
+    @staticmethod
+    def get_pg_pool_min_size() -> int:
+        return get_int_env("PG_POOL_MIN_SIZE", 1)
+
+    @staticmethod
+    def get_pg_pool_max_size() -> int:
+        return get_int_env("PG_POOL_MAX_SIZE", 10)
+
+    @staticmethod
+    def get_contract_cache_ttl() -> int:
+        """
+        Seconds a contract stays in the contract registry, 0 keeps it until it is invalidated.
+        """
+        return get_int_env("CONTRACT_CACHE_TTL", 3600)
+
+    @staticmethod
+    def get_contract_advisory_lock_enabled() -> bool:
+        """
+        When enabled, the replicas take a Postgres advisory lock before fetching a contract that is not in the database.
+        """
+        return get_bool_env("CONTRACT_ADVISORY_LOCK", False)
+
+    @staticmethod
+    def get_receipt_batch_window_ms() -> int:
+        """
+        Milliseconds the receipts requested by concurrent messages are collected before being fetched together, 0 disables the batching.
+        """
+        return get_int_env("RECEIPT_BATCH_WINDOW_MS", 10)
+
+    @staticmethod
+    def get_receipt_batch_max_size() -> int:
+        return get_int_env("RECEIPT_BATCH_MAX_SIZE", 100)
+
+    @staticmethod
+    def get_receipt_cache_size() -> int:
+        """
+        Receipts kept in memory, 0 disables the in-memory cache.
+        """
+        return get_int_env("RECEIPT_CACHE_SIZE", 10000)
+
+    @staticmethod
+    def get_receipt_cache_path() -> str | None:
+        """
+        File of the on-disk receipt store, which is disabled when it is not set.
+        """
+        return os.getenv("RECEIPT_CACHE_PATH") or None
+
+    @staticmethod
+    def get_receipt_cache_disk_size_mb() -> int:
+        return get_int_env("RECEIPT_CACHE_DISK_SIZE_MB", 256)
+
+    @staticmethod
+    def get_receipt_cache_confirmations() -> int:
+        """
+        Blocks a receipt's block must be behind the highest block seen before the receipt is cached.
+        The default is about a minute of Ronin blocks, well past their finality.
+        """
+        return get_int_env("RECEIPT_CACHE_CONFIRMATIONS", 20)
+
+    @staticmethod
+    def get_consumer_concurrency() -> int:
+        """
+        Number of worker tasks, each processing one message at a time.
+        """
+        return get_int_env("CONSUMER_CONCURRENCY", 5)
+
+    @staticmethod
+    def get_consumer_prefetch_count() -> int:
+        """
+        Messages RabbitMQ delivers before they are acknowledged, twice the concurrency by default so a worker never waits for a delivery.
+        In micro-batching mode, it is twice the batch size by default so the next batch is delivered while one is processed.
+        """
+        if Config.get_consumer_batch_size() > 0:
+            return get_int_env(
+                "CONSUMER_PREFETCH_COUNT", Config.get_consumer_batch_size() * 2
+            )
+        return get_int_env(
+            "CONSUMER_PREFETCH_COUNT", Config.get_consumer_concurrency() * 2
+        )
+
+    @staticmethod
+    def get_consumer_batch_size() -> int:
+        """
+        Maximum number of messages processed together in micro-batching mode, 0 processes each message alone.
+        """
+        return get_int_env("CONSUMER_BATCH_SIZE", 0)
+
+    @staticmethod
+    def get_consumer_batch_window_ms() -> int:
+        """
+        Milliseconds a batch waits for more messages after its first one.
+        """
+        return get_int_env("CONSUMER_BATCH_WINDOW_MS", 50)
+
+    @staticmethod
+    def get_consumer_gauge_interval() -> int:
+        """
+        Seconds between two reports of the in-flight gauges, 0 disables the reports.
+        """
+        return get_int_env("CONSUMER_GAUGE_INTERVAL", 60)
+
+    @staticmethod
+    def get_rpc_concurrency() -> int:
+        return get_int_env("RPC_CONCURRENCY", 10)
+
+    @staticmethod
+    def get_db_concurrency() -> int:
+        return get_int_env("DB_CONCURRENCY", Config.get_pg_pool_max_size())
+
+    @staticmethod
+    def get_publish_concurrency() -> int:
+        return get_int_env("PUBLISH_CONCURRENCY", 10)
+
+    @staticmethod
+    def get_rabbitmq_channel_pool_size() -> int:
+        return get_int_env("RABBITMQ_CHANNEL_POOL_SIZE", 4)
+
+    @staticmethod
+    def get_rabbitmq_publish_timeout() -> int:
+        return get_int_env("RABBITMQ_PUBLISH_TIMEOUT", 10)
+
+    @staticmethod
+    def get_outbox_enabled() -> bool:
+        """
+        Writes the axies messages to the outbox table in the DB transaction of the sales, instead of sending them directly.
+        """
+        return get_bool_env("OUTBOX_ENABLED", False)
+
+    @staticmethod
+    def get_outbox_batch_size() -> int:
+        return get_int_env("OUTBOX_BATCH_SIZE", 500)
+
+    @staticmethod
+    def get_outbox_relay_interval_ms() -> int:
+        return get_int_env("OUTBOX_RELAY_INTERVAL_MS", 500)
+
+    @staticmethod
+    def get_retry_delays() -> list[int]:
+        """
+        Seconds a failed message waits before each retry, growing exponentially from RETRY_BASE_DELAY.
+        The message is moved to the dead-letter queue after RETRY_MAX_ATTEMPTS retries.
+        """
+        base_delay = get_int_env("RETRY_BASE_DELAY", 5)
+        backoff_factor = get_int_env("RETRY_BACKOFF_FACTOR", 3)
+        return [
+            base_delay * backoff_factor**attempt
+            for attempt in range(get_int_env("RETRY_MAX_ATTEMPTS", 5))
+        ]
+
+    @staticmethod
+    def get_http_pool_limit() -> int:
+        return get_int_env("HTTP_POOL_LIMIT", 100)
+
+    @staticmethod
+    def get_http_pool_limit_per_host() -> int:
+        """
+        Connections open at the same time to each node provider, the other requests wait for a free connection.
+        """
+        return get_int_env("HTTP_POOL_LIMIT_PER_HOST", 20)
+
+    @staticmethod
+    def get_http_keepalive_timeout() -> int:
+        """
+        Seconds an idle connection is kept open for the next request.
+        """
+        return get_int_env("HTTP_KEEPALIVE_TIMEOUT", 30)
+
+    @staticmethod
+    def get_http_dns_cache_ttl() -> int:
+        return get_int_env("HTTP_DNS_CACHE_TTL", 300)
+
+    @staticmethod
+    def get_http_request_timeout() -> int:
+        return get_int_env("HTTP_REQUEST_TIMEOUT", 30)
+
+    @staticmethod
+    def get_http_connect_timeout() -> int:
+        return get_int_env("HTTP_CONNECT_TIMEOUT", 5)
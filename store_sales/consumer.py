@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from aio_pika.abc import AbstractIncomingMessage, AbstractQueue
+from stages import StageLimiter, stage_limiter
+
+
+class ConsumerEngine:
+    """
+    Consumes a queue with a fixed number of worker tasks.
+    The messages delivered by RabbitMQ, up to its prefetch count, wait in an internal queue until a worker is free.
+    Every gauge_interval seconds, it logs the messages in flight and queued, the operations of each stage
+    and the value of each of the gauges callables.
+
+    With a batch_size, it runs in micro-batching mode instead: a single worker collects up to batch_size messages,
+    or the messages delivered within batch_window seconds of the first one, and passes them to the handler as a list.
+    The batches are processed one at a time, so the handler can acknowledge a whole batch with one multiple ack.
+    """
+
+    def __init__(
+        self,
+        handler,
+        concurrency: int = 5,
+        gauge_interval: float = 60,
+        limiter: StageLimiter = stage_limiter,
+        gauges: dict | None = None,
+        batch_size: int = 0,
+        batch_window: float = 0.05,
+    ):
+        self.__handler = handler
+        self.__concurrency = concurrency
+        self.__gauge_interval = gauge_interval
+        self.__limiter = limiter
+        self.__gauges = gauges or {}
+        self.__batch_size = batch_size
+        self.__batch_window = batch_window
+        self.__messages: asyncio.Queue[AbstractIncomingMessage] = asyncio.Queue()
+        self.__in_flight = 0
+
+    def in_flight(self) -> dict[str, int]:
+        """
+        Returns the messages being processed and waiting for a worker, and the operations in flight of each stage.
+        """
+        return {
+            "messages": self.__in_flight,
+            "queued": self.__messages.qsize(),
+            **self.__limiter.in_flight(),
+        }
+
+    async def consume(self, queue: AbstractQueue) -> None:
+        """
+        Consumes the queue until the task is cancelled.
+        """
+        if self.__batch_size > 0:
+            tasks = [asyncio.create_task(self.__batch_worker())]
+            logging.info(
+                f"[consume] Consuming in batches of up to {self.__batch_size} messages."
+            )
+        else:
+            tasks = [
+                asyncio.create_task(self.__worker()) for _ in range(self.__concurrency)
+            ]
+            logging.info(f"[consume] Consuming with {self.__concurrency} workers.")
+        if self.__gauge_interval > 0:
+            tasks.append(asyncio.create_task(self.__report_gauges()))
+
+        try:
+            await queue.consume(self.__messages.put)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def __worker(self) -> None:
+        while True:
+            message = await self.__messages.get()
+            self.__in_flight += 1
+            try:
+                await self.__handler(message)
+            except Exception as e:
+                # The handler acknowledges the message, an error must not stop the worker.
+                logging.error(f"[__worker] An unexpected error occurred: {e}")
+            finally:
+                self.__in_flight -= 1
+                self.__messages.task_done()
+
+    async def __batch_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            messages = [await self.__messages.get()]
+            deadline = loop.time() + self.__batch_window
+            while len(messages) < self.__batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    messages.append(
+                        await asyncio.wait_for(self.__messages.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            self.__in_flight += len(messages)
+            try:
+                await self.__handler(messages)
+            except Exception as e:
+                # The handler acknowledges the messages, an error must not stop the worker.
+                logging.error(f"[__batch_worker] An unexpected error occurred: {e}")
+            finally:
+                self.__in_flight -= len(messages)
+                for _ in messages:
+                    self.__messages.task_done()
+
+    async def __report_gauges(self) -> None:
+        while True:
+            await asyncio.sleep(self.__gauge_interval)
+            waiting = self.__limiter.waiting()
+            logging.info(
+                f"[__report_gauges] In flight: {self.in_flight()}, waiting for a stage: {waiting}"
+            )
+            for name, gauge in self.__gauges.items():
+                logging.info(f"[__report_gauges] {name}: {gauge()}")
@@ -1,9 +1,11 @@
+import asyncio
 import asyncpg
 import logging
 import aiohttp
-import ast
+import json
 from asyncpg.exceptions import UniqueViolationError
 from datetime import datetime, timezone
+from eth_utils import event_abi_to_log_topic
 from web3 import Web3, AsyncWeb3
 from web3.exceptions import Web3ValueError
 
@@ -25,6 +27,9 @@ class Contract:
     Represents a smart contract and provides methods to interact with it.
     """
 
+    # {checksum address: task creating the contract}, shared by the concurrent calls to create for the same address.
+    __pending_creations: dict[str, asyncio.Task] = {}
+
     def __init__(
         self,
         conn: asyncpg.Connection,
@@ -41,6 +46,8 @@ class Contract:
         self.__is_proxy = None
         self.__implementation = None
         self.__abi = None
+        # {topic0: event name}
+        self.__events_by_topic = {}
         self.__contract = None
 
     @classmethod
@@ -50,9 +57,12 @@ class Contract:
         w3: AsyncWeb3,
         contract_address: str,
         visited_contracts_addresses: set = None,  # Shared context for recursion tracking
+        advisory_lock: bool = False,
     ):
         """
         Factory method to create and initialize a Contract instance asynchronously.
+        Concurrent calls for the same address share a single creation, so a new contract is only fetched once.
+        With advisory_lock, a Postgres advisory lock also makes the other replicas wait for the one fetching it.
         """
 
         if visited_contracts_addresses is None:
@@ -65,19 +75,52 @@ class Contract:
             )
         visited_contracts_addresses.add(contract_address)
 
+        checksum_address = Web3.to_checksum_address(contract_address)
+        creation = cls.__pending_creations.get(checksum_address)
+        if creation is None:
+            creation = asyncio.ensure_future(
+                cls.__create(
+                    conn,
+                    w3,
+                    contract_address,
+                    visited_contracts_addresses,
+                    advisory_lock,
+                )
+            )
+            cls.__pending_creations[checksum_address] = creation
+            creation.add_done_callback(
+                lambda _: cls.__pending_creations.pop(checksum_address, None)
+            )
+        else:
+            logging.info(
+                f"[create] Contract {checksum_address} is already being created, waiting for it."
+            )
+
+        # The creation keeps going if this caller is cancelled, the other callers may still be waiting for it.
+        return await asyncio.shield(creation)
+
+    @classmethod
+    async def __create(
+        cls,
+        conn: asyncpg.Connection,
+        w3: AsyncWeb3,
+        contract_address: str,
+        visited_contracts_addresses: set,
+        advisory_lock: bool,
+    ):
         # Create an instance of the class
         instance = cls(conn, w3, contract_address)
 
         # Perform asynchronous initialization
         async with conn.acquire() as db_connection:
             await instance.__get_contract_data(
-                db_connection, visited_contracts_addresses
+                db_connection, visited_contracts_addresses, advisory_lock
             )
 
         return instance
 
     async def __get_contract_data(
-        self, db_connection, visited_contracts_addresses: set
+        self, db_connection, visited_contracts_addresses: set, advisory_lock: bool
     ) -> None:
         """
         Retrieves the contract data from the database or call __add_contract_data if it isn't in the database.
@@ -86,7 +129,7 @@ class Contract:
         try:
             # Retrieve contract data from database.
             contract_data = await db_connection.fetchrow(
-                "SELECT * FROM contracts WHERE contract_address = $1",
+                "SELECT contract_name, is_proxy, implementation_address, events_indexed FROM contracts WHERE contract_address = $1",
                 self.__contract_address,
             )
             if contract_data is None:
@@ -94,10 +137,13 @@ class Contract:
                     f"[__get_contract_data] Contract {self.__contract_address} is not in the database."
                 )
                 # Call method to retrieve the contract data and add it to the database.
-                await self.__add_contract_data(db_connection)
+                if advisory_lock:
+                    await self.__add_contract_data_with_lock(db_connection)
+                else:
+                    await self.__add_contract_data(db_connection)
                 # Retrieve contract data from database after it has been added.
                 contract_data = await db_connection.fetchrow(
-                    "SELECT * FROM contracts WHERE contract_address = $1",
+                    "SELECT contract_name, is_proxy, implementation_address, events_indexed FROM contracts WHERE contract_address = $1",
                     self.__contract_address,
                 )
                 if contract_data is None:
@@ -111,7 +157,9 @@ class Contract:
             # Set object variables
             self.__name = contract_data["contract_name"]
             self.__is_proxy = contract_data["is_proxy"]
-            self.__abi = ast.literal_eval(contract_data["abi"])
+            if not contract_data["events_indexed"]:
+                await self.__index_contract_events(db_connection)
+            await self.__get_contract_events(db_connection)
             self.__contract = self.__w3.eth.contract(
                 address=self.__contract_address, abi=self.__abi
             )
@@ -132,11 +180,102 @@ class Contract:
                     self.__w3,
                     implementation_address,
                     visited_contracts_addresses,
+                    advisory_lock,
                 )
         except Exception as e:
             logging.error(f"[__get_contract_data] An unexpected error occured: {e}")
             raise e
 
+    async def __get_contract_events(self, db_connection) -> None:
+        """
+        Retrieves the events of the contract from contract_events, so only their ABI fragments are parsed
+        instead of the full ABI of the contract.
+        """
+        events = await db_connection.fetch(
+            "SELECT topic0, event_name, abi_fragment FROM contract_events WHERE contract_address = $1",
+            self.__contract_address,
+        )
+        self.__abi = [json.loads(event["abi_fragment"]) for event in events]
+        self.__events_by_topic = {
+            event["topic0"]: event["event_name"] for event in events
+        }
+
+    async def __index_contract_events(self, db_connection) -> None:
+        """
+        Adds the events of a contract stored before contract_events existed, from the ABI in the database.
+        Postgres can't compute their topics, so it is done once, the first time the contract is used.
+        """
+        logging.info(
+            f"[__index_contract_events] Indexing the events of contract {self.__contract_address}..."
+        )
+        abi = json.loads(
+            await db_connection.fetchval(
+                "SELECT abi FROM contracts WHERE contract_address = $1",
+                self.__contract_address,
+            )
+        )
+        async with db_connection.transaction():
+            await self.__add_contract_events(db_connection, abi)
+            await db_connection.execute(
+                "UPDATE contracts SET events_indexed = true WHERE contract_address = $1",
+                self.__contract_address,
+            )
+
+    async def __add_contract_events(self, db_connection, abi: list) -> None:
+        """
+        Adds the events of the ABI to contract_events.
+        """
+        # The topic of the anonymous events isn't their signature hash, they can't be looked up by topic.
+        events = [
+            (
+                Web3.to_hex(event_abi_to_log_topic(item)),
+                item["name"],
+                json.dumps(item),
+            )
+            for item in abi
+            if item.get("type") == "event" and not item.get("anonymous", False)
+        ]
+        if not events:
+            return
+
+        # An ABI can declare the same event twice, only the first one is kept.
+        await db_connection.execute(
+            """
+            INSERT INTO contract_events(contract_address, topic0, event_name, abi_fragment)
+            SELECT $1, topic0, event_name, abi_fragment
+            FROM unnest($2::text[], $3::text[], $4::jsonb[]) AS e(topic0, event_name, abi_fragment)
+            ON CONFLICT (contract_address, topic0) DO NOTHING
+            """,
+            self.__contract_address,
+            *[list(column) for column in zip(*events)],
+        )
+
+    async def __add_contract_data_with_lock(self, db_connection) -> None:
+        """
+        Calls __add_contract_data while holding a Postgres advisory lock on the contract address.
+        The replicas waiting for the lock find the contract in the database once it is released and don't fetch it again.
+        """
+        await db_connection.execute(
+            "SELECT pg_advisory_lock(hashtextextended($1, 0))",
+            self.__contract_address,
+        )
+        try:
+            contract_data = await db_connection.fetchrow(
+                "SELECT contract_name, is_proxy, implementation_address, events_indexed FROM contracts WHERE contract_address = $1",
+                self.__contract_address,
+            )
+            if contract_data is None:
+                await self.__add_contract_data(db_connection)
+            else:
+                logging.info(
+                    f"[__add_contract_data_with_lock] Contract {self.__contract_address} was added to the database by another replica."
+                )
+        finally:
+            await db_connection.execute(
+                "SELECT pg_advisory_unlock(hashtextextended($1, 0))",
+                self.__contract_address,
+            )
+
     async def __add_contract_data(self, db_connection) -> None:
         """
         Retrieves the contracts information from roninchain.com and adds it to the database.
@@ -196,9 +335,10 @@ class Contract:
             contract = {
                 "contract_address": self.__contract_address,
                 "contract_name": contract_name,
-                "abi": str(abi),
+                "abi": json.dumps(abi),
                 "is_contract_proxy": is_contract_proxy,
                 "implementation_address": implementation_address,
+                "events_indexed": True,
                 "created_at": current_time_utc,
                 "modified_at": current_time_utc,
             }
@@ -208,23 +348,26 @@ class Contract:
                 f"[__add_contract_data] Adding contract {self.__contract_address} ({contract_name}) to the database..."
             )
             try:
-                await db_connection.execute(
-                    """
-                    INSERT INTO contracts(
-                        contract_address,
-                        contract_name,
-                        abi,
-                        is_proxy,
-                        implementation_address,
-                        created_at,
-                        modified_at                      
-                    )
-                    VALUES (
-                        $1, $2, $3, $4, $5, $6, $7
+                async with db_connection.transaction():
+                    await db_connection.execute(
+                        """
+                        INSERT INTO contracts(
+                            contract_address,
+                            contract_name,
+                            abi,
+                            is_proxy,
+                            implementation_address,
+                            events_indexed,
+                            created_at,
+                            modified_at
+                        )
+                        VALUES (
+                            $1, $2, $3, $4, $5, $6, $7, $8
+                        )
+                        """,
+                        *contract.values(),
                     )
-                    """,
-                    *contract.values(),
-                )
+                    await self.__add_contract_events(db_connection, abi)
                 logging.info(
                     f"[__add_contract_data] Successfully added contract {self.__contract_address} ({contract_name}) to the database."
                 )
@@ -257,13 +400,33 @@ class Contract:
                 logging.info(
                     f"[get_event_name] Successfuly returned event name for topic {topic}."
                 )
-                return self.__contract.get_event_by_topic(topic).name
+                topic_hex = (
+                    Web3.to_hex(hexstr=topic)
+                    if isinstance(topic, str)
+                    else Web3.to_hex(topic)
+                )
+                event_name = self.__events_by_topic.get(topic_hex)
+                if event_name is None:
+                    raise Web3ValueError(f"No event found for topic {topic_hex}.")
+                return event_name
         except Web3ValueError as e:
             logging.error(
                 f"[get_event_name] Could not find any event matching this topic: {topic}"
             )
             raise e
 
+    def get_event_abi(self, event_name: str) -> dict | None:
+        """
+        Returns the ABI of the event, or None if the contract doesn't have this event.
+        """
+        if self.__is_proxy:
+            return self.__implementation.get_event_abi(event_name)
+
+        for item in self.__abi:
+            if item.get("type") == "event" and item.get("name") == event_name:
+                return item
+        return None
+
     def get_event_data(self, topic: str, log: dict) -> dict:
         """
         Returns the decoded log data in a dictionnary.
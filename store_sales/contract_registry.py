@@ -0,0 +1,65 @@
+import asyncpg
+import logging
+import time
+from contract import Contract
+from config import Config
+from web3 import Web3, AsyncWeb3
+
+
+class ContractRegistry:
+    """
+    Process-wide cache of the fully initialized Contract instances, keyed by contract address.
+    A Contract is never modified once created, so the same instance is shared by every message.
+    An entry is removed after ttl seconds or when it is invalidated, the next lookup then reloads it from the database.
+    """
+
+    def __init__(self, ttl: float = 3600, advisory_lock: bool = False):
+        self.__ttl = ttl
+        self.__advisory_lock = advisory_lock
+        # {checksum address: (contract, expiry time)}
+        self.__contracts: dict[str, tuple[Contract, float]] = {}
+
+    async def get(
+        self, conn: asyncpg.Pool, w3: AsyncWeb3, contract_address: str
+    ) -> Contract:
+        """
+        Returns the contract from the registry, or creates it and adds it to the registry.
+        """
+        contract_address = Web3.to_checksum_address(contract_address)
+
+        entry = self.__contracts.get(contract_address)
+        if entry is not None:
+            contract, expires_at = entry
+            if time.monotonic() < expires_at:
+                return contract
+            logging.info(
+                f"[get] Contract {contract_address} expired from the contract registry."
+            )
+
+        contract = await Contract.create(
+            conn, w3, contract_address, advisory_lock=self.__advisory_lock
+        )
+        expires_at = time.monotonic() + self.__ttl if self.__ttl > 0 else float("inf")
+        self.__contracts[contract_address] = (contract, expires_at)
+        logging.info(
+            f"[get] Contract {contract_address} added to the contract registry."
+        )
+        return contract
+
+    def invalidate(self, contract_address: str | None = None) -> None:
+        """
+        Removes a contract from the registry, or every contract if no address is given.
+        """
+        if contract_address is None:
+            self.__contracts.clear()
+        else:
+            self.__contracts.pop(Web3.to_checksum_address(contract_address), None)
+
+    def size(self) -> int:
+        return len(self.__contracts)
+
+
+contract_registry = ContractRegistry(
+    ttl=Config.get_contract_cache_ttl(),
+    advisory_lock=Config.get_contract_advisory_lock_enabled(),
+)
@@ -0,0 +1,45 @@
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+
+def create_http_session(
+    limit: int = 100,
+    limit_per_host: int = 20,
+    keepalive_timeout: float = 30,
+    dns_cache_ttl: int = 300,
+) -> ClientSession:
+    """
+    Creates the HTTP session shared by the requests to the node providers.
+    Its connections are kept alive between requests, unlike the ones of the session Web3 creates by default,
+    and their number is limited per host so a burst of requests waits for a connection instead of opening new sockets.
+    """
+    connector = TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=dns_cache_ttl,
+        enable_cleanup_closed=True,
+    )
+    return ClientSession(connector=connector)
+
+
+def get_request_timeout(total: float, connect: float) -> ClientTimeout:
+    """
+    Returns the timeout of a request, with a shorter timeout to get a connection from the pool and connect.
+    """
+    return ClientTimeout(total=total, connect=connect)
+
+
+def get_http_pool_stats(session: ClientSession) -> dict[str, int]:
+    """
+    Returns the connections in use and idle in the pool of the session, and the requests waiting for a connection.
+    """
+    connector = session.connector
+    if connector is None or connector.closed:
+        return {"in_use": 0, "idle": 0, "waiting": 0}
+
+    # aiohttp doesn't expose the state of its pool, it is read from the connector.
+    return {
+        "in_use": len(connector._acquired),
+        "idle": sum(len(connections) for connections in connector._conns.values()),
+        "waiting": sum(len(waiters) for waiters in connector._waiters.values()),
+    }
@@ -0,0 +1,117 @@
+import logging
+from functools import lru_cache, partial
+from contract import Contract
+from hexbytes import HexBytes
+from web3 import Web3
+
+TRANSFER_INPUT_TYPES = ["address", "address", "uint256"]
+
+
+def decode_erc20_transfer(names: list[str], log: dict) -> dict | None:
+    """
+    Decodes a Transfer(address indexed, address indexed, uint256) log, the value is the only word of the data.
+    """
+    topics = log["topics"]
+    data = log["data"]
+    if len(topics) != 3 or len(data) != 32:
+        return None
+
+    return {
+        "event": "Transfer",
+        "args": {
+            names[0]: Web3.to_checksum_address(topics[1][12:]),
+            names[1]: Web3.to_checksum_address(topics[2][12:]),
+            names[2]: int.from_bytes(data, "big"),
+        },
+    }
+
+
+def decode_erc721_transfer(names: list[str], log: dict) -> dict | None:
+    """
+    Decodes a Transfer(address indexed, address indexed, uint256 indexed) log, every argument is a topic.
+    """
+    topics = log["topics"]
+    if len(topics) != 4:
+        return None
+
+    return {
+        "event": "Transfer",
+        "args": {
+            names[0]: Web3.to_checksum_address(topics[1][12:]),
+            names[1]: Web3.to_checksum_address(topics[2][12:]),
+            names[2]: int.from_bytes(topics[3], "big"),
+        },
+    }
+
+
+def get_transfer_decoder(event_abi: dict | None):
+    """
+    Returns the decoder matching the layout of the Transfer event ABI, or None if it isn't an ERC20 or ERC721 Transfer.
+    """
+    if not isinstance(event_abi, dict):
+        return None
+
+    inputs = event_abi.get("inputs", [])
+    if [event_input.get("type") for event_input in inputs] != TRANSFER_INPUT_TYPES:
+        return None
+
+    names = [event_input["name"] for event_input in inputs]
+    indexed = [event_input.get("indexed", False) for event_input in inputs]
+    if indexed == [True, True, False]:
+        return partial(decode_erc20_transfer, names)
+    if indexed == [True, True, True]:
+        return partial(decode_erc721_transfer, names)
+    return None
+
+
+class TransferLogDecoder:
+    """
+    Matches the Transfer logs of the given contracts and decodes them.
+    The contracts are compiled once into a lookup keyed by the raw address and topic0 bytes, so a log is matched
+    without checksumming its address or formatting its topic. ERC20 and ERC721 Transfer logs are decoded directly,
+    any other layout is decoded by the contract ABI.
+    """
+
+    def __init__(self, contracts: list[Contract]):
+        # {(address bytes, topic0 bytes): (contract, topic0, specialised decoder or None)}
+        self.__matchers: dict[tuple[bytes, bytes], tuple] = {}
+
+        for contract in contracts:
+            topic = contract.get_event_signature_hash("Transfer")
+            decoder = get_transfer_decoder(contract.get_event_abi("Transfer"))
+            if decoder is None:
+                logging.info(
+                    f"[TransferLogDecoder] Transfer event of contract {contract.get_contract_address()} is decoded with its ABI."
+                )
+
+            key = (
+                bytes(HexBytes(contract.get_contract_address())),
+                bytes(HexBytes(topic)),
+            )
+            self.__matchers[key] = (contract, topic, decoder)
+
+    def decode(self, log: dict) -> tuple[Contract, dict] | None:
+        """
+        Returns the contract that emitted the log and the decoded log, or None if it isn't a Transfer of one of the contracts.
+        """
+        topics = log["topics"]
+        if not topics:
+            return None
+
+        matcher = self.__matchers.get((bytes.fromhex(log["address"][2:]), topics[0]))
+        if matcher is None:
+            return None
+
+        contract, topic, decoder = matcher
+        event_data = decoder(log) if decoder is not None else None
+        if event_data is None:
+            event_data = contract.get_event_data(topic, log)
+        return contract, event_data
+
+
+@lru_cache(maxsize=8)
+def get_transfer_log_decoder(*contracts: Contract) -> TransferLogDecoder:
+    """
+    Returns the decoder of the contracts, compiled once for the instances kept by the contract registry.
+    """
+    return TransferLogDecoder(list(contracts))
@@ -0,0 +1,101 @@
+import asyncio
+import asyncpg
+import logging
+from datetime import datetime, timezone
+from publisher import RabbitMQPublisher
+
+
+async def add_outbox_messages(db_connection, bodies: list[bytes]) -> None:
+    """
+    Writes the messages to the outbox, in the DB transaction of the sales they are sent for.
+    """
+    if not bodies:
+        return
+
+    current_time_utc = datetime.now(timezone.utc)
+    await db_connection.execute(
+        """
+        INSERT INTO axie_sales_outbox(payload, created_at)
+        SELECT payload, $2 FROM unnest($1::text[]) AS payload
+        """,
+        [body.decode("utf-8") for body in bodies],
+        current_time_utc,
+    )
+
+
+class OutboxRelay:
+    """
+    Background task sending the messages of the outbox to RabbitMQ in batches, in the order they were written.
+    The rows of a batch are locked while they are sent and only deleted once RabbitMQ confirmed them,
+    the replicas skip the locked rows so they can relay the outbox at the same time.
+    """
+
+    def __init__(
+        self,
+        conn: asyncpg.Pool,
+        publisher: RabbitMQPublisher,
+        batch_size: int = 500,
+        interval: float = 0.5,
+    ):
+        self.__conn = conn
+        self.__publisher = publisher
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is None:
+            return
+
+        self.__task.cancel()
+        try:
+            await self.__task
+        except asyncio.CancelledError:
+            pass
+        self.__task = None
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                # A full batch means there may be more messages waiting, they are sent right away.
+                while await self.relay() == self.__batch_size:
+                    pass
+            except Exception as e:
+                logging.warning(
+                    f"[__run] Outbox relay stopped, retrying in {self.__interval} seconds: {e}"
+                )
+            await asyncio.sleep(self.__interval)
+
+    async def relay(self) -> int:
+        """
+        Sends one batch of messages from the outbox to RabbitMQ and returns the number of messages sent.
+        If RabbitMQ doesn't confirm the batch, the DB transaction is rolled back and the messages stay in the outbox.
+        """
+        async with self.__conn.acquire() as db_connection:
+            async with db_connection.transaction():
+                rows = await db_connection.fetch(
+                    """
+                    SELECT id, payload FROM axie_sales_outbox
+                    ORDER BY id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    self.__batch_size,
+                )
+                if not rows:
+                    return 0
+
+                await self.__publisher.publish_batch(
+                    [row["payload"].encode("utf-8") for row in rows]
+                )
+                await db_connection.execute(
+                    "DELETE FROM axie_sales_outbox WHERE id = ANY($1::bigint[])",
+                    [row["id"] for row in rows],
+                )
+
+        logging.info(f"[relay] Relayed {len(rows)} messages from the outbox.")
+        return len(rows)
@@ -0,0 +1,197 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+from collections import OrderedDict
+from config import Config
+
+
+class MmapReceiptStore:
+    """
+    On-disk store of the receipts in a memory-mapped file of a fixed size, kept across restarts of the app.
+    The receipts are appended as records of the transaction hash, the length and the pickled receipt,
+    and the index of the records is rebuilt from the file when it is opened. Once the file is full, it starts over.
+    """
+
+    # Transaction hash and length of the pickled receipt of a record.
+    HEADER = struct.Struct(">32sI")
+
+    def __init__(self, path: str, size: int):
+        self.__path = path
+        self.__size = size
+        self.__mmap: mmap.mmap | None = None
+        # {transaction hash bytes: (offset of the receipt, length)}
+        self.__index: dict[bytes, tuple[int, int]] = {}
+        self.__offset = 0
+
+    def __open(self) -> mmap.mmap:
+        if self.__mmap is not None:
+            return self.__mmap
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.__path)), exist_ok=True)
+        with open(self.__path, "a+b") as file:
+            if os.path.getsize(self.__path) != self.__size:
+                file.truncate(self.__size)
+            self.__mmap = mmap.mmap(file.fileno(), self.__size)
+
+        # The records end at the first empty header.
+        offset = 0
+        while offset + self.HEADER.size <= self.__size:
+            transaction_hash, length = self.HEADER.unpack_from(self.__mmap, offset)
+            start = offset + self.HEADER.size
+            if length == 0 or start + length > self.__size:
+                break
+            self.__index[transaction_hash] = (start, length)
+            offset = start + length
+        self.__offset = offset
+
+        logging.info(
+            f"[__open] Opened the receipt store {self.__path} with {len(self.__index)} receipts."
+        )
+        return self.__mmap
+
+    def get(self, transaction_hash: bytes):
+        store = self.__open()
+        entry = self.__index.get(transaction_hash)
+        if entry is None:
+            return None
+        start, length = entry
+        return pickle.loads(store[start : start + length])
+
+    def put(self, transaction_hash: bytes, receipt) -> None:
+        store = self.__open()
+        data = pickle.dumps(receipt)
+        record_size = self.HEADER.size + len(data)
+        if record_size + self.HEADER.size > self.__size:
+            return
+
+        if self.__offset + record_size + self.HEADER.size > self.__size:
+            logging.info("[put] The receipt store is full, starting over.")
+            self.__index.clear()
+            self.__offset = 0
+
+        # The end of the records is marked before the header is written, so a record
+        # interrupted by a crash is ignored when the file is opened again.
+        start = self.__offset + self.HEADER.size
+        self.HEADER.pack_into(store, start + len(data), b"\x00" * 32, 0)
+        store[start : start + len(data)] = data
+        self.HEADER.pack_into(store, self.__offset, transaction_hash, len(data))
+
+        self.__index[transaction_hash] = (start, len(data))
+        self.__offset += record_size
+
+    def clear(self) -> None:
+        store = self.__open()
+        self.HEADER.pack_into(store, 0, b"\x00" * 32, 0)
+        self.__index.clear()
+        self.__offset = 0
+
+    def close(self) -> None:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+            self.__index.clear()
+            self.__offset = 0
+
+
+class ReceiptCache:
+    """
+    Process-wide cache of the transaction receipts, keyed by transaction hash.
+    A receipt doesn't change once its block is final, so a message retried, requeued or backfilled
+    doesn't fetch it again. The last max_size receipts used are kept in memory, in front of an optional
+    on-disk store that keeps them across restarts.
+    Only the receipts of blocks at least confirmations blocks behind the highest block seen are cached,
+    so a receipt of a block that is reorganized away isn't kept. The highest block seen is a lower bound
+    of the chain head, so a receipt is never cached before it has its confirmations.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        disk_path: str | None = None,
+        disk_size: int = 256 * 1024 * 1024,
+        confirmations: int = 0,
+    ):
+        self.__max_size = max_size
+        self.__confirmations = confirmations
+        self.__latest_block = 0
+        self.__receipts: OrderedDict[bytes, object] = OrderedDict()
+        self.__disk_store = (
+            MmapReceiptStore(disk_path, disk_size) if disk_path else None
+        )
+
+    def get(self, transaction_hash: str):
+        """
+        Returns the receipt of the transaction, or None if it is not in the cache.
+        """
+        key = ReceiptCache.__get_key(transaction_hash)
+
+        receipt = self.__receipts.get(key)
+        if receipt is not None:
+            self.__receipts.move_to_end(key)
+            return receipt
+
+        if self.__disk_store is not None:
+            try:
+                receipt = self.__disk_store.get(key)
+            except Exception as e:
+                logging.warning(
+                    f"[get] Error while reading the receipt of transaction {transaction_hash} from the receipt store: {e}"
+                )
+                return None
+            if receipt is not None:
+                self.__add(key, receipt)
+        return receipt
+
+    def put(self, transaction_hash: str, receipt) -> None:
+        if receipt is None:
+            return
+
+        block_number = receipt.get("blockNumber")
+        if block_number is not None:
+            self.__latest_block = max(self.__latest_block, block_number)
+        if self.__confirmations > 0 and (
+            block_number is None
+            or block_number > self.__latest_block - self.__confirmations
+        ):
+            return
+
+        key = ReceiptCache.__get_key(transaction_hash)
+        self.__add(key, receipt)
+
+        if self.__disk_store is not None:
+            try:
+                self.__disk_store.put(key, receipt)
+            except Exception as e:
+                logging.warning(
+                    f"[put] Error while writing the receipt of transaction {transaction_hash} to the receipt store: {e}"
+                )
+
+    def clear(self) -> None:
+        self.__receipts.clear()
+        if self.__disk_store is not None:
+            self.__disk_store.clear()
+
+    def size(self) -> int:
+        return len(self.__receipts)
+
+    def __add(self, key: bytes, receipt) -> None:
+        if self.__max_size <= 0:
+            return
+        self.__receipts[key] = receipt
+        self.__receipts.move_to_end(key)
+        while len(self.__receipts) > self.__max_size:
+            self.__receipts.popitem(last=False)
+
+    @staticmethod
+    def __get_key(transaction_hash: str) -> bytes:
+        return bytes.fromhex(transaction_hash.removeprefix("0x"))
+
+
+receipt_cache = ReceiptCache(
+    max_size=Config.get_receipt_cache_size(),
+    disk_path=Config.get_receipt_cache_path(),
+    disk_size=Config.get_receipt_cache_disk_size_mb() * 1024 * 1024,
+    confirmations=Config.get_receipt_cache_confirmations(),
+)
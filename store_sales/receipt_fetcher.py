@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from stages import RPC_STAGE, stage_limiter
+from web3 import Web3, AsyncWeb3
+from web3.exceptions import MethodUnavailable
+
+
+class ReceiptFetcher:
+    """
+    Groups the receipts requested by the messages processed concurrently and fetches them in as few RPC calls as possible.
+    The requests are collected for batch_window seconds, or until max_batch_size receipts are pending.
+    The transactions of a block with at least block_receipts_threshold pending transactions are fetched with one
+    eth_getBlockReceipts call, the others with one JSON-RPC batch request. Each receipt is then dispatched to the
+    message waiting for it.
+    If the node doesn't support eth_getBlockReceipts, every receipt is fetched with JSON-RPC batch requests.
+    Only the RPC calls take a slot of the RPC stage, not the messages waiting for their batch.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        batch_window: float = 0.01,
+        max_batch_size: int = 100,
+        block_receipts_threshold: int = 2,
+    ):
+        self.__w3 = w3
+        self.__batch_window = batch_window
+        self.__max_batch_size = max_batch_size
+        self.__block_receipts_threshold = block_receipts_threshold
+        self.__block_receipts_supported = True
+        # {block number: {transaction hash: [futures waiting for the receipt]}}
+        self.__pending: dict[int | None, dict[str, list[asyncio.Future]]] = {}
+        self.__pending_count = 0
+        self.__flush_task: asyncio.Task | None = None
+        self.__fetch_tasks: set[asyncio.Task] = set()
+
+    async def get_receipt(self, transaction_hash: str, block_number: int | None = None):
+        """
+        Returns the receipt of the transaction once the batch it was added to is fetched.
+        Without a block number, the receipt is always fetched with a JSON-RPC batch request.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.__pending.setdefault(block_number, {}).setdefault(
+            transaction_hash.lower(), []
+        ).append(future)
+        self.__pending_count += 1
+
+        if self.__pending_count >= self.__max_batch_size:
+            self.__start_fetch(self.__take_pending())
+        elif self.__flush_task is None:
+            self.__flush_task = asyncio.create_task(self.__flush_later())
+
+        return await future
+
+    def __take_pending(self) -> dict:
+        pending = self.__pending
+        self.__pending = {}
+        self.__pending_count = 0
+        return pending
+
+    def __start_fetch(self, pending: dict) -> None:
+        # A reference to the task is kept until it is done so it isn't garbage collected.
+        task = asyncio.create_task(self.__fetch(pending))
+        self.__fetch_tasks.add(task)
+        task.add_done_callback(self.__fetch_tasks.discard)
+
+    async def __flush_later(self) -> None:
+        await asyncio.sleep(self.__batch_window)
+        self.__flush_task = None
+        pending = self.__take_pending()
+        if pending:
+            await self.__fetch(pending)
+
+    async def __fetch(self, pending: dict) -> None:
+        error = RuntimeError("The receipt was not fetched.")
+        try:
+            await self.__fetch_receipts(pending)
+        except Exception as e:
+            logging.error(
+                f"[__fetch] An unexpected error occured while retrieving {self.__count(pending)} receipts: {e}"
+            )
+            error = e
+        finally:
+            # Whatever failed, no message is left waiting for its receipt forever.
+            for transactions in pending.values():
+                for futures in transactions.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(error)
+
+    async def __fetch_receipts(self, pending: dict) -> None:
+        batch_transactions = []
+        block_fetches = []
+        for block_number, transactions in pending.items():
+            if (
+                block_number is not None
+                and self.__block_receipts_supported
+                and len(transactions) >= self.__block_receipts_threshold
+            ):
+                block_fetches.append(self.__fetch_block(block_number, transactions))
+            else:
+                batch_transactions.extend(transactions.items())
+
+        logging.info(
+            f"[__fetch_receipts] Fetching {self.__count(pending)} receipts with {len(block_fetches)} block receipts calls and a batch of {len(batch_transactions)}."
+        )
+        results = await asyncio.gather(
+            self.__fetch_batch(batch_transactions), *block_fetches
+        )
+
+        # The transactions that were not in the receipts of their block are fetched on their own.
+        missing_transactions = [
+            transaction for result in results[1:] for transaction in result
+        ]
+        await self.__fetch_batch(missing_transactions)
+
+    @staticmethod
+    def __count(pending: dict) -> int:
+        return sum(len(transactions) for transactions in pending.values())
+
+    async def __fetch_block(self, block_number: int, transactions: dict) -> list:
+        """
+        Fetches the receipts of the whole block and returns the transactions that were not found in it.
+        """
+        try:
+            async with stage_limiter.stage(RPC_STAGE):
+                receipts = await self.__w3.eth.get_block_receipts(block_number)
+        except MethodUnavailable:
+            logging.warning(
+                "[__fetch_block] The node doesn't support eth_getBlockReceipts, receipts are fetched with batch requests."
+            )
+            self.__block_receipts_supported = False
+            return list(transactions.items())
+        except Exception as e:
+            logging.warning(
+                f"[__fetch_block] Error while retrieving the receipts of block {block_number}, fetching them with a batch request: {e}"
+            )
+            return list(transactions.items())
+
+        receipts_by_hash = {
+            Web3.to_hex(receipt["transactionHash"]).lower(): receipt
+            for receipt in receipts
+        }
+        missing_transactions = []
+        for transaction_hash, futures in transactions.items():
+            receipt = receipts_by_hash.get(transaction_hash)
+            if receipt is None:
+                missing_transactions.append((transaction_hash, futures))
+            else:
+                self.__dispatch(futures, receipt)
+        return missing_transactions
+
+    async def __fetch_batch(self, transactions: list) -> None:
+        """
+        Fetches the receipts of the transactions with one JSON-RPC batch request.
+        If the batch fails, each receipt is fetched on its own so one bad transaction doesn't fail the others.
+        """
+        if not transactions:
+            return
+        if len(transactions) == 1:
+            await self.__fetch_one(*transactions[0])
+            return
+
+        try:
+            async with stage_limiter.stage(RPC_STAGE):
+                async with self.__w3.batch_requests() as batch:
+                    for transaction_hash, _ in transactions:
+                        batch.add(
+                            self.__w3.eth.get_transaction_receipt(transaction_hash)
+                        )
+                    receipts = await batch.async_execute()
+            if len(receipts) != len(transactions):
+                raise ValueError(
+                    f"The batch request returned {len(receipts)} results for {len(transactions)} requests."
+                )
+        except Exception as e:
+            logging.warning(
+                f"[__fetch_batch] Error while retrieving {len(transactions)} receipts in a batch request, fetching them one by one: {e}"
+            )
+            await asyncio.gather(
+                *[
+                    self.__fetch_one(transaction_hash, futures)
+                    for transaction_hash, futures in transactions
+                ]
+            )
+            return
+
+        for (_, futures), receipt in zip(transactions, receipts):
+            self.__dispatch(futures, receipt)
+
+    async def __fetch_one(self, transaction_hash: str, futures: list) -> None:
+        try:
+            async with stage_limiter.stage(RPC_STAGE):
+                receipt = await self.__w3.eth.get_transaction_receipt(transaction_hash)
+        except Exception as e:
+            logging.error(
+                f"[__fetch_one] An unexpected error occured while retrieving receipt for transaction {transaction_hash}: {e}"
+            )
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.__dispatch(futures, receipt)
+
+    @staticmethod
+    def __dispatch(futures: list, receipt) -> None:
+        # A waiting message may have been cancelled in the meantime.
+        for future in futures:
+            if not future.done():
+                future.set_result(receipt)
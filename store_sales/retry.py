@@ -0,0 +1,208 @@
+"""
+Delayed retries and dead letters of the sales queue.
+
+A failed message is published to a delay queue, whose TTL sends it back to the sales queue through the
+default exchange once it expired. Each retry waits longer than the previous one, and the message is moved
+to the dead-letter queue once all the retries failed.
+
+Usage:
+    python retry.py inspect [--limit 10]
+    python retry.py replay [--limit 100]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from aio_pika import DeliveryMode, Message, connect
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+from config import Config
+
+RETRY_COUNT_HEADER = "x-retry-count"
+LAST_ERROR_HEADER = "x-last-error"
+ORIGINAL_QUEUE_HEADER = "x-original-queue"
+
+
+class RetryQueues:
+    """
+    Declares the delay queues and the dead-letter queue of a queue, and routes its failed messages to them.
+    The retry count is kept in a header, the message goes to the delay queue of its retry, then to the dead-letter queue.
+    """
+
+    def __init__(self, channel: AbstractChannel, queue_name: str, delays: list[int]):
+        self.__channel = channel
+        self.__queue_name = queue_name
+        self.__delays = delays
+
+    @staticmethod
+    def get_dead_letter_queue_name(queue_name: str) -> str:
+        return f"{queue_name}.dead-letter"
+
+    def get_delay_queue_name(self, delay: int) -> str:
+        return f"{self.__queue_name}.retry.{delay}s"
+
+    async def declare(self) -> None:
+        """
+        Declares a delay queue for each delay and the dead-letter queue.
+        The delay queues have no consumer, their messages expire after the delay and are dead-lettered to the queue.
+        """
+        for delay in self.__delays:
+            await self.__channel.declare_queue(
+                self.get_delay_queue_name(delay),
+                durable=True,
+                arguments={
+                    "x-message-ttl": delay * 1000,
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.__queue_name,
+                },
+            )
+        await self.__channel.declare_queue(
+            RetryQueues.get_dead_letter_queue_name(self.__queue_name), durable=True
+        )
+        logging.info(
+            f"[declare] Declared the delay queues {self.__delays} and the dead-letter queue of {self.__queue_name}."
+        )
+
+    async def retry(self, message: AbstractIncomingMessage, error: Exception) -> None:
+        """
+        Publishes the failed message to the delay queue of its next retry, or to the dead-letter queue
+        if it was retried too many times, then acknowledges it.
+        If the message can't be published, it is requeued so it isn't lost.
+        """
+        headers = dict(message.headers or {})
+        retry_count = int(headers.get(RETRY_COUNT_HEADER, 0))
+        headers[LAST_ERROR_HEADER] = str(error)[:1000]
+
+        if retry_count < len(self.__delays):
+            routing_key = self.get_delay_queue_name(self.__delays[retry_count])
+            headers[RETRY_COUNT_HEADER] = retry_count + 1
+        else:
+            routing_key = RetryQueues.get_dead_letter_queue_name(self.__queue_name)
+            headers[ORIGINAL_QUEUE_HEADER] = self.__queue_name
+
+        try:
+            await self.__channel.default_exchange.publish(
+                Message(
+                    body=message.body,
+                    headers=headers,
+                    content_type=message.content_type,
+                    message_id=message.message_id,
+                    delivery_mode=DeliveryMode.PERSISTENT,
+                ),
+                routing_key=routing_key,
+            )
+        except Exception as e:
+            logging.error(
+                f"[retry] The message couldn't be sent to {routing_key}, requeuing it: {e}"
+            )
+            await message.nack(requeue=True)
+            return
+
+        await message.ack()
+        logging.warning(
+            f"[retry] Message sent to {routing_key} after {retry_count} retries: {error}"
+        )
+
+
+async def inspect_dead_letters(
+    channel: AbstractChannel, queue_name: str, limit: int
+) -> list[dict]:
+    """
+    Returns up to limit messages of the dead-letter queue without removing them.
+    """
+    queue = await channel.declare_queue(
+        RetryQueues.get_dead_letter_queue_name(queue_name), durable=True
+    )
+
+    messages = []
+    try:
+        while len(messages) < limit:
+            message = await queue.get(no_ack=False, fail=False)
+            if message is None:
+                break
+            messages.append(message)
+
+        return [
+            {
+                "body": message.body.decode("utf-8", errors="replace"),
+                "headers": {
+                    key: value
+                    for key, value in (message.headers or {}).items()
+                    if key != "x-death"
+                },
+            }
+            for message in messages
+        ]
+    finally:
+        # The messages are only requeued once all were read, otherwise the same message would be read again.
+        for message in messages:
+            await message.nack(requeue=True)
+
+
+async def replay_dead_letters(
+    channel: AbstractChannel, queue_name: str, limit: int
+) -> int:
+    """
+    Moves up to limit messages of the dead-letter queue back to the queue, with their retry count reset.
+    Returns the number of messages replayed.
+    """
+    queue = await channel.declare_queue(
+        RetryQueues.get_dead_letter_queue_name(queue_name), durable=True
+    )
+
+    replayed = 0
+    while replayed < limit:
+        message = await queue.get(no_ack=False, fail=False)
+        if message is None:
+            break
+
+        headers = {
+            key: value
+            for key, value in (message.headers or {}).items()
+            if key not in (RETRY_COUNT_HEADER, LAST_ERROR_HEADER, ORIGINAL_QUEUE_HEADER)
+        }
+        await channel.default_exchange.publish(
+            Message(
+                body=message.body,
+                headers=headers,
+                content_type=message.content_type,
+                message_id=message.message_id,
+                delivery_mode=DeliveryMode.PERSISTENT,
+            ),
+            routing_key=(message.headers or {}).get(ORIGINAL_QUEUE_HEADER, queue_name),
+        )
+        await message.ack()
+        replayed += 1
+
+    return replayed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=["inspect", "replay"])
+    parser.add_argument("--queue", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    queue_name = args.queue or Config.get_rabbitmq_queue_sales_name()
+
+    connection = await connect(Config.get_rabbitmq_connection_string())
+    async with connection:
+        channel = await connection.channel()
+
+        if args.command == "inspect":
+            messages = await inspect_dead_letters(channel, queue_name, args.limit or 10)
+            for message in messages:
+                print(json.dumps(message, default=str))
+            print(
+                f"{len(messages)} messages in {RetryQueues.get_dead_letter_queue_name(queue_name)}."
+            )
+        else:
+            replayed = await replay_dead_letters(channel, queue_name, args.limit or 100)
+            print(f"{replayed} messages replayed to {queue_name}.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
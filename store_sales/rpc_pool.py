@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any
+from urllib.parse import urlparse
+from web3.providers import AsyncHTTPProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+
+class Endpoint:
+    """
+    Latency and circuit breaker state of a node endpoint.
+    The latency is tracked as an EWMA to rank the endpoints, and as a window of recent latencies for its p95.
+    After failure_threshold consecutive failures the circuit opens, the endpoint is only tried again once
+    reset_timeout seconds have passed, and one more failure opens it again.
+    """
+
+    def __init__(
+        self,
+        provider: AsyncHTTPProvider,
+        ewma_alpha: float = 0.3,
+        latency_window: int = 100,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.provider = provider
+        # The URL of the node provider usually contains its API key, only its host is logged.
+        self.name = urlparse(str(provider.endpoint_uri)).netloc
+        self.__ewma_alpha = ewma_alpha
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__ewma: float | None = None
+        self.__latencies: deque[float] = deque(maxlen=latency_window)
+        self.__consecutive_failures = 0
+        self.__open_until: float | None = None
+
+    def get_ewma(self) -> float:
+        """
+        Returns the EWMA latency in seconds, 0 before the first request so a new endpoint is tried right away.
+        """
+        return self.__ewma or 0.0
+
+    def get_p95(self, min_samples: int) -> float | None:
+        """
+        Returns the p95 of the recent latencies, or None with less than min_samples latencies.
+        """
+        if len(self.__latencies) < max(min_samples, 1):
+            return None
+        latencies = sorted(self.__latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def is_available(self) -> bool:
+        return self.__open_until is None or time.monotonic() >= self.__open_until
+
+    def get_open_until(self) -> float:
+        return self.__open_until or 0.0
+
+    def record_success(self, latency: float) -> None:
+        if self.__ewma is None:
+            self.__ewma = latency
+        else:
+            self.__ewma = (
+                self.__ewma_alpha * latency + (1 - self.__ewma_alpha) * self.__ewma
+            )
+        self.__latencies.append(latency)
+
+        if self.__open_until is not None:
+            logging.info(f"[record_success] Circuit of {self.name} closed.")
+        self.__consecutive_failures = 0
+        self.__open_until = None
+
+    def record_failure(self) -> None:
+        self.__consecutive_failures += 1
+        if self.__consecutive_failures >= self.__failure_threshold:
+            self.__open_until = time.monotonic() + self.__reset_timeout
+            logging.warning(
+                f"[record_failure] Circuit of {self.name} opened for {self.__reset_timeout} seconds after {self.__consecutive_failures} consecutive failures."
+            )
+
+    def get_stats(self) -> dict:
+        p95 = self.get_p95(1)
+        return {
+            "ewma_ms": round(self.get_ewma() * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "consecutive_failures": self.__consecutive_failures,
+            "circuit_open": not self.is_available(),
+        }
+
+
+class RPCProviderPool(AsyncJSONBaseProvider):
+    """
+    Web3 provider sending each request to the fastest available endpoint of a pool of node endpoints.
+    A request failing on an endpoint is sent to the next one, the endpoints with an open circuit are only tried last.
+    With hedging, if the endpoint didn't answer within its p95 latency, the request is also sent to the next endpoint
+    and the first answer is used. The hedge only starts once the endpoint has hedge_min_samples latencies.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        super().__init__()
+        self.__endpoints = endpoints
+        self.__hedge = hedge
+        self.__hedge_min_samples = hedge_min_samples
+
+    def __str__(self) -> str:
+        return f"RPC provider pool of {', '.join(endpoint.name for endpoint in self.__endpoints)}"
+
+    def get_stats(self) -> dict[str, dict]:
+        """
+        Returns the latency and circuit state of each endpoint.
+        """
+        return {endpoint.name: endpoint.get_stats() for endpoint in self.__endpoints}
+
+    async def make_request(self, method, params: Any):
+        return await self.__route(
+            lambda provider: provider.make_request(method, params)
+        )
+
+    async def make_batch_request(self, requests: list):
+        return await self.__route(
+            lambda provider: provider.make_batch_request(requests)
+        )
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        for endpoint in self.__endpoints:
+            if await endpoint.provider.is_connected(show_traceback):
+                return True
+        return False
+
+    async def disconnect(self) -> None:
+        for endpoint in self.__endpoints:
+            await endpoint.provider.disconnect()
+
+    def __rank_endpoints(self) -> list[Endpoint]:
+        available = sorted(
+            (endpoint for endpoint in self.__endpoints if endpoint.is_available()),
+            key=Endpoint.get_ewma,
+        )
+        unavailable = sorted(
+            (endpoint for endpoint in self.__endpoints if not endpoint.is_available()),
+            key=Endpoint.get_open_until,
+        )
+        return available + unavailable
+
+    async def __route(self, call):
+        endpoints = self.__rank_endpoints()
+        error = None
+
+        while endpoints:
+            endpoint = endpoints.pop(0)
+            tasks = {asyncio.create_task(self.__call(endpoint, call))}
+            try:
+                hedge_delay = (
+                    endpoint.get_p95(self.__hedge_min_samples)
+                    if self.__hedge and endpoints
+                    else None
+                )
+                if hedge_delay is not None:
+                    done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                    if not done:
+                        tasks.add(
+                            asyncio.create_task(self.__call(endpoints.pop(0), call))
+                        )
+
+                while tasks:
+                    done, tasks = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        error = task.exception()
+            finally:
+                # The slower request of a hedge is not needed anymore.
+                for task in tasks:
+                    task.cancel()
+
+        raise error
+
+    async def __call(self, endpoint: Endpoint, call):
+        start_time = time.monotonic()
+        try:
+            response = await call(endpoint.provider)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            endpoint.record_failure()
+            logging.warning(f"[__call] Request to {endpoint.name} failed: {e}")
+            raise e
+
+        endpoint.record_success(time.monotonic() - start_time)
+        return response
@@ -1,10 +1,10 @@
 import asyncpg
 import logging
-import asyncio
 import json
-from asyncpg.exceptions import UniqueViolationError
 from datetime import datetime, timezone
-from aio_pika import Message, connect
+from outbox import add_outbox_messages
+from publisher import get_publisher
+from stages import DB_STAGE, PUBLISH_STAGE, stage_limiter
 
 
 class StoreSales:
@@ -21,139 +21,184 @@ class StoreSales:
         block_number: int,
         block_timestamp: int,
         transaction_hash: str,
+        outbox: bool = False,
     ):
         self.__conn = conn
-        self.__rabbitmq_connection = rabbitmq_connection
-        self.__rabbitmq_axies_queue_name = rabbitmq_axies_queue_name
         self.__sales_list = sales_list
         self.__block_number = block_number
         self.__block_timestamp = block_timestamp
         self.__transaction_hash = transaction_hash
+        self.__publisher = get_publisher(rabbitmq_connection, rabbitmq_axies_queue_name)
+        self.__outbox = outbox
 
     async def add_to_db(self) -> None:
         """
-        Go through the list of sales and add each of them to the database.
+        Adds all the sales of the transaction to the database with one statement,
+        then sends a message to the axies queue for each sale, or writes it to the outbox.
         """
         if not self.__sales_list:
             logging.info("[add_to_db] Sales list is empty. No data to add to DB.")
             return
 
-        async with self.__conn.acquire() as conn:
-            for sale in self.__sales_list:
-                try:
-                    current_time_utc = datetime.now(timezone.utc)
-
-                    axie_sale = {
-                        "block_number": self.__block_number,
-                        "transaction_hash": self.__transaction_hash,
-                        "sale_date": self.__block_timestamp,
-                        "price_eth": sale["price_weth"],
-                        "axie_id": sale["axie_id"],
-                        "created_at": current_time_utc,
-                        "modified_at": current_time_utc,
-                    }
-
-                    try:
-                        await conn.execute(
-                            """
-                            INSERT INTO axie_sales(
-                                block_number,
-                                transaction_hash,
-                                sale_date,
-                                price_eth,
-                                axie_id,
-                                created_at,
-                                modified_at
-                            )
-                            VALUES (
-                                $1, $2, $3, $4, $5, $6, $7
-                            )
-                            """,
-                            *axie_sale.values(),
-                        )
-                        logging.info(f"[add_to_db] Added to DB Axie sale: {axie_sale}")
-                    except UniqueViolationError:
-                        logging.info(
-                            f"[add_to_db] This axie sale already exists in the database: {axie_sale}"
-                        )
-
-                    await self.__send_queue_message(axie_sale)
-
-                except Exception as e:
-                    logging.error(
-                        f"[add_to_db] An unexpected error occured while adding to DB Axie sale {axie_sale}: {e}"
-                    )
-                    raise e
+        axie_sales = self.__get_axie_sales()
+        try:
+            inserted_sales = await StoreSales.__store_axie_sales(
+                self.__conn, [(self, axie_sale) for axie_sale in axie_sales]
+            )
+        except Exception as e:
+            logging.error(
+                f"[add_to_db] An unexpected error occured while adding to DB the Axie sales of transaction {self.__transaction_hash}: {e}"
+            )
+            raise e
+        logging.info(
+            f"[add_to_db] Added {len(inserted_sales)} Axie sales to DB for transaction {self.__transaction_hash}, {len(axie_sales) - len(inserted_sales)} were already in the database."
+        )
 
         logging.info(
             f"[add_to_db] All sales were added to the database successfuly for transaction {self.__transaction_hash}."
         )
 
-    async def __send_queue_message(self, axie_sale) -> None:
+    @staticmethod
+    async def __insert_axie_sales(db_connection, axie_sales: list) -> set:
         """
-        For each sale, sends a message to axies queue.
+        Inserts the sales with one multi-row statement and returns the (transaction hash, Axie ID) of the new rows.
+        The sales already in the database are skipped, a failed insert would abort the whole DB transaction.
         """
-        max_retries = 3
-        retry_delay = 5  # seconds
-
-        for attempt in range(max_retries):
-            try:
-                message = {
-                    "transaction_hash": self.__transaction_hash,
-                    "sale_date": axie_sale["sale_date"],
-                    "axie_id": axie_sale["axie_id"],
-                }
-
-                # Send message to the Axies queue.
-                logging.info(
-                    f"[__send_queue_message] Sending message to axies queue for {axie_sale}."
-                )
+        columns = [
+            list(column) for column in zip(*(sale.values() for sale in axie_sales))
+        ]
+        rows = await db_connection.fetch(
+            """
+            INSERT INTO axie_sales(
+                block_number,
+                transaction_hash,
+                sale_date,
+                price_eth,
+                axie_id,
+                created_at,
+                modified_at
+            )
+            SELECT * FROM unnest(
+                $1::int[],
+                $2::text[],
+                $3::bigint[],
+                $4::double precision[],
+                $5::int[],
+                $6::timestamptz[],
+                $7::timestamptz[]
+            )
+            ON CONFLICT ON CONSTRAINT unique_axie_sale_transaction DO NOTHING
+            RETURNING transaction_hash, axie_id
+            """,
+            *columns,
+        )
+        return {(row["transaction_hash"], row["axie_id"]) for row in rows}
 
-                """
-                This allows to send messages while handling the sender that sometimes hangs for a long period of time.
-                """
-                await asyncio.wait_for(
-                    self.__send_message_with_sender(message),
-                    timeout=30,  # seconds
-                )
-                logging.info(f"[__send_queue_message] Sent message: {message}")
-                return
-            except asyncio.TimeoutError:
-                logging.warning(
-                    f"[__send_queue_message] TimeoutError occured while sending message to axies queue for {axie_sale}. Attempt {attempt + 1}/{max_retries}."
-                )
-            except Exception as e:
-                logging.error(
-                    f"[__send_queue_message] An unexpected error occurred while sending message to axies queue for {axie_sale}: {e}. Attempt {attempt + 1} of {max_retries}."
-                )
-                raise e
+    def __get_axie_sales(self) -> list:
+        """
+        Returns the rows to insert in the axie_sales table.
+        """
+        current_time_utc = datetime.now(timezone.utc)
+        return [
+            {
+                "block_number": self.__block_number,
+                "transaction_hash": self.__transaction_hash,
+                "sale_date": self.__block_timestamp,
+                "price_eth": sale["price_weth"],
+                "axie_id": sale["axie_id"],
+                "created_at": current_time_utc,
+                "modified_at": current_time_utc,
+            }
+            for sale in self.__sales_list
+        ]
+
+    @staticmethod
+    async def add_block_to_db(conn: asyncpg.Pool, store_sales_list: list) -> None:
+        """
+        Adds the sales of every transaction of a block, or of a batch of messages, to the database in one DB transaction,
+        then sends a message to the axies queue for each sale, or writes it to the outbox.
+        """
+        axie_sales = [
+            (store_sales, axie_sale)
+            for store_sales in store_sales_list
+            for axie_sale in store_sales.__get_axie_sales()
+        ]
+        if not axie_sales:
+            logging.info("[add_block_to_db] Sales list is empty. No data to add to DB.")
+            return
 
-            # Wait before retrying
-            await asyncio.sleep(retry_delay)
-            retry_delay *= 2  # Exponential backoff
+        inserted_sales = await StoreSales.__store_axie_sales(conn, axie_sales)
+        logging.info(
+            f"[add_block_to_db] Added {len(inserted_sales)} Axie sales to DB for block {axie_sales[0][1]['block_number']}, {len(axie_sales) - len(inserted_sales)} were already in the database."
+        )
 
-            if attempt == max_retries - 1:
-                logging.error(
-                    f"[__send_queue_message] Max retries reached. Failed to send message to axies queue for {axie_sale}."
-                )
-                raise Exception(
-                    f"Failed to send message to axies queue after {max_retries} attempts."
+    @staticmethod
+    async def __store_axie_sales(conn: asyncpg.Pool, axie_sales: list) -> set:
+        """
+        Adds the (StoreSales, sale) pairs to the database in one DB transaction and returns the keys of the new sales.
+        With the outbox, the messages of the new sales are written to the outbox in the same DB transaction
+        and sent by the outbox relay. Otherwise, a message is sent to the axies queue for each sale.
+        """
+        outbox = axie_sales[0][0].__outbox
+
+        async with stage_limiter.stage(DB_STAGE), conn.acquire() as db_connection:
+            async with db_connection.transaction():
+                inserted_sales = await StoreSales.__insert_axie_sales(
+                    db_connection, [axie_sale for _, axie_sale in axie_sales]
                 )
+                if outbox:
+                    # A sale already in the database had its message written to the outbox with it.
+                    await add_outbox_messages(
+                        db_connection,
+                        [
+                            store_sales.__create_queue_message(axie_sale)
+                            for store_sales, axie_sale in axie_sales
+                            if (axie_sale["transaction_hash"], axie_sale["axie_id"])
+                            in inserted_sales
+                        ],
+                    )
 
-    async def __send_message_with_sender(self, message: dict) -> None:
+        if not outbox:
+            # The message is also sent for the sales already in the database, their message may not have been sent the first time.
+            await StoreSales.__send_queue_messages(
+                [store_sales for store_sales, _ in axie_sales],
+                [axie_sale for _, axie_sale in axie_sales],
+            )
+
+        return inserted_sales
+
+    def __create_queue_message(self, axie_sale: dict) -> bytes:
         """
-        Send a message to the axies queue.
+        Creates the message sent to the axies queue for a sale.
         """
-        connection = await connect(self.__rabbitmq_connection)
-        async with connection:
-            channel = await connection.channel()
-            queue = await channel.declare_queue(
-                self.__rabbitmq_axies_queue_name, durable=True
-            )
+        message = {
+            "transaction_hash": self.__transaction_hash,
+            "sale_date": axie_sale["sale_date"],
+            "axie_id": axie_sale["axie_id"],
+        }
+        return json.dumps(message).encode("utf-8")
+
+    @staticmethod
+    async def __send_queue_messages(store_sales_list: list, axie_sales: list) -> None:
+        """
+        Sends a message to the axies queue for each sale, all in one batch on the shared publisher.
+        """
+        # Every StoreSales of a message publishes to the same queue.
+        publisher = store_sales_list[0].__publisher
+        bodies = [
+            store_sales.__create_queue_message(axie_sale)
+            for store_sales, axie_sale in zip(store_sales_list, axie_sales)
+        ]
 
-            # Publish the message to the queue.
-            await channel.default_exchange.publish(
-                Message(json.dumps(message).encode("utf-8")),
-                routing_key=queue.name,
+        logging.info(
+            f"[__send_queue_messages] Sending {len(bodies)} messages to axies queue..."
+        )
+        try:
+            async with stage_limiter.stage(PUBLISH_STAGE):
+                await publisher.publish_batch(bodies)
+        except Exception as e:
+            logging.error(
+                f"[__send_queue_messages] An unexpected error occurred while sending {len(bodies)} messages to axies queue: {e}"
             )
-            logging.info(f"Message sent to axies queue: {message}")
+            raise e
+        logging.info(f"[__send_queue_messages] Sent {len(bodies)} messages.")
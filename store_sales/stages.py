@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
+from config import Config
+
+RPC_STAGE = "rpc"
+DB_STAGE = "db"
+PUBLISH_STAGE = "publish"
+
+
+class StageLimiter:
+    """
+    Limits the number of concurrent operations of each stage of the message processing (RPC, DB and publish),
+    so each one can be tuned to the node rate limit, the DB pool size and the broker.
+    It keeps a gauge of the operations in flight and waiting for each stage.
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.__semaphores = {
+            stage: asyncio.Semaphore(limit) for stage, limit in limits.items()
+        }
+        self.__in_flight = {stage: 0 for stage in limits}
+        self.__waiting = {stage: 0 for stage in limits}
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """
+        Waits for a slot of the stage and holds it until the end of the block.
+        """
+        semaphore = self.__semaphores[name]
+
+        self.__waiting[name] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.__waiting[name] -= 1
+
+        self.__in_flight[name] += 1
+        try:
+            yield
+        finally:
+            self.__in_flight[name] -= 1
+            semaphore.release()
+
+    def in_flight(self) -> dict[str, int]:
+        return dict(self.__in_flight)
+
+    def waiting(self) -> dict[str, int]:
+        return dict(self.__waiting)
+
+
+stage_limiter = StageLimiter(
+    {
+        RPC_STAGE: Config.get_rpc_concurrency(),
+        DB_STAGE: Config.get_db_concurrency(),
+        PUBLISH_STAGE: Config.get_publish_concurrency(),
+    }
+)
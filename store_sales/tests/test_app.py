@@ -19,7 +19,7 @@ os.environ["PG_DATABASE"] = "axie_market"
 os.environ["NODE_PROVIDER"] = "https://ronin-mainnet.g.alchemy.com/v2/mock_key"
 
 
-from app import process_message, init_dependencies
+from app import process_batch, process_message, init_dependencies
 from config import Config
 
 
@@ -126,3 +126,170 @@ async def test_function_app(
     conn.assert_called_once()
     mock_add_to_db_instance.add_to_db.assert_called_once()
     mock_transaction_instance.process_logs.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_function_app_block_message(
+    mocker,
+    conn,
+    w3,
+    rabbitmq,
+):
+    # Mock the block-level RabbitMQ message.
+    rabbitmq_message = mocker.MagicMock()
+    rabbitmq_message.body = b'{"blockNumber": 44153279, "blockTimestamp": 1712773221, "transactionHashes": ["0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb", "0x6e74a5ffc57de196ec3bf733f59df20ff786e94d9f490afbf44a443908443200"]}'
+    rabbitmq_message.ack = mocker.AsyncMock()
+
+    # Mock Transaction.process_block
+    mock_transaction = mocker.patch(
+        "app.Transaction",
+        autospec=True,
+    )
+    mock_transaction_instance = mock_transaction.return_value
+    mock_transaction_instance.process_block.return_value = {
+        "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb": [
+            {
+                "price_weth": 0.001836535870831618,
+                "axie_id": 11649154,
+            }
+        ],
+        "0x6e74a5ffc57de196ec3bf733f59df20ff786e94d9f490afbf44a443908443200": [],
+    }
+
+    # Mock StoreSales.add_block_to_db
+    mock_add_block_to_db = mocker.patch(
+        "app.StoreSales.add_block_to_db", new_callable=mocker.AsyncMock
+    )
+
+    await init_dependencies()
+    await process_message(rabbitmq_message)
+
+    mock_transaction_instance.process_block.assert_called_once()
+    mock_transaction_instance.process_logs.assert_not_called()
+    mock_add_block_to_db.assert_called_once()
+    # Only the transactions with sales are stored.
+    assert len(mock_add_block_to_db.call_args[0][1]) == 1
+    rabbitmq_message.ack.assert_called_once()
+
+
+# Mock a message of the batch for a single transaction.
+def create_message(mocker, transaction_hash: str):
+    rabbitmq_message = mocker.MagicMock()
+    rabbitmq_message.body = (
+        f'{{"blockNumber": 44153279, "blockTimestamp": 1712773221, "transactionHash": "{transaction_hash}"}}'
+    ).encode("utf-8")
+    rabbitmq_message.ack = mocker.AsyncMock()
+    rabbitmq_message.nack = mocker.AsyncMock()
+    return rabbitmq_message
+
+
+@pytest.mark.asyncio
+async def test_function_app_batch(
+    mocker,
+    conn,
+    w3,
+    rabbitmq,
+):
+    transaction_hashes = [
+        "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb",
+        "0x6e74a5ffc57de196ec3bf733f59df20ff786e94d9f490afbf44a443908443200",
+    ]
+    messages = [
+        create_message(mocker, transaction_hash)
+        for transaction_hash in transaction_hashes
+    ]
+
+    # Mock Transaction.process_logs
+    mock_transaction = mocker.patch(
+        "app.Transaction",
+        autospec=True,
+    )
+    mock_transaction_instance = mock_transaction.return_value
+    mock_transaction_instance.process_logs.return_value = [
+        {
+            "price_weth": 0.001836535870831618,
+            "axie_id": 11649154,
+        }
+    ]
+
+    # Mock StoreSales.add_block_to_db
+    mock_add_block_to_db = mocker.patch(
+        "app.StoreSales.add_block_to_db", new_callable=mocker.AsyncMock
+    )
+
+    await init_dependencies()
+    await process_batch(messages)
+
+    assert mock_transaction_instance.process_logs.call_count == 2
+    # The sales of the whole batch are stored together.
+    mock_add_block_to_db.assert_called_once()
+    assert len(mock_add_block_to_db.call_args[0][1]) == 2
+    # The whole batch is acknowledged with the last message.
+    messages[0].ack.assert_not_called()
+    messages[1].ack.assert_called_once_with(multiple=True)
+
+
+@pytest.mark.asyncio
+async def test_function_app_batch_failure(
+    mocker,
+    conn,
+    w3,
+    rabbitmq,
+):
+    transaction_hashes = [
+        "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb",
+        "0x6e74a5ffc57de196ec3bf733f59df20ff786e94d9f490afbf44a443908443200",
+    ]
+    messages = [
+        create_message(mocker, transaction_hash)
+        for transaction_hash in transaction_hashes
+    ]
+
+    # The first transaction fails, the second one has no sales.
+    async def process_logs(transaction_hash, block_number):
+        if transaction_hash == transaction_hashes[0]:
+            raise Exception("RPC error")
+        return []
+
+    mock_transaction = mocker.patch(
+        "app.Transaction",
+        autospec=True,
+    )
+    mock_transaction.return_value.process_logs.side_effect = process_logs
+
+    await init_dependencies()
+    await process_batch(messages)
+
+    # The messages are processed one by one, only the failing one is requeued.
+    messages[0].nack.assert_called_once_with(requeue=True)
+    messages[1].ack.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_function_app_retry(
+    mocker,
+    conn,
+    w3,
+    rabbitmq,
+):
+    rabbitmq_message = create_message(
+        mocker, "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb"
+    )
+
+    mock_transaction = mocker.patch(
+        "app.Transaction",
+        autospec=True,
+    )
+    error = Exception("RPC error")
+    mock_transaction.return_value.process_logs.side_effect = error
+
+    # Mock the retry queues declared when the app starts consuming.
+    mock_retry_queues = mocker.patch("app.retry_queues")
+    mock_retry_queues.retry = mocker.AsyncMock()
+
+    await init_dependencies()
+    await process_message(rabbitmq_message)
+
+    # The failed message is sent to a delay queue instead of being requeued right away.
+    mock_retry_queues.retry.assert_called_once_with(rabbitmq_message, error)
+    rabbitmq_message.nack.assert_not_called()
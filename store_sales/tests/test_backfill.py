@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from hexbytes import HexBytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from backfill import Backfill, TRANSFER_TOPIC
+
+
+# Mock a Transfer log of the Axie proxy contract.
+def create_log(block_number: int) -> dict:
+    return {
+        "blockNumber": block_number,
+        "transactionHash": HexBytes(f"0x{block_number:064x}"),
+    }
+
+
+# Mock the Web3 instance, the node returns an error for the ranges of more than max_range blocks.
+@pytest.fixture
+def w3(mocker):
+    def create_w3(logs_blocks: list[int], max_range: int = 1000):
+        async def get_logs(filter_params):
+            if filter_params["toBlock"] - filter_params["fromBlock"] + 1 > max_range:
+                raise ValueError("Query returned more than 10000 results")
+            return [
+                create_log(block_number)
+                for block_number in logs_blocks
+                if filter_params["fromBlock"]
+                <= block_number
+                <= filter_params["toBlock"]
+            ]
+
+        w3 = mocker.AsyncMock()
+        w3.eth.get_logs = mocker.AsyncMock(side_effect=get_logs)
+        w3.eth.get_block.return_value = {"timestamp": 1712773221}
+        return w3
+
+    return create_w3
+
+
+# Mock the database pool, without a checkpoint for the backfill.
+@pytest.fixture
+def conn(mocker):
+    conn = mocker.AsyncMock()
+    conn.fetchval.return_value = None
+    return conn
+
+
+# Mock the transactions, every transaction found has one sale.
+@pytest.fixture
+def transaction(mocker):
+    mock_transaction = mocker.patch("backfill.Transaction", autospec=True)
+    mock_transaction.return_value.process_block.side_effect = (
+        lambda block_number, transaction_hashes: {
+            transaction_hash: [{"price_weth": 0.01, "axie_id": block_number}]
+            for transaction_hash in transaction_hashes
+        }
+    )
+    return mock_transaction.return_value
+
+
+@pytest.fixture
+def add_block_to_db(mocker):
+    mocker.patch("backfill.StoreSales.__init__", return_value=None)
+    return mocker.patch(
+        "backfill.StoreSales.add_block_to_db", new_callable=mocker.AsyncMock
+    )
+
+
+# Test that every block of the range is scanned once and the sales found are stored.
+@pytest.mark.asyncio
+async def test_backfill(w3, conn, transaction, add_block_to_db):
+    w3 = w3([100, 150, 150, 999])
+    backfill = Backfill(conn, w3, 100, 999, chunk_size=200, concurrency=2)
+
+    assert await backfill.run() == 3
+
+    scanned_blocks = sorted(
+        (call.args[0]["fromBlock"], call.args[0]["toBlock"])
+        for call in w3.eth.get_logs.call_args_list
+    )
+    assert scanned_blocks[0][0] == 100
+    assert scanned_blocks[-1][1] == 999
+    assert all(
+        previous[1] + 1 == current[0]
+        for previous, current in zip(scanned_blocks, scanned_blocks[1:])
+    )
+    assert all(
+        call.args[0]["topics"] == [TRANSFER_TOPIC]
+        for call in w3.eth.get_logs.call_args_list
+    )
+    # A transaction with many Transfer logs is processed once.
+    assert transaction.process_block.call_count == 3
+    assert sum(len(call.args[1]) for call in add_block_to_db.call_args_list) == 3
+
+    # The checkpoint ends after the last block of the range.
+    assert conn.execute.call_args[0][1:5] == (
+        "0x32950db2a7164ae833121501c797d79e7b79d74c-100",
+        100,
+        999,
+        1000,
+    )
+
+
+# Test that a range the node refuses is split and the next chunks are smaller.
+@pytest.mark.asyncio
+async def test_backfill_adaptive_chunk_size(w3, conn, transaction, add_block_to_db):
+    w3 = w3([500], max_range=300)
+    backfill = Backfill(conn, w3, 0, 999, chunk_size=1000, concurrency=1)
+
+    assert await backfill.run() == 1
+
+    successful_ranges = [
+        call.args[0]["toBlock"] - call.args[0]["fromBlock"] + 1
+        for call in w3.eth.get_logs.call_args_list
+        if call.args[0]["toBlock"] - call.args[0]["fromBlock"] + 1 <= 300
+    ]
+    assert sum(successful_ranges) == 1000
+    assert conn.execute.call_args[0][4] == 1000
+
+
+# Test that a backfill resumes from its checkpoint.
+@pytest.mark.asyncio
+async def test_backfill_resume(w3, conn, transaction, add_block_to_db):
+    conn.fetchval.return_value = 900
+    w3 = w3([100, 950])
+
+    assert await Backfill(conn, w3, 100, 999, concurrency=1).run() == 1
+
+    w3.eth.get_logs.assert_called_once()
+    assert w3.eth.get_logs.call_args[0][0]["fromBlock"] == 900
+
+
+# Test that the other workers are cancelled when a worker fails.
+@pytest.mark.asyncio
+async def test_backfill_worker_failure(mocker, conn, transaction, add_block_to_db):
+    cancelled = asyncio.Event()
+
+    async def get_logs(filter_params):
+        if filter_params["fromBlock"] == 0:
+            raise ValueError("Node error")
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    w3 = mocker.AsyncMock()
+    w3.eth.get_logs = mocker.AsyncMock(side_effect=get_logs)
+    backfill = Backfill(conn, w3, 0, 1, chunk_size=1, concurrency=2)
+
+    with pytest.raises(ExceptionGroup):
+        await asyncio.wait_for(backfill.run(), timeout=1)
+    assert cancelled.is_set()
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from consumer import ConsumerEngine
+from stages import StageLimiter
+
+
+# Mock a queue delivering the given messages to the consumer callback.
+@pytest.fixture
+def queue(mocker):
+    def create_queue(messages):
+        async def consume(callback):
+            for message in messages:
+                await callback(message)
+
+        queue = mocker.AsyncMock()
+        queue.consume.side_effect = consume
+        return queue
+
+    return create_queue
+
+
+# Test that the messages are processed by at most concurrency workers at a time.
+@pytest.mark.asyncio
+async def test_consumer_engine_concurrency(queue):
+    processed = []
+    running = 0
+    max_running = 0
+    all_processed = asyncio.Event()
+
+    async def handler(message):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        processed.append(message)
+        if len(processed) == 10:
+            all_processed.set()
+
+    engine = ConsumerEngine(handler, concurrency=3, gauge_interval=0)
+    consume_task = asyncio.create_task(engine.consume(queue(list(range(10)))))
+
+    await asyncio.wait_for(all_processed.wait(), timeout=1)
+    consume_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consume_task
+
+    assert sorted(processed) == list(range(10))
+    assert max_running == 3
+
+
+# Test that an error raised by the handler doesn't stop the worker.
+@pytest.mark.asyncio
+async def test_consumer_engine_handler_error(queue):
+    processed = []
+
+    async def handler(message):
+        if message == 0:
+            raise ValueError("Handler error")
+        processed.append(message)
+
+    engine = ConsumerEngine(handler, concurrency=1, gauge_interval=0)
+    consume_task = asyncio.create_task(engine.consume(queue([0, 1])))
+    await asyncio.sleep(0.01)
+    consume_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consume_task
+
+    assert processed == [1]
+    assert engine.in_flight()["messages"] == 0
+
+
+# Test that the stage limiter limits each stage and reports the operations in flight and waiting.
+@pytest.mark.asyncio
+async def test_stage_limiter():
+    limiter = StageLimiter({"rpc": 1, "db": 2})
+    release = asyncio.Event()
+
+    async def run_stage(name):
+        async with limiter.stage(name):
+            await release.wait()
+
+    tasks = [
+        asyncio.create_task(run_stage(name)) for name in ["rpc", "rpc", "db", "db"]
+    ]
+    await asyncio.sleep(0.01)
+
+    assert limiter.in_flight() == {"rpc": 1, "db": 2}
+    assert limiter.waiting() == {"rpc": 1, "db": 0}
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert limiter.in_flight() == {"rpc": 0, "db": 0}
+
+
+# Test that in micro-batching mode, the messages are passed to the handler in batches of at most batch_size.
+@pytest.mark.asyncio
+async def test_consumer_engine_batches(queue):
+    batches = []
+    all_processed = asyncio.Event()
+
+    async def handler(messages):
+        batches.append(messages)
+        if sum(len(batch) for batch in batches) == 5:
+            all_processed.set()
+
+    engine = ConsumerEngine(handler, gauge_interval=0, batch_size=2, batch_window=0.01)
+    consume_task = asyncio.create_task(engine.consume(queue(list(range(5)))))
+
+    await asyncio.wait_for(all_processed.wait(), timeout=1)
+    consume_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consume_task
+
+    # The last batch is sent once the batch window is over.
+    assert batches == [[0, 1], [2, 3], [4]]
+    assert engine.in_flight()["messages"] == 0
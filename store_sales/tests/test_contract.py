@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import sys
 import asyncpg
@@ -112,17 +113,19 @@ async def test_get_contract_data_exists_in_db(mocker, conn, w3):
         {
             "contract_name": "ProxyContract",
             "is_proxy": True,
-            "abi": "[]",
             "implementation_address": "0xabcdefabcdefabcdefabcdefabcdefabcdefabcd",
+            "events_indexed": True,
         },
         {
             "contract_name": "ImplementationContract",
             "is_proxy": False,
-            "abi": "[]",
             "implementation_address": None,
+            "events_indexed": True,
         },
     ]
 
+    db_connection.fetch.return_value = []
+
     # Create contract instance.
     contract = await Contract.create(
         conn, w3, "0x1234567890abcdef1234567890abcdef12345678", None
@@ -157,8 +160,8 @@ async def test_get_contract_data_not_in_db(mocker, conn, w3):
         {
             "contract_name": "TestContract",
             "is_proxy": False,
-            "abi": "[]",
             "implementation_address": None,
+            "events_indexed": True,
         },
     ]
 
@@ -253,6 +256,12 @@ async def test_add_contract_data(mocker, conn, w3, is_new_contract):
         )
     )
 
+    # Mock the transaction adding the contract and its events.
+    transaction_cm = mocker.MagicMock()
+    transaction_cm.__aenter__ = mocker.AsyncMock(return_value=None)
+    transaction_cm.__aexit__ = mocker.AsyncMock(return_value=None)
+    conn.transaction = mocker.MagicMock(return_value=transaction_cm)
+
     contract = Contract(conn, w3, "0x1234567890abcdef1234567890abcdef12345678")
 
     if is_new_contract:
@@ -264,28 +273,31 @@ async def test_add_contract_data(mocker, conn, w3, is_new_contract):
             "abi": "[]",
             "is_contract_proxy": True,
             "implementation_address": "0xabcdefabcdefabcdefabcdefabcdefabcdefabcd",
+            "events_indexed": True,
             "created_at": mock_current_time,
             "modified_at": mock_current_time,
         }
 
         # The indentation of the query string is important to match the expected format.
         conn.execute.assert_called_once_with(
-                    """
-                    INSERT INTO contracts(
-                        contract_address,
-                        contract_name,
-                        abi,
-                        is_proxy,
-                        implementation_address,
-                        created_at,
-                        modified_at                      
-                    )
-                    VALUES (
-                        $1, $2, $3, $4, $5, $6, $7
-                    )
-                    """,
+                        """
+                        INSERT INTO contracts(
+                            contract_address,
+                            contract_name,
+                            abi,
+                            is_proxy,
+                            implementation_address,
+                            events_indexed,
+                            created_at,
+                            modified_at
+                        )
+                        VALUES (
+                            $1, $2, $3, $4, $5, $6, $7, $8
+                        )
+                        """,
             *contract_data.values(),
         )
+        conn.transaction.assert_called_once()
     else:
         # Mock conn.execute to raise a unique violation error
         conn.execute.side_effect = asyncpg.exceptions.UniqueViolationError(
@@ -343,6 +355,9 @@ def test_get_event_name(mocker, abi, topic_hash, expected_event_name):
     )
     implementation_contract._Contract__is_proxy = False
     implementation_contract._Contract__abi = abi
+    implementation_contract._Contract__events_by_topic = {
+        "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef": "Transfer"
+    }
 
     # Mock Web3 contract for the implementation contract.
     implementation_contract._Contract__contract = (
@@ -377,6 +392,9 @@ def test_get_event_data(mocker, abi):
     )
     implementation_contract._Contract__is_proxy = False
     implementation_contract._Contract__abi = abi
+    implementation_contract._Contract__events_by_topic = {
+        "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef": "Transfer"
+    }
 
     # Mock Web3 contract for the implementation contract.
     implementation_contract._Contract__contract = (
@@ -461,6 +479,9 @@ def test_get_event_signature_hash(mocker, abi, event_name, expected_signature_ha
     )
     implementation_contract._Contract__is_proxy = False
     implementation_contract._Contract__abi = abi
+    implementation_contract._Contract__events_by_topic = {
+        "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef": "Transfer"
+    }
 
     # Mock Web3 contract for the implementation contract.
     implementation_contract._Contract__contract = (
@@ -482,3 +503,200 @@ def test_get_event_signature_hash(mocker, abi, event_name, expected_signature_ha
     else:
         with pytest.raises(EventNotFoundError):
             proxy_contract.get_event_signature_hash(event_name)
+
+
+# Test that concurrent calls to Contract.create for the same address share one creation.
+@pytest.mark.asyncio
+async def test_create_single_flight(mocker, conn, w3):
+    async def get_contract_data(*args):
+        await asyncio.sleep(0.01)
+
+    mock_get_contract_data = mocker.patch(
+        "contract.Contract._Contract__get_contract_data", side_effect=get_contract_data
+    )
+
+    contracts = await asyncio.gather(
+        *[
+            Contract.create(conn, w3, "0x1234567890abcdef1234567890abcdef12345678")
+            for _ in range(5)
+        ]
+    )
+
+    assert all(contract is contracts[0] for contract in contracts)
+    mock_get_contract_data.assert_called_once()
+
+    # Once the creation is done, the next call creates the contract again.
+    await Contract.create(conn, w3, "0x1234567890abcdef1234567890abcdef12345678")
+    assert mock_get_contract_data.call_count == 2
+
+
+# Test the Contract.__add_contract_data_with_lock method.
+@pytest.mark.parametrize("added_by_another_replica", [True, False])
+@pytest.mark.asyncio
+async def test_add_contract_data_with_lock(mocker, conn, w3, added_by_another_replica):
+    db_connection = await conn.acquire().__aenter__()
+    db_connection.fetchrow.side_effect = [
+        None,
+        {"contract_name": "TestContract"} if added_by_another_replica else None,
+        {
+            "contract_name": "TestContract",
+            "is_proxy": False,
+            "implementation_address": None,
+            "events_indexed": True,
+        },
+    ]
+    mock_add_contract_data = mocker.patch.object(
+        Contract, "_Contract__add_contract_data", new_callable=mocker.AsyncMock
+    )
+
+    contract = await Contract.create(
+        conn, w3, "0x1234567890abcdef1234567890abcdef12345678", advisory_lock=True
+    )
+
+    assert contract._Contract__name == "TestContract"
+    assert mock_add_contract_data.call_count == (0 if added_by_another_replica else 1)
+    contract_address = Web3.to_checksum_address(
+        "0x1234567890abcdef1234567890abcdef12345678"
+    )
+    assert db_connection.execute.call_args_list == [
+        mocker.call(
+            "SELECT pg_advisory_lock(hashtextextended($1, 0))", contract_address
+        ),
+        mocker.call(
+            "SELECT pg_advisory_unlock(hashtextextended($1, 0))", contract_address
+        ),
+    ]
+
+
+# Test the Contract.__get_contract_data method loading the events of the contract from contract_events.
+@pytest.mark.asyncio
+async def test_get_contract_data_events(conn, abi):
+    db_connection = await conn.acquire().__aenter__()
+    db_connection.fetchrow.return_value = {
+        "contract_name": "TestContract",
+        "is_proxy": False,
+        "implementation_address": None,
+        "events_indexed": True,
+    }
+    transfer_abi = json.loads(abi)[0]
+    db_connection.fetch.return_value = [
+        {
+            "topic0": "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef",
+            "event_name": "Transfer",
+            "abi_fragment": json.dumps(transfer_abi),
+        }
+    ]
+
+    contract = await Contract.create(
+        conn, Web3(), "0x1234567890abcdef1234567890abcdef12345678"
+    )
+
+    contract_address = Web3.to_checksum_address(
+        "0x1234567890abcdef1234567890abcdef12345678"
+    )
+    db_connection.fetch.assert_called_once_with(
+        "SELECT topic0, event_name, abi_fragment FROM contract_events WHERE contract_address = $1",
+        contract_address,
+    )
+    assert contract._Contract__abi == [transfer_abi]
+    assert contract.get_event_abi("Transfer") == transfer_abi
+    assert (
+        contract.get_event_name(
+            HexBytes(
+                "0xDDF252AD1BE2C89B69C2B068FC378DAA952BA7F163C4A11628F55A4DF523B3EF"
+            )
+        )
+        == "Transfer"
+    )
+    with pytest.raises(Web3ValueError):
+        contract.get_event_name(
+            "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925"
+        )
+
+
+# Test the Contract.__add_contract_data method adding the events of the ABI to contract_events.
+@pytest.mark.asyncio
+async def test_add_contract_data_events(mocker, conn, w3, abi):
+    mock_http_session = mocker.patch("aiohttp.ClientSession")
+    mock_http_client_instance = mock_http_session.return_value
+    mock_http_client_instance.__aenter__.return_value = mock_http_client_instance
+    mock_http_client_instance.__aexit__.return_value = None
+
+    anonymous_event_abi = {
+        "anonymous": True,
+        "inputs": [],
+        "name": "Anonymous",
+        "type": "event",
+    }
+    function_abi = {"inputs": [], "name": "name", "outputs": [], "type": "function"}
+    contract_abi = json.loads(abi) + [anonymous_event_abi, function_abi]
+
+    mock_abi_response = mocker.AsyncMock()
+    mock_abi_response.__aenter__.return_value.json.return_value = {
+        "result": {"output": {"abi": contract_abi}}
+    }
+    mock_contract_response = mocker.AsyncMock()
+    mock_contract_response.__aenter__.return_value.json.return_value = {
+        "result": {"contract": {"verifiedName": "TestContract"}}
+    }
+    mock_http_client_instance.__aenter__.return_value.get.side_effect = [
+        mock_abi_response,
+        mock_contract_response,
+    ]
+    w3.eth.get_storage_at = mocker.AsyncMock(return_value=bytes(32))
+
+    transaction_cm = mocker.MagicMock()
+    transaction_cm.__aenter__ = mocker.AsyncMock(return_value=None)
+    transaction_cm.__aexit__ = mocker.AsyncMock(return_value=None)
+    conn.transaction = mocker.MagicMock(return_value=transaction_cm)
+
+    contract = Contract(conn, w3, "0x1234567890abcdef1234567890abcdef12345678")
+    await contract._Contract__add_contract_data(conn)
+
+    assert conn.execute.call_count == 2
+    assert json.loads(conn.execute.call_args_list[0].args[3]) == contract_abi
+    events_call = conn.execute.call_args_list[1]
+    assert "INSERT INTO contract_events" in events_call.args[0]
+    assert events_call.args[1:] == (
+        contract._Contract__contract_address,
+        ["0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"],
+        ["Transfer"],
+        [json.dumps(json.loads(abi)[0])],
+    )
+
+
+# Test the Contract.__get_contract_data method adding the events of a contract stored before contract_events existed.
+@pytest.mark.asyncio
+async def test_get_contract_data_index_events(mocker, conn, abi):
+    db_connection = await conn.acquire().__aenter__()
+    db_connection.fetchrow.return_value = {
+        "contract_name": "TestContract",
+        "is_proxy": False,
+        "implementation_address": None,
+        "events_indexed": False,
+    }
+    # The ABI declares the Transfer event twice, the duplicate is ignored by the insert.
+    db_connection.fetchval.return_value = json.dumps(json.loads(abi) * 2)
+    transaction_cm = mocker.MagicMock()
+    transaction_cm.__aenter__ = mocker.AsyncMock(return_value=None)
+    transaction_cm.__aexit__ = mocker.AsyncMock(return_value=None)
+    db_connection.transaction = mocker.MagicMock(return_value=transaction_cm)
+
+    await Contract.create(conn, Web3(), "0x1234567890abcdef1234567890abcdef12345678")
+
+    contract_address = Web3.to_checksum_address(
+        "0x1234567890abcdef1234567890abcdef12345678"
+    )
+    db_connection.fetchval.assert_called_once_with(
+        "SELECT abi FROM contracts WHERE contract_address = $1", contract_address
+    )
+    events_call, update_call = db_connection.execute.call_args_list
+    assert "ON CONFLICT (contract_address, topic0) DO NOTHING" in events_call.args[0]
+    assert events_call.args[2] == [
+        "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+    ] * 2
+    assert update_call == mocker.call(
+        "UPDATE contracts SET events_indexed = true WHERE contract_address = $1",
+        contract_address,
+    )
+    db_connection.transaction.assert_called_once()
@@ -0,0 +1,79 @@
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from contract import Contract
+from contract_registry import ContractRegistry
+
+
+@pytest.fixture
+def conn(mocker):
+    return mocker.AsyncMock()
+
+
+@pytest.fixture
+def w3(mocker):
+    return mocker.AsyncMock()
+
+
+# Test that a contract is only created once while it is in the registry.
+@pytest.mark.asyncio
+async def test_get_contract_from_registry(mocker, conn, w3):
+    mock_contract = mocker.MagicMock()
+    mocker.patch.object(Contract, "create", return_value=mock_contract)
+
+    registry = ContractRegistry(ttl=3600)
+    first_contract = await registry.get(
+        conn, w3, "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5"
+    )
+    second_contract = await registry.get(
+        conn, w3, "0xC99A6A985ED2CAC1EF41640596C5A5F9F4E19EF5"
+    )
+
+    assert first_contract is mock_contract
+    assert second_contract is mock_contract
+    assert registry.size() == 1
+    Contract.create.assert_called_once_with(
+        conn, w3, "0xc99a6A985eD2Cac1ef41640596C5A5f9F4E19Ef5", advisory_lock=False
+    )
+
+
+# Test that a contract is created again once it expired or was invalidated.
+@pytest.mark.parametrize("invalidate_all", [True, False])
+@pytest.mark.asyncio
+async def test_contract_registry_expiry_and_invalidation(
+    mocker, conn, w3, invalidate_all
+):
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock() for _ in range(3)]
+    )
+    mock_monotonic = mocker.patch("contract_registry.time.monotonic", return_value=0)
+    contract_address = "0x32950db2a7164ae833121501c797d79e7b79d74c"
+
+    registry = ContractRegistry(ttl=60)
+    first_contract = await registry.get(conn, w3, contract_address)
+
+    mock_monotonic.return_value = 61
+    second_contract = await registry.get(conn, w3, contract_address)
+    assert second_contract is not first_contract
+
+    registry.invalidate(None if invalidate_all else contract_address)
+    assert registry.size() == 0
+    third_contract = await registry.get(conn, w3, contract_address)
+    assert third_contract is not second_contract
+    assert Contract.create.call_count == 3
+
+
+# Test that a contract never expires when the ttl is 0.
+@pytest.mark.asyncio
+async def test_contract_registry_without_ttl(mocker, conn, w3):
+    mocker.patch.object(Contract, "create", return_value=mocker.MagicMock())
+    mock_monotonic = mocker.patch("contract_registry.time.monotonic", return_value=0)
+
+    registry = ContractRegistry(ttl=0)
+    await registry.get(conn, w3, "0x32950db2a7164ae833121501c797d79e7b79d74c")
+    mock_monotonic.return_value = 10**9
+    await registry.get(conn, w3, "0x32950db2a7164ae833121501c797d79e7b79d74c")
+
+    Contract.create.assert_called_once()
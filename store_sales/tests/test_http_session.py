@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+from aiohttp import web
+from web3 import AsyncWeb3
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from http_session import create_http_session, get_http_pool_stats, get_request_timeout
+
+
+# Start a local node answering every request with the latest block number.
+@pytest_asyncio.fixture
+async def node_url():
+    async def handle(request):
+        body = await request.json()
+        return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": "0x10"})
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/"
+    await runner.cleanup()
+
+
+# Test that the provider uses the shared session and keeps its connections alive between requests.
+@pytest.mark.asyncio
+async def test_provider_reuses_connections(node_url):
+    session = create_http_session(limit_per_host=2)
+    provider = AsyncWeb3.AsyncHTTPProvider(
+        node_url, request_kwargs={"timeout": get_request_timeout(total=5, connect=1)}
+    )
+    await provider.cache_async_session(session)
+    w3 = AsyncWeb3(provider)
+
+    try:
+        block_numbers = await asyncio.gather(*[w3.eth.block_number for _ in range(10)])
+
+        assert block_numbers == [16] * 10
+        # At most limit_per_host connections were opened, and they stay open for the next requests.
+        assert get_http_pool_stats(session) == {"in_use": 0, "idle": 2, "waiting": 0}
+    finally:
+        await session.close()
+
+    assert get_http_pool_stats(session) == {"in_use": 0, "idle": 0, "waiting": 0}
@@ -0,0 +1,176 @@
+import pytest
+import sys
+from pathlib import Path
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from hexbytes import HexBytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from contract import Contract
+from log_decoder import TransferLogDecoder
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def create_contract(mocker, contract_address: str, indexed: list[bool]) -> Contract:
+    names = ["_from", "_to", "_tokenId" if all(indexed) else "_value"]
+    abi = [
+        {
+            "anonymous": False,
+            "inputs": [
+                {"indexed": is_indexed, "name": name, "type": input_type}
+                for is_indexed, name, input_type in zip(
+                    indexed, names, ["address", "address", "uint256"]
+                )
+            ],
+            "name": "Transfer",
+            "type": "event",
+        }
+    ]
+
+    contract = Contract(mocker.Mock(), Web3(), contract_address)
+    contract._Contract__is_proxy = False
+    contract._Contract__abi = abi
+    contract._Contract__events_by_topic = {
+        Web3.to_hex(event_abi_to_log_topic(abi[0])): "Transfer"
+    }
+    contract._Contract__contract = contract._Contract__w3.eth.contract(
+        address=contract._Contract__contract_address, abi=abi
+    )
+    return contract
+
+
+@pytest.fixture
+def weth_contract(mocker):
+    return create_contract(
+        mocker, "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5", [True, True, False]
+    )
+
+
+@pytest.fixture
+def axie_contract(mocker):
+    return create_contract(
+        mocker, "0x32950db2a7164ae833121501c797d79e7b79d74c", [True, True, True]
+    )
+
+
+@pytest.fixture
+def weth_log():
+    return AttributeDict(
+        {
+            "address": "0xc99a6A985eD2Cac1ef41640596C5A5f9F4E19Ef5",
+            "topics": [
+                HexBytes(TRANSFER_TOPIC),
+                HexBytes(
+                    "0x000000000000000000000000f536ba5d2ba5f24fb35d8c9ee256753a5ae3d0c5"
+                ),
+                HexBytes(
+                    "0x000000000000000000000000fff9ce5f71ca6178d3beecedb61e7eff1602950e"
+                ),
+            ],
+            "data": HexBytes(
+                "0x00000000000000000000000000000000000000000000000000068651d432bc02"
+            ),
+            "blockNumber": 44153279,
+            "transactionHash": HexBytes(
+                "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb"
+            ),
+            "transactionIndex": 1,
+            "blockHash": HexBytes(
+                "0xf95b5c3227fc15c4c882f8287b490b99e629dc31dd015da2b7a9d6d4b0ee0f93"
+            ),
+            "logIndex": 2,
+            "removed": False,
+        }
+    )
+
+
+@pytest.fixture
+def axie_log():
+    return AttributeDict(
+        {
+            "address": "0x32950db2a7164aE833121501C797D79E7B79d74C",
+            "topics": [
+                HexBytes(TRANSFER_TOPIC),
+                HexBytes(
+                    "0x000000000000000000000000094300dacf0eed244664e326d27406f0b90b8809"
+                ),
+                HexBytes(
+                    "0x000000000000000000000000f536ba5d2ba5f24fb35d8c9ee256753a5ae3d0c5"
+                ),
+                HexBytes(
+                    "0x0000000000000000000000000000000000000000000000000000000000b1c082"
+                ),
+            ],
+            "data": HexBytes("0x"),
+            "blockNumber": 44153279,
+            "transactionHash": HexBytes(
+                "0xb05e64ab435371a5c4b6e23f416a37fec881419228db0e35d9b3549204f549eb"
+            ),
+            "transactionIndex": 1,
+            "blockHash": HexBytes(
+                "0xf95b5c3227fc15c4c882f8287b490b99e629dc31dd015da2b7a9d6d4b0ee0f93"
+            ),
+            "logIndex": 5,
+            "removed": False,
+        }
+    )
+
+
+# Test that the ERC20 and ERC721 Transfer logs are decoded like the ABI decodes them.
+@pytest.mark.parametrize("log_name", ["weth_log", "axie_log"])
+def test_decode_transfer_log(mocker, request, weth_contract, axie_contract, log_name):
+    log = request.getfixturevalue(log_name)
+    expected_contract = weth_contract if log_name == "weth_log" else axie_contract
+    mocker.spy(expected_contract, "get_event_data")
+
+    decoder = TransferLogDecoder([weth_contract, axie_contract])
+    contract, event_data = decoder.decode(log)
+
+    assert contract is expected_contract
+    assert event_data["args"] == dict(
+        expected_contract._Contract__contract.events.Transfer().process_log(log)["args"]
+    )
+    # The specialised decoder is used instead of the ABI.
+    expected_contract.get_event_data.assert_not_called()
+
+
+# Test that the logs of other contracts or events are not matched.
+def test_decode_unmatched_log(weth_contract, axie_contract, weth_log, axie_log):
+    decoder = TransferLogDecoder([weth_contract, axie_contract])
+
+    other_contract_log = AttributeDict(
+        {**weth_log, "address": "0xffF9Ce5f71ca6178D3BEEcEDB61e7Eff1602950E"}
+    )
+    other_event_log = AttributeDict(
+        {
+            **axie_log,
+            "topics": [
+                HexBytes(
+                    "0xcc2c68164f9f7f0c063ba98bcf89498c0f3f5e3acc32bf4ab46195ecb489c13b"
+                )
+            ],
+        }
+    )
+
+    assert decoder.decode(other_contract_log) is None
+    assert decoder.decode(other_event_log) is None
+    assert decoder.decode(AttributeDict({**weth_log, "topics": []})) is None
+
+
+# Test that a Transfer event with another layout is decoded with the ABI.
+def test_decode_with_abi_fallback(mocker, weth_log):
+    contract = create_contract(
+        mocker, "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5", [False, True, False]
+    )
+    mocker.patch.object(
+        contract, "get_event_data", return_value={"args": {"_value": 1}}
+    )
+
+    decoder = TransferLogDecoder([contract])
+    decoded_contract, event_data = decoder.decode(weth_log)
+
+    assert decoded_contract is contract
+    assert event_data == {"args": {"_value": 1}}
+    contract.get_event_data.assert_called_once_with(TRANSFER_TOPIC, weth_log)
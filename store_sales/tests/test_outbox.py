@@ -0,0 +1,89 @@
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from outbox import OutboxRelay, add_outbox_messages
+
+
+# Mock the database pool, with a connection whose DB transaction records if it was rolled back.
+@pytest.fixture
+def conn(mocker):
+    db_conn = mocker.AsyncMock()
+    db_conn.transaction = mocker.MagicMock()
+    db_conn.transaction.return_value.__aenter__ = mocker.AsyncMock()
+    db_conn.transaction.return_value.__aexit__ = mocker.AsyncMock(return_value=None)
+
+    acquire_cm = mocker.MagicMock()
+    acquire_cm.__aenter__ = mocker.AsyncMock(return_value=db_conn)
+    acquire_cm.__aexit__ = mocker.AsyncMock(return_value=None)
+
+    conn_instance = mocker.AsyncMock()
+    conn_instance.acquire = mocker.MagicMock(return_value=acquire_cm)
+    conn_instance.db_conn = db_conn
+    return conn_instance
+
+
+# Test that a batch of the outbox is published, then deleted.
+@pytest.mark.asyncio
+async def test_relay(mocker, conn):
+    conn.db_conn.fetch.return_value = [
+        {"id": 1, "payload": '{"axie_id": 11649154}'},
+        {"id": 2, "payload": '{"axie_id": 123456789}'},
+    ]
+    publisher = mocker.AsyncMock()
+    relay = OutboxRelay(conn, publisher, batch_size=2)
+
+    assert await relay.relay() == 2
+
+    query, batch_size = conn.db_conn.fetch.call_args[0]
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert batch_size == 2
+    publisher.publish_batch.assert_called_once_with(
+        [b'{"axie_id": 11649154}', b'{"axie_id": 123456789}']
+    )
+    query, ids = conn.db_conn.execute.call_args[0]
+    assert "DELETE FROM axie_sales_outbox" in query
+    assert ids == [1, 2]
+
+
+# Test that nothing is published when the outbox is empty.
+@pytest.mark.asyncio
+async def test_relay_empty_outbox(mocker, conn):
+    conn.db_conn.fetch.return_value = []
+    publisher = mocker.AsyncMock()
+
+    assert await OutboxRelay(conn, publisher).relay() == 0
+
+    publisher.publish_batch.assert_not_called()
+    conn.db_conn.execute.assert_not_called()
+
+
+# Test that the messages stay in the outbox if RabbitMQ doesn't confirm them.
+@pytest.mark.asyncio
+async def test_relay_publish_failure(mocker, conn):
+    conn.db_conn.fetch.return_value = [{"id": 1, "payload": '{"axie_id": 11649154}'}]
+    publisher = mocker.AsyncMock()
+    publisher.publish_batch.side_effect = Exception("Publish not confirmed")
+
+    with pytest.raises(Exception, match="Publish not confirmed"):
+        await OutboxRelay(conn, publisher).relay()
+
+    conn.db_conn.execute.assert_not_called()
+    # The DB transaction is exited with the error, so it is rolled back.
+    exc_type = conn.db_conn.transaction.return_value.__aexit__.call_args[0][0]
+    assert exc_type is Exception
+
+
+# Test that the messages are written to the outbox with one statement.
+@pytest.mark.asyncio
+async def test_add_outbox_messages(mocker):
+    db_connection = mocker.AsyncMock()
+
+    await add_outbox_messages(db_connection, [b'{"axie_id": 1}', b'{"axie_id": 2}'])
+    await add_outbox_messages(db_connection, [])
+
+    db_connection.execute.assert_called_once()
+    query, payloads, _ = db_connection.execute.call_args[0]
+    assert "INSERT INTO axie_sales_outbox" in query
+    assert payloads == ['{"axie_id": 1}', '{"axie_id": 2}']
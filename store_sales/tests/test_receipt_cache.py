@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+from web3.datastructures import AttributeDict
+from hexbytes import HexBytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from receipt_cache import MmapReceiptStore, ReceiptCache
+
+
+def create_transaction_hash(i: int) -> str:
+    return f"0x{i:064x}"
+
+
+def create_receipt(i: int, block_number: int = 100) -> AttributeDict:
+    return AttributeDict(
+        {
+            "blockNumber": block_number,
+            "transactionHash": HexBytes(create_transaction_hash(i)),
+            "to": "0x32950db2a7164ae833121501c797d79e7b79d74c",
+            "logs": [
+                AttributeDict(
+                    {
+                        "address": "0x32950db2a7164ae833121501c797d79e7b79d74c",
+                        "topics": [HexBytes("0x" + "dd" * 32)],
+                        "data": HexBytes("0x"),
+                    }
+                )
+            ],
+        }
+    )
+
+
+# Test that the least recently used receipts are evicted from memory.
+def test_receipt_cache_lru():
+    cache = ReceiptCache(max_size=2)
+    for i in range(2):
+        cache.put(create_transaction_hash(i), create_receipt(i))
+
+    # The first receipt is used, so the second one is evicted.
+    assert cache.get(create_transaction_hash(0)) == create_receipt(0)
+    cache.put(create_transaction_hash(2), create_receipt(2))
+
+    assert cache.size() == 2
+    assert cache.get(create_transaction_hash(1)) is None
+    # A transaction without receipt is not cached.
+    cache.put(create_transaction_hash(3), None)
+    assert cache.get(create_transaction_hash(3)) is None
+
+
+# Test that the receipts of the on-disk store are kept when it is opened again, with the same types.
+def test_receipt_cache_disk_store(tmp_path):
+    path = str(tmp_path / "receipts.mmap")
+    cache = ReceiptCache(max_size=1, disk_path=path, disk_size=64 * 1024)
+    for i in range(3):
+        cache.put(create_transaction_hash(i), create_receipt(i))
+
+    # The receipt evicted from memory is read from the disk.
+    receipt = cache.get(create_transaction_hash(0))
+    assert receipt == create_receipt(0)
+    assert isinstance(receipt["logs"][0]["topics"][0], HexBytes)
+
+    reopened_cache = ReceiptCache(max_size=1, disk_path=path, disk_size=64 * 1024)
+    for i in range(3):
+        assert reopened_cache.get(create_transaction_hash(i)) == create_receipt(i)
+
+
+# Test that only the receipts of blocks with enough confirmations behind the highest block seen are cached.
+def test_receipt_cache_confirmations():
+    cache = ReceiptCache(confirmations=10)
+
+    cache.put(create_transaction_hash(0), create_receipt(0, block_number=100))
+    assert cache.get(create_transaction_hash(0)) is None
+
+    # Once a later block is seen, the receipts of the blocks far enough behind it are cached.
+    cache.put(create_transaction_hash(1), create_receipt(1, block_number=110))
+    cache.put(create_transaction_hash(0), create_receipt(0, block_number=100))
+    cache.put(create_transaction_hash(2), create_receipt(2, block_number=101))
+    assert cache.get(create_transaction_hash(0)) == create_receipt(0, block_number=100)
+    assert cache.get(create_transaction_hash(1)) is None
+    assert cache.get(create_transaction_hash(2)) is None
+
+
+# Test that the on-disk store starts over once it is full.
+def test_mmap_receipt_store_full(tmp_path):
+    path = str(tmp_path / "receipts.mmap")
+    store = MmapReceiptStore(path, 2048)
+    keys = [bytes.fromhex(create_transaction_hash(i)[2:]) for i in range(10)]
+    for i, key in enumerate(keys):
+        store.put(key, create_receipt(i))
+
+    # The last receipt is always kept, the first ones were dropped when the store started over.
+    assert store.get(keys[-1]) == create_receipt(9)
+    assert store.get(keys[0]) is None
+    store.close()
+
+    reopened_store = MmapReceiptStore(path, 2048)
+    assert reopened_store.get(keys[-1]) == create_receipt(9)
+    assert reopened_store.get(keys[0]) is None
+    reopened_store.close()
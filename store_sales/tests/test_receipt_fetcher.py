@@ -0,0 +1,190 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from web3.datastructures import AttributeDict
+from web3.exceptions import MethodUnavailable
+from hexbytes import HexBytes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from receipt_fetcher import ReceiptFetcher
+from stages import RPC_STAGE, stage_limiter
+
+
+def create_receipt(transaction_hash: str) -> AttributeDict:
+    return AttributeDict({"transactionHash": HexBytes(transaction_hash), "logs": []})
+
+
+@pytest.fixture
+def transaction_hashes():
+    return [f"0x{i:064x}" for i in range(1, 5)]
+
+
+# Mock the Web3 instance, with a batch request returning the receipt of each transaction added to it.
+@pytest.fixture
+def w3(mocker):
+    w3 = mocker.AsyncMock()
+    w3.eth.get_transaction_receipt = mocker.AsyncMock(side_effect=create_receipt)
+
+    batch = mocker.MagicMock()
+    batch.add.side_effect = lambda coroutine: coroutine.close()
+    batch.async_execute = mocker.AsyncMock(
+        side_effect=lambda: [
+            create_receipt(call.args[0])
+            for call in w3.eth.get_transaction_receipt.call_args_list
+        ]
+    )
+
+    batch_context = mocker.MagicMock()
+    batch_context.__aenter__ = mocker.AsyncMock(return_value=batch)
+    batch_context.__aexit__ = mocker.AsyncMock(return_value=None)
+    w3.batch_requests = mocker.MagicMock(return_value=batch_context)
+    w3.batch = batch
+    return w3
+
+
+# Test that the transactions of a block are fetched with its receipts and the others in a batch.
+@pytest.mark.asyncio
+async def test_get_receipts_grouped_by_block(w3, transaction_hashes):
+    w3.eth.get_block_receipts.return_value = [
+        create_receipt(transaction_hash) for transaction_hash in transaction_hashes[:2]
+    ]
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    receipts = await asyncio.gather(
+        fetcher.get_receipt(transaction_hashes[0], 100),
+        fetcher.get_receipt(transaction_hashes[1], 100),
+        fetcher.get_receipt(transaction_hashes[2], 101),
+        fetcher.get_receipt(transaction_hashes[3]),
+    )
+
+    assert [receipt["transactionHash"] for receipt in receipts] == [
+        HexBytes(transaction_hash) for transaction_hash in transaction_hashes
+    ]
+    w3.eth.get_block_receipts.assert_called_once_with(100)
+    # The transactions alone in their block are fetched in one batch request.
+    w3.batch.async_execute.assert_called_once()
+    assert w3.batch.add.call_count == 2
+
+
+# Test that the block receipts are not used anymore once the node reported it doesn't support them.
+@pytest.mark.asyncio
+async def test_get_receipts_without_block_receipts(w3, transaction_hashes):
+    w3.eth.get_block_receipts.side_effect = MethodUnavailable("Method not found")
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    for _ in range(2):
+        w3.eth.get_transaction_receipt.reset_mock()
+        receipts = await asyncio.gather(
+            fetcher.get_receipt(transaction_hashes[0], 100),
+            fetcher.get_receipt(transaction_hashes[1], 100),
+        )
+        assert [receipt["transactionHash"] for receipt in receipts] == [
+            HexBytes(transaction_hash) for transaction_hash in transaction_hashes[:2]
+        ]
+
+    w3.eth.get_block_receipts.assert_called_once_with(100)
+    assert w3.batch.async_execute.call_count == 2
+
+
+# Test that the receipts are fetched one by one if the batch request fails.
+@pytest.mark.asyncio
+async def test_get_receipts_batch_failure(w3, transaction_hashes):
+    w3.batch.async_execute.side_effect = Exception("Batch error")
+
+    def get_transaction_receipt(transaction_hash):
+        if transaction_hash == transaction_hashes[1]:
+            raise ValueError("Receipt error")
+        return create_receipt(transaction_hash)
+
+    w3.eth.get_transaction_receipt.side_effect = get_transaction_receipt
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    receipts = await asyncio.gather(
+        fetcher.get_receipt(transaction_hashes[0]),
+        fetcher.get_receipt(transaction_hashes[1]),
+        return_exceptions=True,
+    )
+
+    assert receipts[0]["transactionHash"] == HexBytes(transaction_hashes[0])
+    assert isinstance(receipts[1], ValueError)
+
+
+# Test that the receipts are fetched right away once max_batch_size receipts are pending.
+@pytest.mark.asyncio
+async def test_get_receipts_max_batch_size(w3, transaction_hashes):
+    fetcher = ReceiptFetcher(w3, batch_window=60, max_batch_size=2)
+
+    receipts = await asyncio.wait_for(
+        asyncio.gather(
+            fetcher.get_receipt(transaction_hashes[0]),
+            fetcher.get_receipt(transaction_hashes[1]),
+        ),
+        timeout=1,
+    )
+
+    assert len(receipts) == 2
+
+
+# Test that the receipts are fetched one by one if the batch request returns fewer results than requests.
+@pytest.mark.asyncio
+async def test_get_receipts_batch_missing_results(w3, transaction_hashes):
+    w3.batch.async_execute.side_effect = None
+    w3.batch.async_execute.return_value = [create_receipt(transaction_hashes[0])]
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    receipts = await asyncio.wait_for(
+        asyncio.gather(
+            fetcher.get_receipt(transaction_hashes[0]),
+            fetcher.get_receipt(transaction_hashes[1]),
+        ),
+        timeout=1,
+    )
+
+    assert [receipt["transactionHash"] for receipt in receipts] == [
+        HexBytes(transaction_hash) for transaction_hash in transaction_hashes[:2]
+    ]
+
+
+# Test that an unexpected error fails the waiting messages instead of leaving them waiting forever.
+@pytest.mark.asyncio
+async def test_get_receipts_unexpected_error(w3, transaction_hashes):
+    # A receipt without its transaction hash can't be matched to a transaction.
+    w3.eth.get_block_receipts.return_value = [AttributeDict({"logs": []})]
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    receipts = await asyncio.wait_for(
+        asyncio.gather(
+            fetcher.get_receipt(transaction_hashes[0], 100),
+            fetcher.get_receipt(transaction_hashes[1], 100),
+            return_exceptions=True,
+        ),
+        timeout=1,
+    )
+
+    assert all(isinstance(receipt, KeyError) for receipt in receipts)
+
+
+# Test that the RPC stage is only held during the RPC calls, and a batch takes a single slot.
+@pytest.mark.asyncio
+async def test_get_receipts_rpc_stage(w3, transaction_hashes):
+    in_flight = []
+    execute = w3.batch.async_execute.side_effect
+
+    async def async_execute():
+        in_flight.append(stage_limiter.in_flight()[RPC_STAGE])
+        return execute()
+
+    w3.batch.async_execute.side_effect = async_execute
+    fetcher = ReceiptFetcher(w3, batch_window=0.01)
+
+    receipts = await asyncio.gather(
+        *[
+            fetcher.get_receipt(transaction_hash)
+            for transaction_hash in transaction_hashes
+        ]
+    )
+
+    assert len(receipts) == 4
+    assert in_flight == [1]
+    assert stage_limiter.in_flight()[RPC_STAGE] == 0
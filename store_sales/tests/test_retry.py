@@ -0,0 +1,131 @@
+import pytest
+import sys
+from pathlib import Path
+from aio_pika import DeliveryMode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from retry import (
+    RetryQueues,
+    inspect_dead_letters,
+    replay_dead_letters,
+)
+
+
+# Mock a RabbitMQ channel publishing to the default exchange.
+@pytest.fixture
+def channel(mocker):
+    channel = mocker.AsyncMock()
+    channel.default_exchange.publish = mocker.AsyncMock()
+    return channel
+
+
+# Mock a message of the sales queue with the given headers.
+def create_message(mocker, headers=None):
+    message = mocker.MagicMock()
+    message.body = b'{"transactionHash": "0x01"}'
+    message.headers = headers
+    message.content_type = "application/json"
+    message.message_id = "1"
+    message.ack = mocker.AsyncMock()
+    message.nack = mocker.AsyncMock()
+    return message
+
+
+# Test that a delay queue dead-lettering to the queue is declared for each delay, with the dead-letter queue.
+@pytest.mark.asyncio
+async def test_declare(channel):
+    await RetryQueues(channel, "sales", [5, 15]).declare()
+
+    assert [call.args[0] for call in channel.declare_queue.call_args_list] == [
+        "sales.retry.5s",
+        "sales.retry.15s",
+        "sales.dead-letter",
+    ]
+    assert channel.declare_queue.call_args_list[1].kwargs["arguments"] == {
+        "x-message-ttl": 15000,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": "sales",
+    }
+
+
+# Test that each retry goes to the next delay queue, then to the dead-letter queue.
+@pytest.mark.parametrize(
+    "headers, expected_routing_key, expected_retry_count",
+    [
+        (None, "sales.retry.5s", 1),
+        ({"x-retry-count": 1}, "sales.retry.15s", 2),
+        ({"x-retry-count": 2}, "sales.dead-letter", 2),
+    ],
+)
+@pytest.mark.asyncio
+async def test_retry(
+    mocker, channel, headers, expected_routing_key, expected_retry_count
+):
+    message = create_message(mocker, headers)
+
+    await RetryQueues(channel, "sales", [5, 15]).retry(message, ValueError("RPC error"))
+
+    sent_message = channel.default_exchange.publish.call_args[0][0]
+    assert (
+        channel.default_exchange.publish.call_args.kwargs["routing_key"]
+        == expected_routing_key
+    )
+    assert sent_message.body == message.body
+    assert sent_message.delivery_mode == DeliveryMode.PERSISTENT
+    assert sent_message.headers["x-retry-count"] == expected_retry_count
+    assert sent_message.headers["x-last-error"] == "RPC error"
+    message.ack.assert_called_once()
+    message.nack.assert_not_called()
+
+
+# Test that the message is requeued if it can't be sent to a delay queue.
+@pytest.mark.asyncio
+async def test_retry_publish_failure(mocker, channel):
+    channel.default_exchange.publish.side_effect = Exception("Channel closed")
+    message = create_message(mocker)
+
+    await RetryQueues(channel, "sales", [5]).retry(message, ValueError("RPC error"))
+
+    message.ack.assert_not_called()
+    message.nack.assert_called_once_with(requeue=True)
+
+
+# Test that the dead letters are inspected without being removed.
+@pytest.mark.asyncio
+async def test_inspect_dead_letters(mocker, channel):
+    messages = [
+        create_message(mocker, {"x-retry-count": 5, "x-last-error": "RPC error"}),
+        create_message(mocker, {"x-retry-count": 5, "x-last-error": "DB error"}),
+    ]
+    queue = channel.declare_queue.return_value
+    queue.get.side_effect = messages + [None]
+
+    dead_letters = await inspect_dead_letters(channel, "sales", 10)
+
+    channel.declare_queue.assert_called_once_with("sales.dead-letter", durable=True)
+    assert [dead_letter["headers"]["x-last-error"] for dead_letter in dead_letters] == [
+        "RPC error",
+        "DB error",
+    ]
+    for message in messages:
+        message.nack.assert_called_once_with(requeue=True)
+        message.ack.assert_not_called()
+
+
+# Test that the dead letters are sent back to their queue with their retry count reset.
+@pytest.mark.asyncio
+async def test_replay_dead_letters(mocker, channel):
+    message = create_message(
+        mocker,
+        {"x-retry-count": 5, "x-last-error": "RPC error", "x-original-queue": "sales"},
+    )
+    queue = channel.declare_queue.return_value
+    queue.get.side_effect = [message, create_message(mocker)]
+
+    assert await replay_dead_letters(channel, "sales", 1) == 1
+
+    sent_message = channel.default_exchange.publish.call_args[0][0]
+    assert channel.default_exchange.publish.call_args.kwargs["routing_key"] == "sales"
+    assert sent_message.body == message.body
+    assert sent_message.headers == {}
+    message.ack.assert_called_once()
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rpc_pool import Endpoint, RPCProviderPool
+
+
+# Mock a node provider answering its own name after a delay, or raising an error.
+@pytest.fixture
+def provider(mocker):
+    def create_provider(name: str, delay: float = 0, error: Exception | None = None):
+        async def make_request(method, params):
+            await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            return {"jsonrpc": "2.0", "id": 0, "result": name}
+
+        provider = mocker.MagicMock()
+        provider.endpoint_uri = f"https://{name}/v2/mock_key"
+        provider.make_request = mocker.AsyncMock(side_effect=make_request)
+        return provider
+
+    return create_provider
+
+
+# Test that the requests are sent to the endpoint with the lowest EWMA latency.
+@pytest.mark.asyncio
+async def test_route_to_fastest_endpoint(provider):
+    slow = Endpoint(provider("slow", delay=0.02))
+    fast = Endpoint(provider("fast", delay=0.001))
+    pool = RPCProviderPool([slow, fast])
+
+    # Each endpoint is tried once before its latency is known.
+    await pool.make_request("eth_blockNumber", [])
+    await pool.make_request("eth_blockNumber", [])
+
+    for _ in range(3):
+        response = await pool.make_request("eth_blockNumber", [])
+        assert response["result"] == "fast"
+    assert slow.get_ewma() > fast.get_ewma()
+    # Only the host of the endpoint is reported, not its API key.
+    assert set(pool.get_stats()) == {"slow", "fast"}
+
+
+# Test that a failed request is sent to the next endpoint, and the circuit opens after consecutive failures.
+@pytest.mark.asyncio
+async def test_failover_and_circuit_breaker(provider):
+    failing = Endpoint(
+        provider("failing", error=ConnectionError("Connection refused")),
+        failure_threshold=2,
+        reset_timeout=60,
+    )
+    healthy = Endpoint(provider("healthy", delay=0.01))
+    pool = RPCProviderPool([failing, healthy])
+
+    for _ in range(2):
+        response = await pool.make_request("eth_blockNumber", [])
+        assert response["result"] == "healthy"
+    assert not failing.is_available()
+
+    # The endpoint with an open circuit is not tried anymore, even if it has a lower latency.
+    failing.provider.make_request.reset_mock()
+    await pool.make_request("eth_blockNumber", [])
+    failing.provider.make_request.assert_not_called()
+
+
+# Test that the error is raised when every endpoint failed.
+@pytest.mark.asyncio
+async def test_all_endpoints_failed(provider):
+    pool = RPCProviderPool(
+        [
+            Endpoint(provider("first", error=ConnectionError("Connection refused"))),
+            Endpoint(provider("second", error=TimeoutError("Timeout"))),
+        ]
+    )
+
+    with pytest.raises((ConnectionError, TimeoutError)):
+        await pool.make_request("eth_blockNumber", [])
+
+
+# Test that a request slower than the p95 of its endpoint is hedged on the next endpoint.
+@pytest.mark.asyncio
+async def test_hedged_request(provider):
+    primary = Endpoint(provider("primary", delay=0.001))
+    secondary = Endpoint(provider("secondary", delay=0.001))
+    pool = RPCProviderPool([primary, secondary], hedge=True, hedge_min_samples=5)
+
+    for _ in range(5):
+        primary.record_success(0.001)
+    secondary.record_success(0.002)
+
+    # The primary endpoint slows down, the hedged request to the secondary answers first.
+    async def slow_request(method, params):
+        await asyncio.sleep(1)
+        return {"result": "primary"}
+
+    primary.provider.make_request.side_effect = slow_request
+    response = await asyncio.wait_for(pool.make_request("eth_blockNumber", []), 0.5)
+
+    assert response["result"] == "secondary"
+    primary.provider.make_request.assert_called_once()
@@ -3,12 +3,32 @@ import sys
 from pathlib import Path
 from web3 import Web3
 from web3.datastructures import AttributeDict
+from web3.exceptions import MethodUnavailable
 from hexbytes import HexBytes
 
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from transaction import Transaction
 from contract import Contract
+from contract_registry import contract_registry
+from receipt_cache import ReceiptCache, receipt_cache
+from stages import RPC_STAGE, stage_limiter
+
+
+# The contract registry is shared by the whole process, each test starts with an empty one.
+@pytest.fixture(autouse=True)
+def empty_contract_registry():
+    contract_registry.invalidate()
+    yield
+    contract_registry.invalidate()
+
+
+# The receipt cache is shared by the whole process, each test starts with an empty one.
+@pytest.fixture(autouse=True)
+def empty_receipt_cache():
+    receipt_cache.clear()
+    yield
+    receipt_cache.clear()
 
 
 @pytest.fixture
@@ -370,3 +390,178 @@ async def test_process_logs(mocker, conn, w3, transaction_hash, transaction_rece
     w3.eth.get_transaction_receipt.assert_called_once_with(transaction_hash)
     mock_weth_contract.get_event_data.call_count == 3
     mock_axie_contract.get_event_data.assert_called_once()
+
+
+# Test the Transaction.process_block method.
+@pytest.mark.asyncio
+async def test_process_block(mocker, conn, w3, transaction_hash, transaction_receipt):
+    missing_transaction_hash = (
+        "0x6e74a5ffc57de196ec3bf733f59df20ff786e94d9f490afbf44a443908443200"
+    )
+    missing_receipt = AttributeDict(
+        {
+            "logs": [],
+            "to": "0xffF9Ce5f71ca6178D3BEEcEDB61e7Eff1602950E",
+            "transactionHash": HexBytes(missing_transaction_hash),
+        }
+    )
+
+    # The block receipts don't contain the second transaction, its receipt is fetched on its own.
+    w3.eth.get_block_receipts = mocker.AsyncMock(return_value=[transaction_receipt])
+    w3.eth.get_transaction_receipt = mocker.AsyncMock(return_value=missing_receipt)
+
+    mock_weth_contract = mocker.MagicMock()
+    mock_axie_contract = mocker.MagicMock()
+    mocker.patch.object(
+        Contract, "create", side_effect=[mock_weth_contract, mock_axie_contract]
+    )
+    mock_get_sales = mocker.patch.object(
+        Transaction,
+        "_Transaction__get_sales",
+        side_effect=[[{"price_weth": 0.001836535870831618, "axie_id": 11649154}], []],
+    )
+
+    transaction = Transaction(conn, w3)
+    sales_by_transaction = await transaction.process_block(
+        44153279,
+        [transaction_hash.upper().replace("0X", "0x"), missing_transaction_hash],
+    )
+
+    assert list(sales_by_transaction.values()) == [
+        [{"price_weth": 0.001836535870831618, "axie_id": 11649154}],
+        [],
+    ]
+    w3.eth.get_block_receipts.assert_called_once_with(44153279)
+    w3.eth.get_transaction_receipt.assert_called_once_with(missing_transaction_hash)
+    # The contracts are loaded once for the whole block.
+    assert Contract.create.call_count == 2
+    mock_get_sales.assert_any_call(
+        transaction_receipt, mock_weth_contract, mock_axie_contract
+    )
+    mock_get_sales.assert_any_call(
+        missing_receipt, mock_weth_contract, mock_axie_contract
+    )
+
+
+# Test that Transaction.process_logs gets the receipt from the receipt fetcher when one is given.
+@pytest.mark.asyncio
+async def test_process_logs_with_receipt_fetcher(
+    mocker, conn, w3, transaction_hash, transaction_receipt
+):
+    receipt_fetcher = mocker.AsyncMock()
+    receipt_fetcher.get_receipt.return_value = transaction_receipt
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock(), mocker.MagicMock()]
+    )
+    mock_get_sales = mocker.patch.object(
+        Transaction, "_Transaction__get_sales", return_value=[]
+    )
+
+    transaction = Transaction(conn, w3, receipt_fetcher=receipt_fetcher)
+    sales_list = await transaction.process_logs(transaction_hash, 44153279)
+
+    assert sales_list == []
+    receipt_fetcher.get_receipt.assert_called_once_with(transaction_hash, 44153279)
+    w3.eth.get_transaction_receipt.assert_not_called()
+    mock_get_sales.assert_called_once()
+
+
+# Test that a transaction processed again, like a retried message, gets its receipt from the receipt cache.
+@pytest.mark.asyncio
+async def test_process_logs_with_receipt_cache(
+    mocker, conn, w3, transaction_hash, transaction_receipt
+):
+    receipt_fetcher = mocker.AsyncMock()
+    receipt_fetcher.get_receipt.return_value = transaction_receipt
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock(), mocker.MagicMock()]
+    )
+    mocker.patch.object(Transaction, "_Transaction__get_sales", return_value=[])
+
+    # The receipt is cached without waiting for confirmations.
+    cache = ReceiptCache()
+    for _ in range(2):
+        await Transaction(
+            conn, w3, receipt_fetcher=receipt_fetcher, receipt_cache=cache
+        ).process_logs(transaction_hash, 44153279)
+
+    receipt_fetcher.get_receipt.assert_called_once_with(transaction_hash, 44153279)
+    assert cache.get(transaction_hash) is transaction_receipt
+
+
+# Test that a message waiting for its receipt batch doesn't hold a slot of the RPC stage, the fetcher takes it for its calls.
+@pytest.mark.asyncio
+async def test_process_logs_with_receipt_fetcher_rpc_stage(
+    mocker, conn, w3, transaction_hash, transaction_receipt
+):
+    in_flight_while_waiting = []
+
+    async def get_receipt(transaction_hash, block_number):
+        in_flight_while_waiting.append(stage_limiter.in_flight()[RPC_STAGE])
+        return transaction_receipt
+
+    receipt_fetcher = mocker.AsyncMock()
+    receipt_fetcher.get_receipt.side_effect = get_receipt
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock(), mocker.MagicMock()]
+    )
+    mocker.patch.object(Transaction, "_Transaction__get_sales", return_value=[])
+
+    await Transaction(conn, w3, receipt_fetcher=receipt_fetcher).process_logs(
+        transaction_hash, 44153279
+    )
+
+    assert in_flight_while_waiting == [0]
+
+
+# Test that the receipts of a block are fetched with batch requests if the node doesn't support eth_getBlockReceipts.
+@pytest.mark.asyncio
+async def test_process_block_without_block_receipts(
+    mocker, monkeypatch, conn, w3, transaction_hash, transaction_receipt
+):
+    monkeypatch.setattr(Transaction, "_Transaction__block_receipts_supported", True)
+    w3.eth.get_block_receipts = mocker.AsyncMock(
+        side_effect=MethodUnavailable("Method not found")
+    )
+    mock_receipt_fetcher = mocker.patch("transaction.ReceiptFetcher", autospec=True)
+    mock_receipt_fetcher.return_value.get_receipt = mocker.AsyncMock(
+        return_value=transaction_receipt
+    )
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock(), mocker.MagicMock()]
+    )
+    mocker.patch.object(Transaction, "_Transaction__get_sales", return_value=[])
+
+    for _ in range(2):
+        receipt_cache.clear()
+        sales_by_transaction = await Transaction(conn, w3).process_block(
+            44153279, [transaction_hash]
+        )
+        assert sales_by_transaction == {transaction_hash: []}
+
+    # The node is only asked once for the block receipts, the method is then known to be unsupported.
+    w3.eth.get_block_receipts.assert_called_once_with(44153279)
+    mock_receipt_fetcher.assert_called_with(w3, batch_window=0)
+    assert mock_receipt_fetcher.return_value.get_receipt.call_count == 2
+    mock_receipt_fetcher.return_value.get_receipt.assert_called_with(transaction_hash)
+
+
+# Test that the receipt fetcher given to the transaction fetches the receipts without eth_getBlockReceipts.
+@pytest.mark.asyncio
+async def test_process_block_without_block_receipts_with_receipt_fetcher(
+    mocker, monkeypatch, conn, w3, transaction_hash, transaction_receipt
+):
+    monkeypatch.setattr(Transaction, "_Transaction__block_receipts_supported", False)
+    receipt_fetcher = mocker.AsyncMock()
+    receipt_fetcher.get_receipt.return_value = transaction_receipt
+    mocker.patch.object(
+        Contract, "create", side_effect=[mocker.MagicMock(), mocker.MagicMock()]
+    )
+    mocker.patch.object(Transaction, "_Transaction__get_sales", return_value=[])
+
+    await Transaction(conn, w3, receipt_fetcher=receipt_fetcher).process_block(
+        44153279, [transaction_hash]
+    )
+
+    w3.eth.get_block_receipts.assert_not_called()
+    receipt_fetcher.get_receipt.assert_called_once_with(transaction_hash)
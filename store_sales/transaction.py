@@ -1,7 +1,16 @@
+import asyncio
 import asyncpg
 import logging
-from contract import Contract
+from contract_registry import ContractRegistry, contract_registry
+from log_decoder import get_transfer_log_decoder
+from receipt_cache import ReceiptCache, receipt_cache
+from receipt_fetcher import ReceiptFetcher
+from stages import RPC_STAGE, stage_limiter
 from web3 import Web3, AsyncWeb3
+from web3.exceptions import MethodUnavailable
+
+WETH_ADDRESS = "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5"
+AXIE_PROXY_ADDRESS = "0x32950db2a7164ae833121501c797d79e7b79d74c"
 
 
 class Transaction:
@@ -9,13 +18,22 @@ class Transaction:
     Represents a Ronin blockchain sale transaction and interacts with associated contracts to gather specific data about the sale.
     """
 
+    # Shared by every transaction, set once the node reported it doesn't support eth_getBlockReceipts.
+    __block_receipts_supported = True
+
     def __init__(
         self,
         conn: asyncpg.Connection,
         w3: AsyncWeb3,
+        registry: ContractRegistry = contract_registry,
+        receipt_fetcher: ReceiptFetcher | None = None,
+        receipt_cache: ReceiptCache = receipt_cache,
     ):
         self.__conn = conn
         self.__w3 = w3
+        self.__registry = registry
+        self.__receipt_fetcher = receipt_fetcher
+        self.__receipt_cache = receipt_cache
 
     async def __get_receipt(self, transaction_hash) -> dict:
         """Returns the transaction receipt."""
@@ -29,107 +47,205 @@ class Transaction:
             )
             raise e
 
-    async def process_logs(self, transaction_hash) -> list:
+    async def __get_block_receipts(
+        self, block_number, transaction_hashes: list
+    ) -> dict:
+        """
+        Returns the receipts of every transaction of the block, by transaction hash.
+        If the node doesn't support eth_getBlockReceipts, only the receipts of the transactions are fetched,
+        with JSON-RPC batch requests.
+        """
+        if Transaction.__block_receipts_supported:
+            try:
+                async with stage_limiter.stage(RPC_STAGE):
+                    receipts = await self.__w3.eth.get_block_receipts(block_number)
+                return {
+                    Web3.to_hex(receipt["transactionHash"]).lower(): receipt
+                    for receipt in receipts
+                }
+            except MethodUnavailable:
+                logging.warning(
+                    "[__get_block_receipts] The node doesn't support eth_getBlockReceipts, receipts are fetched with batch requests."
+                )
+                Transaction.__block_receipts_supported = False
+            except Exception as e:
+                logging.error(
+                    f"[__get_block_receipts] An unexpected error occured while retrieving receipts for block {block_number}: {e}"
+                )
+                raise e
+
+        # Without a block number, the receipt fetcher always uses batch requests.
+        receipt_fetcher = self.__receipt_fetcher or ReceiptFetcher(
+            self.__w3, batch_window=0
+        )
+        receipts = await asyncio.gather(
+            *[
+                receipt_fetcher.get_receipt(transaction_hash)
+                for transaction_hash in transaction_hashes
+            ]
+        )
+        return {
+            transaction_hash.lower(): receipt
+            for transaction_hash, receipt in zip(transaction_hashes, receipts)
+        }
+
+    async def process_logs(self, transaction_hash, block_number=None) -> list:
         """
         Looks for specifc data in the logs and returns a list of the sold prices and assets IDs.
+        With a receipt fetcher, the receipt is fetched in a batch with the receipts of the other messages.
+        A receipt in the receipt cache is not fetched again.
         """
         try:
             logging.info(
                 f"[process_logs] Processing logs for transaction {transaction_hash}..."
             )
-            receipt = await self.__get_receipt(transaction_hash)
-            logs = receipt["logs"]
-            recipient = receipt["to"]
-
-            weth_contract = await Contract.create(
-                self.__conn,
-                self.__w3,
-                "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5",
-            )
-            weth_contract_address = weth_contract.get_contract_address()
-            weth_transfer_signature_hash = weth_contract.get_event_signature_hash(
-                "Transfer"
-            )
+            receipt = self.__receipt_cache.get(transaction_hash)
+            if receipt is None:
+                if self.__receipt_fetcher is not None:
+                    # The fetcher takes the RPC stage itself, only for its RPC calls.
+                    receipt = await self.__receipt_fetcher.get_receipt(
+                        transaction_hash, block_number
+                    )
+                else:
+                    async with stage_limiter.stage(RPC_STAGE):
+                        receipt = await self.__get_receipt(transaction_hash)
+                self.__receipt_cache.put(transaction_hash, receipt)
+            contracts = await self.__get_contracts()
+            return self.__get_sales(receipt, *contracts)
 
-            axie_proxy_contract = await Contract.create(
-                self.__conn,
-                self.__w3,
-                "0x32950db2a7164ae833121501c797d79e7b79d74c",
-            )
-            axie_proxy_contract_address = axie_proxy_contract.get_contract_address()
-            axie_transfer_signature_hash = axie_proxy_contract.get_event_signature_hash(
-                "Transfer"
+        except Exception as e:
+            logging.error(
+                f"[process_logs] An unexpected error occured while processing logs for transaction {transaction_hash}: {e}"
             )
+            raise e
 
-            prices = []
-            axies = []
-
-            for log in logs:
-                logging.info(
-                    f"[process_logs] Log Contract Address: {Web3.to_checksum_address(log['address'])}, Topic Event: 0x{log['topics'][0].hex()}"
+    async def process_block(self, block_number, transaction_hashes: list) -> dict:
+        """
+        Fetches the receipts of the whole block in one call and returns the sales list of each transaction.
+        The block receipts are not fetched if every receipt is in the receipt cache.
+        If the node doesn't support eth_getBlockReceipts, the receipts are fetched with batch requests instead.
+        """
+        try:
+            logging.info(
+                f"[process_block] Processing logs for {len(transaction_hashes)} transactions of block {block_number}..."
+            )
+            receipts_by_hash = {
+                transaction_hash.lower(): self.__receipt_cache.get(transaction_hash)
+                for transaction_hash in transaction_hashes
+            }
+            missing_transaction_hashes = [
+                transaction_hash
+                for transaction_hash in transaction_hashes
+                if receipts_by_hash[transaction_hash.lower()] is None
+            ]
+            if missing_transaction_hashes:
+                receipts_by_hash.update(
+                    await self.__get_block_receipts(
+                        block_number, missing_transaction_hashes
+                    )
                 )
-                topic = f"0x{log['topics'][0].hex()}"
-
-                if (
-                    Web3.to_checksum_address(log["address"]) == weth_contract_address
-                    and topic == weth_transfer_signature_hash
-                ):
-                    """
-                    Every payment is converted into WETH and transferred to the contract (recipient).
-                    If the payment was made directly in WETH, the WETH is transfered from the sender directly to the contract (recipient).
-
-                    Else, the sender transfer the currency to the contract, which then proceeds to exchange it for WETH.
-                    This causes multiple events, the important one is a transfer from the WETH contract to the contract (recipient).
-                    """
-                    logging.info("[process_logs] Retrieving data for WETH transfer...")
-                    event_data = weth_contract.get_event_data(topic, log)
-                    if event_data["args"]["_to"] == recipient:
-                        if len(prices) > len(axies):
-                            # This make sure that the last price is removed if no asset was found for that sale.
-                            prices.pop()
-
-                        weth_value = Web3.from_wei(
-                            event_data["args"]["_value"], "ether"
-                        )
-                        prices.append(float(weth_value))
-                        logging.info(
-                            f"[process_logs] Found WETH transfer going to the recipient of the transaction. Added WETH value of {weth_value} to list of prices."
-                        )
-                elif (
-                    Web3.to_checksum_address(log["address"])
-                    == axie_proxy_contract_address
-                    and topic == axie_transfer_signature_hash
-                ):
-                    """
-                    Every Axie sales call the Axie Proxy contract with the event Transfer to transfer the Axie from the seller to buyer.
-                    """
-                    event_data = axie_proxy_contract.get_event_data(topic, log)
-                    axie_id = event_data["args"]["_tokenId"]
-                    axies.append(axie_id)
-                    logging.info(
-                        f"[process_logs] Found Axie transfer. Added Axie {axie_id} to the list of axies."
+            contracts = await self.__get_contracts()
+
+            sales_by_transaction = {}
+            for transaction_hash in transaction_hashes:
+                receipt = receipts_by_hash.get(transaction_hash.lower())
+                if receipt is None:
+                    logging.warning(
+                        f"[process_block] Transaction {transaction_hash} is not in the receipts of block {block_number}, fetching its receipt."
                     )
-
-            if len(prices) > len(axies):
-                # This make sure that the last price is removed if no asset was found for that sale.
-                prices.pop()
-
-            """
-            All events in a transaction are in the same order wheter it contains multiple sales or only one.
-            First there is the currency transfer and swaps if needed, then the asset transfer and it is repeated 
-            in this order if there are many sales   in the transaction.
-            """
-            sales_list = [
-                {"price_weth": price, "axie_id": axie_id}
-                for price, axie_id in zip(prices, axies)
-            ]
-            logging.info(f"[process_logs] Prices List: {prices}")
-            logging.info(f"[process_logs] Axies List: {axies}")
-            logging.info(f"[process_logs] Sales List: {sales_list}")
-            return sales_list
+                    async with stage_limiter.stage(RPC_STAGE):
+                        receipt = await self.__get_receipt(transaction_hash)
+                self.__receipt_cache.put(transaction_hash, receipt)
+                sales_by_transaction[transaction_hash] = self.__get_sales(
+                    receipt, *contracts
+                )
+            return sales_by_transaction
 
         except Exception as e:
             logging.error(
-                f"[process_logs] An unexpected error occured while processing logs for transaction {transaction_hash}: {e}"
+                f"[process_block] An unexpected error occured while processing logs for block {block_number}: {e}"
             )
             raise e
+
+    async def __get_contracts(self) -> tuple:
+        """
+        Returns the WETH and Axie proxy contracts from the contract registry.
+        """
+        weth_contract = await self.__registry.get(
+            self.__conn,
+            self.__w3,
+            WETH_ADDRESS,
+        )
+        axie_proxy_contract = await self.__registry.get(
+            self.__conn,
+            self.__w3,
+            AXIE_PROXY_ADDRESS,
+        )
+        return weth_contract, axie_proxy_contract
+
+    def __get_sales(self, receipt, weth_contract, axie_proxy_contract) -> list:
+        """
+        Looks for specifc data in the logs of the receipt and returns a list of the sold prices and assets IDs.
+        """
+        logs = receipt["logs"]
+        recipient = receipt["to"]
+
+        # The Transfer logs of both contracts are matched on their raw address and topic.
+        transfer_log_decoder = get_transfer_log_decoder(
+            weth_contract, axie_proxy_contract
+        )
+
+        prices = []
+        axies = []
+
+        for log in logs:
+            decoded_log = transfer_log_decoder.decode(log)
+            if decoded_log is None:
+                continue
+            contract, event_data = decoded_log
+
+            if contract is weth_contract:
+                """
+                Every payment is converted into WETH and transferred to the contract (recipient).
+                If the payment was made directly in WETH, the WETH is transfered from the sender directly to the contract (recipient).
+
+                Else, the sender transfer the currency to the contract, which then proceeds to exchange it for WETH.
+                This causes multiple events, the important one is a transfer from the WETH contract to the contract (recipient).
+                """
+                if event_data["args"]["_to"] == recipient:
+                    if len(prices) > len(axies):
+                        # This make sure that the last price is removed if no asset was found for that sale.
+                        prices.pop()
+
+                    weth_value = Web3.from_wei(event_data["args"]["_value"], "ether")
+                    prices.append(float(weth_value))
+                    logging.info(
+                        f"[__get_sales] Found WETH transfer going to the recipient of the transaction. Added WETH value of {weth_value} to list of prices."
+                    )
+            else:
+                """
+                Every Axie sales call the Axie Proxy contract with the event Transfer to transfer the Axie from the seller to buyer.
+                """
+                axie_id = event_data["args"]["_tokenId"]
+                axies.append(axie_id)
+                logging.info(
+                    f"[__get_sales] Found Axie transfer. Added Axie {axie_id} to the list of axies."
+                )
+
+        if len(prices) > len(axies):
+            # This make sure that the last price is removed if no asset was found for that sale.
+            prices.pop()
+
+        """
+        All events in a transaction are in the same order wheter it contains multiple sales or only one.
+        First there is the currency transfer and swaps if needed, then the asset transfer and it is repeated 
+        in this order if there are many sales   in the transaction.
+        """
+        sales_list = [
+            {"price_weth": price, "axie_id": axie_id}
+            for price, axie_id in zip(prices, axies)
+        ]
+        logging.info(f"[__get_sales] Prices List: {prices}")
+        logging.info(f"[__get_sales] Axies List: {axies}")
+        logging.info(f"[__get_sales] Sales List: {sales_list}")
+        return sales_list
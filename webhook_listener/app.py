@@ -1,11 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from config import Config
-from aio_pika import Message, connect
+from publisher import RabbitMQPublisher
+from buffer import WebhookBuffer
+from payload import (
+    LogFilter,
+    parse_body,
+    get_block,
+    create_transaction_messages,
+    create_block_message,
+)
+from dedup import MemorySeenSet, RedisSeenSet
+from spool import Spool, SpoolReplayer
+from ip_allowlist import IPAllowlist, get_client_ip
+import asyncio
 import logging
+import signal
 import hmac
 import hashlib
-import json
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,32 +28,208 @@ logging.basicConfig(
 
 # Alchemy signing key to validate the signature
 SIGNING_KEY = Config.get_signing_key()
+SIGNING_KEY_BYTES = bytes(SIGNING_KEY, "utf-8")
+
+# Number of proxies in front of the app that append to the x-forwarded-for header
+TRUSTED_PROXY_COUNT = Config.get_trusted_proxy_count()
+
+# Only the transactions with a log from these contracts and events can contain a sale
+LOG_FILTER = (
+    LogFilter(Config.get_log_filter_addresses(), Config.get_log_filter_topics())
+    if Config.get_log_filter_enabled()
+    else None
+)
+
+# One message per transaction, or one message per block with all its transactions
+MESSAGE_FORMAT = Config.get_message_format()
+
+# Authorized IP addresses and CIDR ranges, compiled once and reloaded on SIGHUP.
+ip_allowlist = None
+
+
+# RabbitMQ publisher shared by all requests, created on first use.
+publisher = None
+# Buffer used to send the messages in the background when the fast-ack mode is enabled.
+webhook_buffer = None
+# Transactions already sent to RabbitMQ, used to skip the ones re-delivered by Alchemy.
+seen_set = None
+# On-disk spool used when RabbitMQ is unavailable, enabled with SPOOL_DIRECTORY.
+webhook_spool = None
+spool_replayer = None
+
+
+def get_publisher() -> RabbitMQPublisher:
+    global publisher
+
+    if publisher is None:
+        publisher = RabbitMQPublisher(
+            Config.get_rabbitmq_connection_string(),
+            Config.get_rabbitmq_queue_name(),
+            Config.get_rabbitmq_channel_pool_size(),
+            Config.get_rabbitmq_publish_timeout(),
+        )
+    return publisher
+
+
+def get_ip_allowlist() -> IPAllowlist:
+    global ip_allowlist
+
+    if ip_allowlist is None:
+        ip_allowlist = IPAllowlist(Config.get_authorized_ips())
+        logging.info(f"IP allowlist loaded with {len(ip_allowlist)} entries.")
+    return ip_allowlist
+
+
+def reload_ip_allowlist() -> None:
+    global ip_allowlist
+
+    try:
+        ip_allowlist = IPAllowlist(Config.get_authorized_ips())
+        logging.info(f"IP allowlist reloaded with {len(ip_allowlist)} entries.")
+    except Exception as e:
+        # Keep the current allowlist if the new one is invalid.
+        logging.error(f"Error while reloading the IP allowlist: {e}")
+
+
+def get_seen_set() -> MemorySeenSet | RedisSeenSet | None:
+    global seen_set
+
+    if seen_set is None:
+        dedup_mode = Config.get_dedup_mode()
+        if dedup_mode == "memory":
+            seen_set = MemorySeenSet(
+                Config.get_dedup_max_size(), Config.get_dedup_ttl()
+            )
+        elif dedup_mode == "redis":
+            seen_set = RedisSeenSet(Config.get_redis_url(), Config.get_dedup_ttl())
+    return seen_set
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global webhook_buffer, webhook_spool, spool_replayer
+
+    get_ip_allowlist()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_ip_allowlist)
+        sighup_handler_added = True
+    except (NotImplementedError, RuntimeError):
+        # Signal handlers can only be added from the main thread on Unix.
+        logging.warning("IP allowlist reload on SIGHUP is not available.")
+        sighup_handler_added = False
+
+    # Open the RabbitMQ connection at startup, requests will retry if it fails here.
+    try:
+        await get_publisher().connect()
+    except Exception as e:
+        logging.error(f"Error opening RabbitMQ connection at startup: {e}")
+
+    spool_directory = Config.get_spool_directory()
+    if spool_directory:
+        webhook_spool = Spool(
+            spool_directory,
+            Config.get_spool_segment_size(),
+            Config.get_spool_fsync_interval_ms() / 1000,
+        )
+        spool_replayer = SpoolReplayer(
+            webhook_spool, get_publisher(), Config.get_spool_replay_interval()
+        )
+        spool_replayer.start()
+        logging.info(f"Spool enabled in {spool_directory}.")
+
+    if Config.get_fast_ack_enabled():
+        webhook_buffer = WebhookBuffer(
+            get_publisher(), Config.get_buffer_size(), spool=webhook_spool
+        )
+        webhook_buffer.start()
+        logging.info("Fast-ack mode enabled.")
+
+    yield
+
+    if sighup_handler_added:
+        loop.remove_signal_handler(signal.SIGHUP)
+    if webhook_buffer is not None:
+        await webhook_buffer.stop()
+        webhook_buffer = None
+    if spool_replayer is not None:
+        await spool_replayer.stop()
+        spool_replayer = None
+    if webhook_spool is not None:
+        await webhook_spool.close()
+        webhook_spool = None
+    if publisher is not None:
+        await publisher.close()
+    if seen_set is not None:
+        await seen_set.close()
 
 
 # Application initialization
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+async def publish_or_spool(messages: list[bytes]) -> None:
+    """
+    Sends the messages to RabbitMQ, or writes them to the spool if it is enabled and RabbitMQ is unavailable.
+    """
+    rabbitmq_publisher = get_publisher()
+
+    # Go straight to the spool while the connection is known to be down.
+    if webhook_spool is not None and not rabbitmq_publisher.is_healthy():
+        logging.warning(
+            "RabbitMQ connection is down, writing the messages to the spool."
+        )
+        await webhook_spool.append(messages)
+        return
+
+    try:
+        await rabbitmq_publisher.publish_batch(messages)
+    except Exception as e:
+        if webhook_spool is None:
+            raise e
+        logging.warning(
+            f"Error while sending the messages to RabbitMQ, writing them to the spool: {e}"
+        )
+        await webhook_spool.append(messages)
 
 
 # Helper function to validate the signature
 def is_valid_signature_for_string_body(
-    body: str, signature: str, signing_key: str
+    body: bytes, signature: str, signing_key: bytes
 ) -> bool:
     digest = hmac.new(
-        bytes(signing_key, "utf-8"),
+        signing_key,
         msg=body,
         digestmod=hashlib.sha256,
     ).hexdigest()
 
-    return signature == digest
+    return hmac.compare_digest(signature, digest)
+
+
+@app.get("/health")
+async def health():
+    if publisher is None or not publisher.is_healthy():
+        return JSONResponse(
+            content={"status": "error", "message": "RabbitMQ connection is down"},
+            status_code=503,
+        )
+
+    content = {"status": "healthy"}
+    if webhook_buffer is not None:
+        content["buffered_blocks"] = webhook_buffer.size()
+
+    return JSONResponse(content=content, status_code=200)
 
 
 @app.post("/webhook")
 async def process_webhook(req: Request):
-    source_ip = req.headers.get("x-forwarded-for")
+    source_ip = get_client_ip(
+        req.headers.get("x-forwarded-for"),
+        TRUSTED_PROXY_COUNT,
+        req.client.host if req.client else None,
+    )
     # Verifies if the request is coming from an authorized IP address
-    authorized_ips = Config.get_authorized_ips()
-
-    if source_ip not in authorized_ips and len(authorized_ips) != 0:
+    if not get_ip_allowlist().is_allowed(source_ip):
         logging.error(f"Request coming from unauthorized IP address: {source_ip}")
         return JSONResponse(
             content={"status": "error", "message": "Unauthorized IP address"},
@@ -56,16 +245,10 @@ async def process_webhook(req: Request):
             status_code=400,
         )
 
-    # Get the body content
+    # Get the raw body content, it is read only once and used for the signature and the parsing
     try:
-        req_body_json = await req.json()
         req_body_raw = await req.body()
-        logging.info(f"Body Size: {len(bytes(str(req_body_json), 'utf-8'))} bytes")
-    except ValueError:
-        logging.error("Missing body.")
-        return JSONResponse(
-            content={"status": "error", "message": "Missing body"}, status_code=400
-        )
+        logging.info(f"Body Size: {len(req_body_raw)} bytes")
     except Exception as e:
         logging.error(f"Unknown error with the request body: {e}")
         return JSONResponse(
@@ -76,13 +259,29 @@ async def process_webhook(req: Request):
             status_code=400,
         )
 
+    if not req_body_raw:
+        logging.error("Missing body.")
+        return JSONResponse(
+            content={"status": "error", "message": "Missing body"}, status_code=400
+        )
+
     # Verify if the signature is valid
-    if not is_valid_signature_for_string_body(req_body_raw, signature, SIGNING_KEY):
+    if not is_valid_signature_for_string_body(
+        req_body_raw, signature, SIGNING_KEY_BYTES
+    ):
         logging.error("The signature is invalid.")
         return JSONResponse(
             content={"status": "error", "message": "Invalid signature"}, status_code=401
         )
 
+    try:
+        req_body_json = parse_body(req_body_raw)
+    except ValueError:
+        logging.error("The body is not valid JSON.")
+        return JSONResponse(
+            content={"status": "error", "message": "Missing body"}, status_code=400
+        )
+
     # Verify is there is a body to the request
     if not req_body_json:
         logging.error("Missing body.")
@@ -90,35 +289,73 @@ async def process_webhook(req: Request):
             content={"status": "error", "message": "Missing body"}, status_code=400
         )
 
-    # Loop through received transactions and send a message to RabbitMQ for each transaction
+    # Create a message for each unique transaction of the block and send them to RabbitMQ
     try:
-        logs = req_body_json["event"]["data"]["block"]["logs"]
-        # Create a list of unique transaction hash
-        transactions = set([log["transaction"]["hash"] for log in logs])
-        connection = await connect(Config.get_rabbitmq_connection_string())
-        async with connection:
-            channel = await connection.channel()
-            queue = await channel.declare_queue(
-                Config.get_rabbitmq_queue_name(), durable=True
+        block = get_block(req_body_json, LOG_FILTER)
+        if not block["transactions"]:
+            logging.info(
+                f"No transaction of block {block['number']} can contain a sale."
+            )
+            return JSONResponse(
+                content={"status": "success", "message": "No transaction to send"},
+                status_code=200,
+            )
+
+        # Skip the transactions that were already sent for this block
+        transactions_seen = get_seen_set()
+        if transactions_seen is not None:
+            block["transactions"] = await transactions_seen.filter_unseen(
+                block["number"], block["transactions"]
             )
+            if not block["transactions"]:
+                logging.info(
+                    f"All transactions of block {block['number']} were already sent."
+                )
+                return JSONResponse(
+                    content={
+                        "status": "success",
+                        "message": "Transactions were already sent",
+                    },
+                    status_code=200,
+                )
+
+        transactions = block["transactions"]
+        if MESSAGE_FORMAT == "block":
+            messages = create_block_message(block)
+        else:
+            messages = create_transaction_messages(block)
 
-            for transaction in transactions:
-                # Create a message for each transaction
-                message_body = {
-                    "blockNumber": req_body_json["event"]["data"]["block"]["number"],
-                    "transactionHash": transaction,
-                    "blockTimestamp": req_body_json["event"]["data"]["block"][
-                        "timestamp"
-                    ],
-                }
-
-                # Send the message to RabbitMQ
-                await channel.default_exchange.publish(
-                    Message(json.dumps(message_body).encode("utf-8")),
-                    routing_key=queue.name,
+        if webhook_buffer is not None:
+            # Fast-ack mode, the messages are sent to RabbitMQ in the background
+            if not webhook_buffer.put(messages):
+                return JSONResponse(
+                    content={"status": "error", "message": "Webhook buffer is full"},
+                    status_code=503,
                 )
 
-                logging.info(f"Sent message for transaction: {transaction}")
+            if transactions_seen is not None:
+                await transactions_seen.mark_seen(block["number"], transactions)
+
+            logging.info(
+                f"Buffered {len(messages)} messages for block {block['number']}: {transactions}"
+            )
+            return JSONResponse(
+                content={
+                    "status": "success",
+                    "message": "Messages buffered successfully",
+                },
+                status_code=200,
+            )
+
+        # Send all the messages of the block at once and wait until RabbitMQ confirmed all of them
+        await publish_or_spool(messages)
+
+        if transactions_seen is not None:
+            await transactions_seen.mark_seen(block["number"], transactions)
+
+        logging.info(
+            f"Sent {len(messages)} messages for block {block['number']}: {transactions}"
+        )
     except KeyError as k:
         logging.critical(f"Error while creating the message: Key {k} doesn't exist.")
         return JSONResponse(
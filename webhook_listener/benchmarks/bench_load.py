@@ -0,0 +1,210 @@
+"""
+Load test of the webhook listener with recorded Alchemy payloads.
+
+The recorded payloads in benchmarks/payloads are replayed against app.py in-process, correctly signed,
+with their logs expanded to each requested size. RabbitMQ is replaced by an in-memory stand-in
+that confirms every message after --broker-latency-ms. It reports the p50/p99 latency,
+the requests per second and the messages per second for each payload size.
+
+Usage: python benchmarks/bench_load.py [--requests 500] [--concurrency 20] [--logs 1 10 100 1000]
+                                       [--broker-latency-ms 1] [--fast-ack] [--message-format block]
+"""
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIRECTORY = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIRECTORY.parent))
+
+os.environ.setdefault("SIGNING_KEY", "benchmark_signing_key")
+os.environ.setdefault("AUTHORIZED_IPS", "[]")
+os.environ.setdefault("RABBITMQ_HOST", "localhost")
+os.environ.setdefault("RABBITMQ_PORT", "5672")
+os.environ.setdefault("RABBITMQ_USER", "benchmark")
+os.environ.setdefault("RABBITMQ_PASSWORD", "benchmark")
+os.environ.setdefault("RABBITMQ_QUEUE_NAME", "benchmark_sales")
+
+
+class InMemoryExchange:
+    def __init__(self, broker: "InMemoryBroker"):
+        self.__broker = broker
+
+    async def publish(self, message, routing_key: str) -> None:
+        # The confirm arrives after the simulated broker latency.
+        await asyncio.sleep(self.__broker.latency)
+        self.__broker.messages += 1
+
+
+class InMemoryChannel:
+    def __init__(self, broker: "InMemoryBroker"):
+        self.default_exchange = InMemoryExchange(broker)
+        self.is_closed = False
+
+    async def declare_queue(self, name: str, durable: bool = False) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+class InMemoryBroker:
+    """
+    Stand-in for the robust AMQP connection used by the publisher.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+        self.is_closed = False
+
+    async def channel(self, publisher_confirms: bool = True) -> InMemoryChannel:
+        return InMemoryChannel(self)
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+def load_payloads() -> list[dict]:
+    return [
+        json.loads(path.read_text())
+        for path in sorted((BENCHMARKS_DIRECTORY / "payloads").glob("*.json"))
+    ]
+
+
+def create_requests(
+    payloads: list[dict], log_count: int, request_count: int, signing_key: bytes
+) -> list[tuple[bytes, dict]]:
+    """
+    Creates signed request bodies from the recorded payloads, with log_count logs each.
+    Every request has its own transaction hashes so none of them is de-duplicated.
+    """
+    requests = []
+    for i in range(request_count):
+        payload = copy.deepcopy(payloads[i % len(payloads)])
+        block = payload["event"]["data"]["block"]
+        recorded_logs = block["logs"]
+        block["number"] += i
+        block["logs"] = [
+            {
+                **recorded_logs[j % len(recorded_logs)],
+                "transaction": {"hash": f"0x{log_count:016x}{i:024x}{j:024x}"},
+            }
+            for j in range(log_count)
+        ]
+
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        signature = hmac.new(
+            signing_key, msg=body, digestmod=hashlib.sha256
+        ).hexdigest()
+        requests.append(
+            (
+                body,
+                {
+                    "content-type": "application/json",
+                    "x-alchemy-signature": signature,
+                    "x-forwarded-for": "127.0.0.1",
+                },
+            )
+        )
+    return requests
+
+
+async def run_load(client, requests: list, concurrency: int) -> tuple[list, float]:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(body: bytes, headers: dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            response = await client.post("/webhook", content=body, headers=headers)
+            latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[send(body, headers) for body, headers in requests])
+    elapsed = time.perf_counter() - start_time
+
+    if errors:
+        print(f"  {errors} requests did not return 200.")
+    return latencies, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--logs", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--broker-latency-ms", type=float, default=1)
+    parser.add_argument("--fast-ack", action="store_true")
+    parser.add_argument(
+        "--message-format", choices=["transaction", "block"], default="transaction"
+    )
+    args = parser.parse_args()
+
+    os.environ["WEBHOOK_FAST_ACK"] = "true" if args.fast_ack else "false"
+    os.environ["WEBHOOK_BUFFER_SIZE"] = str(max(args.requests, 1000))
+    os.environ["MESSAGE_FORMAT"] = args.message_format
+
+    import httpx
+    import publisher
+    import app as webhook_app
+
+    # The app logs every request, which would dominate the measurements.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    broker = InMemoryBroker(args.broker_latency_ms / 1000)
+
+    async def connect_robust(url):
+        return broker
+
+    publisher.connect_robust = connect_robust
+
+    signing_key = bytes(os.environ["SIGNING_KEY"], "utf-8")
+    payloads = load_payloads()
+
+    print(
+        f"{'logs':>6} {'p50 (ms)':>9} {'p99 (ms)':>9} {'requests/s':>11} {'messages/s':>11}"
+    )
+    async with webhook_app.app.router.lifespan_context(webhook_app.app):
+        transport = httpx.ASGITransport(app=webhook_app.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            for log_count in args.logs:
+                requests = create_requests(
+                    payloads, log_count, args.requests, signing_key
+                )
+
+                messages_before = broker.messages
+                start_time = time.perf_counter()
+                latencies, elapsed = await run_load(client, requests, args.concurrency)
+                if args.fast_ack:
+                    # The messages are counted once the buffer is drained to the broker.
+                    while webhook_app.webhook_buffer.size() > 0:
+                        await asyncio.sleep(0.001)
+                    messages_elapsed = time.perf_counter() - start_time
+                else:
+                    messages_elapsed = elapsed
+
+                quantiles = statistics.quantiles(latencies, n=100)
+                print(
+                    f"{log_count:>6} {quantiles[49] * 1000:>9.2f} {quantiles[98] * 1000:>9.2f}"
+                    f" {len(requests) / elapsed:>11.1f} {(broker.messages - messages_before) / messages_elapsed:>11.1f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark of the webhook body handling against the payload size.
+
+It compares the previous handling (json parse, re-serialization to log the size and set of hashes)
+with the current one (HMAC on the raw bytes, single orjson parse and extraction of the hashes).
+
+Usage: python benchmarks/bench_payload.py [--repeat 200]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SIGNING_KEY", "benchmark_signing_key")
+
+from payload import parse_body, get_block, create_transaction_messages  # noqa: E402
+
+SIGNING_KEY = bytes(os.environ["SIGNING_KEY"], "utf-8")
+LOG_COUNTS = [1, 10, 100, 1000, 5000]
+
+
+def create_payload(log_count: int) -> bytes:
+    """
+    Creates an Alchemy payload with log_count logs, two logs per transaction like a marketplace sale.
+    """
+    logs = [
+        {
+            "topics": [
+                "0x968d1942d9971cb9c45c722957d854c38f327206399d12ae49ca2f9c5dd06fda"
+            ],
+            "account": {"address": "0xfff9ce5f71ca6178d3beecedb61e7eff1602950e"},
+            "transaction": {"hash": f"0x{i // 2:064x}"},
+        }
+        for i in range(log_count)
+    ]
+    body = {
+        "webhookId": "wh_kpy9f3j05p4b3hh8",
+        "id": "whevt_fjlzk3zu8uq1p0q1",
+        "createdAt": "2025-04-10T19:20:21.997Z",
+        "type": "GRAPHQL",
+        "event": {
+            "data": {
+                "block": {
+                    "hash": "0xf95b5c3227fc15c4c882f8287b490b99e629dc31dd015da2b7a9d6d4b0ee0f93",
+                    "number": 44153279,
+                    "timestamp": 1744312821,
+                    "logs": logs,
+                }
+            },
+            "sequenceNumber": "10000000000632266001",
+            "network": "RONIN_MAINNET",
+        },
+    }
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def previous_handling(body: bytes, signature: str) -> list[bytes]:
+    body_json = json.loads(body)
+    len(bytes(str(body_json), "utf-8"))
+    digest = hmac.new(SIGNING_KEY, msg=body, digestmod=hashlib.sha256).hexdigest()
+    assert signature == digest
+    block = body_json["event"]["data"]["block"]
+    transactions = set([log["transaction"]["hash"] for log in block["logs"]])
+    return [
+        json.dumps(
+            {
+                "blockNumber": block["number"],
+                "transactionHash": transaction,
+                "blockTimestamp": block["timestamp"],
+            }
+        ).encode("utf-8")
+        for transaction in transactions
+    ]
+
+
+def current_handling(body: bytes, signature: str) -> list[bytes]:
+    len(body)
+    digest = hmac.new(SIGNING_KEY, msg=body, digestmod=hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(signature, digest)
+    return create_transaction_messages(get_block(parse_body(body)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        f"{'logs':>6} {'size (KB)':>10} {'previous (us)':>14} {'current (us)':>13} {'speedup':>8}"
+    )
+    for log_count in LOG_COUNTS:
+        body = create_payload(log_count)
+        signature = hmac.new(
+            SIGNING_KEY, msg=body, digestmod=hashlib.sha256
+        ).hexdigest()
+
+        previous = min(
+            timeit.repeat(
+                lambda: previous_handling(body, signature), number=1, repeat=args.repeat
+            )
+        )
+        current = min(
+            timeit.repeat(
+                lambda: current_handling(body, signature), number=1, repeat=args.repeat
+            )
+        )
+        print(
+            f"{log_count:>6} {len(body) / 1024:>10.1f} {previous * 1e6:>14.1f} {current * 1e6:>13.1f} {previous / current:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
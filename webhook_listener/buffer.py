@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from publisher import RabbitMQPublisher
+from spool import Spool
+
+
+class WebhookBuffer:
+    """
+    Bounded in-process buffer used by the fast-ack mode.
+    The webhook puts the messages of a block in the buffer and returns right away,
+    a background task drains the buffer to RabbitMQ.
+    If a spool is given, a block that can't be sent is written to the spool instead of being retried.
+    """
+
+    def __init__(
+        self,
+        publisher: RabbitMQPublisher,
+        max_size: int = 1000,
+        retry_delay: float = 1,
+        max_retry_delay: float = 30,
+        spool: Spool | None = None,
+    ):
+        self.__publisher = publisher
+        self.__spool = spool
+        self.__queue: asyncio.Queue[list[bytes]] = asyncio.Queue(maxsize=max_size)
+        self.__retry_delay = retry_delay
+        self.__max_retry_delay = max_retry_delay
+        self.__drain_task: asyncio.Task | None = None
+        # The block taken from the buffer by the background task and not sent yet.
+        self.__sending: list[bytes] | None = None
+
+    def put(self, messages: list[bytes]) -> bool:
+        """
+        Adds the messages of a block to the buffer.
+        Returns False if the buffer is full so the caller can apply backpressure.
+        """
+        try:
+            self.__queue.put_nowait(messages)
+            return True
+        except asyncio.QueueFull:
+            logging.warning(
+                f"[put] Webhook buffer is full ({self.__queue.maxsize} blocks)."
+            )
+            return False
+
+    def size(self) -> int:
+        return self.__queue.qsize()
+
+    def start(self) -> None:
+        """
+        Starts the background task draining the buffer to RabbitMQ.
+        """
+        if self.__drain_task is None or self.__drain_task.done():
+            self.__drain_task = asyncio.create_task(self.__drain())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        Waits for the buffer to be drained, up to timeout seconds, then stops the background task.
+        The webhook already acknowledged the blocks left in the buffer, so they are written to the spool,
+        or logged if they can't be, instead of being dropped silently.
+        """
+        if self.__drain_task is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.__queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.error(
+                f"[stop] {self.__queue.qsize()} blocks were still in the webhook buffer after {timeout} seconds."
+            )
+
+        self.__drain_task.cancel()
+        try:
+            await self.__drain_task
+        except asyncio.CancelledError:
+            pass
+        self.__drain_task = None
+
+        remaining_blocks = [] if self.__sending is None else [self.__sending]
+        self.__sending = None
+        while not self.__queue.empty():
+            remaining_blocks.append(self.__queue.get_nowait())
+            self.__queue.task_done()
+
+        for messages in remaining_blocks:
+            if self.__spool is not None:
+                try:
+                    await self.__spool.append(messages)
+                    logging.info(
+                        f"[stop] Wrote a block of {len(messages)} messages left in the webhook buffer to the spool."
+                    )
+                    continue
+                except Exception as e:
+                    logging.error(
+                        f"[stop] Error while writing {len(messages)} messages to the spool: {e}"
+                    )
+            logging.error(
+                f"[stop] Dropped a block of {len(messages)} messages that was not sent to RabbitMQ: {[message.decode('utf-8') for message in messages]}"
+            )
+
+    async def __drain(self) -> None:
+        while True:
+            messages = await self.__queue.get()
+            self.__sending = messages
+            retry_delay = self.__retry_delay
+
+            # A block is retried until RabbitMQ confirms it or it is spooled, it is never dropped from the buffer.
+            while True:
+                try:
+                    await self.__publisher.publish_batch(messages)
+                    break
+                except Exception as e:
+                    if self.__spool is not None:
+                        logging.warning(
+                            f"[__drain] Error while sending {len(messages)} messages to RabbitMQ, writing them to the spool: {e}"
+                        )
+                        try:
+                            await self.__spool.append(messages)
+                            break
+                        except Exception as spool_error:
+                            logging.error(
+                                f"[__drain] Error while writing {len(messages)} messages to the spool: {spool_error}"
+                            )
+
+                    logging.error(
+                        f"[__drain] Error while sending {len(messages)} messages to RabbitMQ, retrying in {retry_delay} seconds: {e}"
+                    )
+                    await asyncio.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, self.__max_retry_delay)
+
+            self.__sending = None
+            self.__queue.task_done()
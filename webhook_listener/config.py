@@ -1,11 +1,51 @@
 import logging
 import os
+from payload import (
+    AXIE_PROXY_CONTRACT_ADDRESS,
+    WETH_CONTRACT_ADDRESS,
+    TRANSFER_EVENT_TOPIC,
+)
+
+
+def get_int_env(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.critical(f"{name} is not a valid integer.")
+        raise ValueError(f"{name} environment variable must be an integer.")
+
+
+def get_bool_env(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("true", "1", "yes")
+
+
+def get_list_env(name: str, default: list[str]) -> list[str]:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return [item.strip() for item in value.strip("[]").split(",") if item.strip()]
 
 
 class Config:
     @staticmethod
     def get_authorized_ips() -> list[str]:
-        authorized_ips = os.getenv("AUTHORIZED_IPS")
+        authorized_ips_file = os.getenv("AUTHORIZED_IPS_FILE")
+        if authorized_ips_file:
+            # The file can be changed without restarting the app, it is read again on SIGHUP.
+            with open(authorized_ips_file) as f:
+                authorized_ips = f.read().replace("\n", ",")
+            # An empty file, often one being written, would allow every IP. It is rejected so a reload keeps the current allowlist.
+            if not authorized_ips.strip("[], \t\r"):
+                logging.critical(f"AUTHORIZED_IPS_FILE {authorized_ips_file} is empty.")
+                raise ValueError(f"AUTHORIZED_IPS_FILE {authorized_ips_file} is empty.")
+        else:
+            authorized_ips = os.getenv("AUTHORIZED_IPS")
         if not authorized_ips:
             logging.critical("AUTHORIZED_IPS is not set.")
             raise ValueError("AUTHORIZED_IPS environment variable is required.")
@@ -17,6 +57,16 @@ class Config:
                 "AUTHORIZED_IPS environment variable must be a valid list."
             )
 
+    @staticmethod
+    def get_trusted_proxy_count() -> int:
+        trusted_proxy_count = get_int_env("TRUSTED_PROXY_COUNT", 1)
+        if trusted_proxy_count < 0:
+            logging.critical("TRUSTED_PROXY_COUNT is negative.")
+            raise ValueError(
+                "TRUSTED_PROXY_COUNT environment variable must be 0 or more."
+            )
+        return trusted_proxy_count
+
     @staticmethod
     def get_signing_key() -> str:
         signing_key = os.getenv("SIGNING_KEY")
@@ -45,3 +95,87 @@ class Config:
             logging.critical("RABBITMQ_QUEUE_NAME is not set.")
             raise ValueError("RABBITMQ_QUEUE_NAME environment variable is required.")
         return queue_name
+
+    @staticmethod
+    def get_rabbitmq_channel_pool_size() -> int:
+        return get_int_env("RABBITMQ_CHANNEL_POOL_SIZE", 4)
+
+    @staticmethod
+    def get_rabbitmq_publish_timeout() -> int:
+        return get_int_env("RABBITMQ_PUBLISH_TIMEOUT", 10)
+
+    @staticmethod
+    def get_fast_ack_enabled() -> bool:
+        return get_bool_env("WEBHOOK_FAST_ACK", False)
+
+    @staticmethod
+    def get_buffer_size() -> int:
+        return get_int_env("WEBHOOK_BUFFER_SIZE", 1000)
+
+    @staticmethod
+    def get_dedup_mode() -> str:
+        dedup_mode = os.getenv("DEDUP_MODE", "memory").strip().lower()
+        if dedup_mode not in ("memory", "redis", "none"):
+            logging.critical(f"DEDUP_MODE {dedup_mode} is not supported.")
+            raise ValueError(
+                "DEDUP_MODE environment variable must be memory, redis or none."
+            )
+        return dedup_mode
+
+    @staticmethod
+    def get_dedup_ttl() -> int:
+        return get_int_env("DEDUP_TTL", 3600)
+
+    @staticmethod
+    def get_dedup_max_size() -> int:
+        return get_int_env("DEDUP_MAX_SIZE", 100000)
+
+    @staticmethod
+    def get_redis_url() -> str:
+        redis_url = os.getenv("REDIS_URL")
+        if not redis_url:
+            logging.critical("REDIS_URL is not set.")
+            raise ValueError("REDIS_URL environment variable is required.")
+        return redis_url
+
+    @staticmethod
+    def get_spool_directory() -> str | None:
+        # The spool is disabled when SPOOL_DIRECTORY is not set.
+        return os.getenv("SPOOL_DIRECTORY") or None
+
+    @staticmethod
+    def get_spool_segment_size() -> int:
+        return get_int_env("SPOOL_SEGMENT_SIZE", 16 * 1024 * 1024)
+
+    @staticmethod
+    def get_spool_fsync_interval_ms() -> int:
+        return get_int_env("SPOOL_FSYNC_INTERVAL_MS", 50)
+
+    @staticmethod
+    def get_spool_replay_interval() -> int:
+        return get_int_env("SPOOL_REPLAY_INTERVAL", 5)
+
+    @staticmethod
+    def get_log_filter_enabled() -> bool:
+        return get_bool_env("LOG_FILTER_ENABLED", False)
+
+    @staticmethod
+    def get_log_filter_addresses() -> list[str]:
+        return get_list_env(
+            "LOG_FILTER_ADDRESSES",
+            [AXIE_PROXY_CONTRACT_ADDRESS, WETH_CONTRACT_ADDRESS],
+        )
+
+    @staticmethod
+    def get_log_filter_topics() -> list[str]:
+        return get_list_env("LOG_FILTER_TOPICS", [TRANSFER_EVENT_TOPIC])
+
+    @staticmethod
+    def get_message_format() -> str:
+        message_format = os.getenv("MESSAGE_FORMAT", "transaction").strip().lower()
+        if message_format not in ("transaction", "block"):
+            logging.critical(f"MESSAGE_FORMAT {message_format} is not supported.")
+            raise ValueError(
+                "MESSAGE_FORMAT environment variable must be transaction or block."
+            )
+        return message_format
@@ -0,0 +1,110 @@
+import logging
+import time
+from collections import OrderedDict
+from redis import asyncio as aioredis
+
+
+class MemorySeenSet:
+    """
+    In-process set of the (blockNumber, transactionHash) pairs already sent to RabbitMQ.
+    Entries expire after ttl seconds and the oldest entries are evicted once max_size is reached.
+    """
+
+    def __init__(self, max_size: int = 100000, ttl: float = 3600):
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__entries: OrderedDict[tuple[int, str], float] = OrderedDict()
+
+    async def filter_unseen(self, block_number: int, transactions: list[str]) -> list:
+        """
+        Returns the transactions of the block that were not sent yet.
+        """
+        now = time.monotonic()
+        unseen = []
+        for transaction in transactions:
+            expires_at = self.__entries.get((block_number, transaction))
+            if expires_at is None or expires_at <= now:
+                unseen.append(transaction)
+        return unseen
+
+    async def mark_seen(self, block_number: int, transactions: list[str]) -> None:
+        """
+        Remembers the transactions of the block once they were sent.
+        """
+        expires_at = time.monotonic() + self.__ttl
+        for transaction in transactions:
+            key = (block_number, transaction)
+            self.__entries[key] = expires_at
+            self.__entries.move_to_end(key)
+
+        # Entries are ordered by expiration time, so expired entries are always the oldest ones.
+        now = time.monotonic()
+        while self.__entries and (
+            len(self.__entries) > self.__max_size
+            or next(iter(self.__entries.values())) <= now
+        ):
+            self.__entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self.__entries)
+
+    async def close(self) -> None:
+        self.__entries.clear()
+
+
+class RedisSeenSet:
+    """
+    Redis-backed set of the (blockNumber, transactionHash) pairs already sent to RabbitMQ,
+    shared by every replica of the webhook listener. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, redis_url: str, ttl: float = 3600, key_prefix: str = "seen"):
+        self.__redis = aioredis.from_url(redis_url)
+        self.__ttl = int(ttl)
+        self.__key_prefix = key_prefix
+
+    def __key(self, block_number: int, transaction: str) -> str:
+        return f"{self.__key_prefix}:{block_number}:{transaction}"
+
+    async def filter_unseen(self, block_number: int, transactions: list[str]) -> list:
+        """
+        Returns the transactions of the block that were not sent yet.
+        If Redis can't be reached, every transaction is considered unseen.
+        """
+        if not transactions:
+            return []
+
+        try:
+            seen = await self.__redis.mget(
+                [self.__key(block_number, transaction) for transaction in transactions]
+            )
+        except Exception as e:
+            logging.warning(
+                f"[filter_unseen] Could not read the seen transactions from Redis, sending all of them: {e}"
+            )
+            return list(transactions)
+
+        return [
+            transaction
+            for transaction, is_seen in zip(transactions, seen)
+            if is_seen is None
+        ]
+
+    async def mark_seen(self, block_number: int, transactions: list[str]) -> None:
+        """
+        Remembers the transactions of the block once they were sent.
+        """
+        try:
+            async with self.__redis.pipeline(transaction=False) as pipeline:
+                for transaction in transactions:
+                    pipeline.set(
+                        self.__key(block_number, transaction), 1, ex=self.__ttl
+                    )
+                await pipeline.execute()
+        except Exception as e:
+            logging.warning(
+                f"[mark_seen] Could not write the seen transactions to Redis: {e}"
+            )
+
+    async def close(self) -> None:
+        await self.__redis.aclose()
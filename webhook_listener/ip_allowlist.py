@@ -0,0 +1,99 @@
+import ipaddress
+import logging
+
+
+class IPAllowlist:
+    """
+    Allowlist of IP addresses and CIDR ranges, compiled once for fast lookups.
+    Each entry is stored as an integer network address grouped by IP version and prefix length,
+    so a lookup is one set membership test per distinct prefix length.
+    An empty allowlist allows every IP address.
+    """
+
+    def __init__(self, entries: list[str]):
+        # {(version, prefix length): {network address as an integer}}
+        self.__networks: dict[tuple[int, int], set[int]] = {}
+        self.__size = 0
+
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logging.critical(f"{entry} is not a valid IP address or CIDR range.")
+                raise ValueError(
+                    f"Authorized IP {entry} is not a valid IP address or CIDR range."
+                )
+
+            key = (network.version, network.prefixlen)
+            self.__networks.setdefault(key, set()).add(int(network.network_address))
+            self.__size += 1
+
+        # Masks are precomputed for each prefix length present in the allowlist.
+        self.__masks = [
+            (
+                version,
+                self.__mask(version, prefix_length),
+                self.__networks[(version, prefix_length)],
+            )
+            for version, prefix_length in self.__networks
+        ]
+
+    @staticmethod
+    def __mask(version: int, prefix_length: int) -> int:
+        max_length = 32 if version == 4 else 128
+        return ((1 << prefix_length) - 1) << (max_length - prefix_length)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def is_allowed(self, ip: str | None) -> bool:
+        """
+        Returns True if the IP address is in one of the allowlist entries.
+        """
+        if self.__size == 0:
+            return True
+        if not ip:
+            return False
+
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except ValueError:
+            return False
+
+        # IPv4 addresses mapped in IPv6 are compared as IPv4 addresses.
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        address_int = int(address)
+        for version, mask, networks in self.__masks:
+            if version == address.version and (address_int & mask) in networks:
+                return True
+        return False
+
+
+def get_client_ip(
+    forwarded_for: str | None,
+    trusted_proxy_count: int = 1,
+    peer_ip: str | None = None,
+) -> str | None:
+    """
+    Returns the client IP address from the x-forwarded-for header.
+    Each proxy appends the address it received the request from, so the client is the entry
+    added by the outermost trusted proxy, trusted_proxy_count entries from the right.
+    Entries further left are set by the client and can't be trusted.
+    Without a trusted proxy, the whole header is set by the client and the peer address is returned.
+    """
+    if trusted_proxy_count < 1:
+        return peer_ip
+
+    if not forwarded_for:
+        return None
+
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    if not hops:
+        return None
+
+    return hops[max(len(hops) - trusted_proxy_count, 0)]
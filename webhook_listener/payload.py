@@ -0,0 +1,83 @@
+import orjson
+
+# Contracts and event of the logs a sale always contains, also hardcoded in store_sales/transaction.py.
+AXIE_PROXY_CONTRACT_ADDRESS = "0x32950db2a7164ae833121501c797d79e7b79d74c"
+WETH_CONTRACT_ADDRESS = "0xc99a6a985ed2cac1ef41640596c5a5f9f4e19ef5"
+TRANSFER_EVENT_TOPIC = (
+    "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+)
+
+
+class LogFilter:
+    """
+    Matches the logs emitted by one of the contract addresses with one of the topic0 signatures.
+    A transaction is only sent if one of its logs matches, the others can't contain a sale.
+    """
+
+    def __init__(self, addresses: list[str], topics: list[str]):
+        self.__addresses = frozenset(address.strip().lower() for address in addresses)
+        self.__topics = frozenset(topic.strip().lower() for topic in topics)
+
+    def matches(self, log: dict) -> bool:
+        topics = log.get("topics")
+        return (
+            bool(topics)
+            and log["account"]["address"].lower() in self.__addresses
+            and topics[0].lower() in self.__topics
+        )
+
+
+def parse_body(body: bytes) -> dict:
+    """
+    Parses the raw request body. orjson reads the bytes directly, without decoding them to a string first.
+    """
+    return orjson.loads(body)
+
+
+def get_block(body_json: dict, log_filter: LogFilter | None = None) -> dict:
+    """
+    Extracts the block number, the block timestamp and the unique transaction hashes from an Alchemy payload.
+    Only the transaction hash of each log is read, plus its address and topics if a log filter is given.
+    """
+    block = body_json["event"]["data"]["block"]
+    logs = block["logs"]
+    if log_filter is not None:
+        logs = [log for log in logs if log_filter.matches(log)]
+
+    return {
+        "number": block["number"],
+        "timestamp": block["timestamp"],
+        # dict.fromkeys removes the duplicates while keeping the order of the logs.
+        "transactions": list(dict.fromkeys(log["transaction"]["hash"] for log in logs)),
+    }
+
+
+def create_transaction_messages(block: dict) -> list[bytes]:
+    """
+    Creates the message body of each transaction of the block.
+    """
+    return [
+        orjson.dumps(
+            {
+                "blockNumber": block["number"],
+                "transactionHash": transaction,
+                "blockTimestamp": block["timestamp"],
+            }
+        )
+        for transaction in block["transactions"]
+    ]
+
+
+def create_block_message(block: dict) -> list[bytes]:
+    """
+    Creates one message with every transaction of the block.
+    """
+    return [
+        orjson.dumps(
+            {
+                "blockNumber": block["number"],
+                "transactionHashes": block["transactions"],
+                "blockTimestamp": block["timestamp"],
+            }
+        )
+    ]
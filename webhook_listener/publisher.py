@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from aio_pika import DeliveryMode, Message, connect_robust
+from aio_pika.abc import AbstractRobustChannel, AbstractRobustConnection
+from aio_pika.pool import Pool
+
+
+class RabbitMQPublisher:
+    """
+    Long-lived RabbitMQ publisher shared by every request handled by the app.
+    It keeps one auto-reconnecting connection and a small pool of channels open for the app's lifetime.
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        queue_name: str,
+        channel_pool_size: int = 4,
+        publish_timeout: float = 10,
+    ):
+        self.__connection_string = connection_string
+        self.__queue_name = queue_name
+        self.__channel_pool_size = channel_pool_size
+        self.__publish_timeout = publish_timeout
+        self.__connection: AbstractRobustConnection | None = None
+        self.__channel_pool: Pool | None = None
+        self.__lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        """
+        Opens the connection, declares the queue and creates the channel pool.
+        Calling it again once connected does nothing.
+        """
+        if self.__connection is not None:
+            return
+
+        async with self.__lock:
+            if self.__connection is not None:
+                return
+
+            logging.info("[connect] Opening RabbitMQ connection...")
+            connection = await connect_robust(self.__connection_string)
+
+            # Declare the queue once for the lifetime of the connection.
+            channel = await connection.channel()
+            await channel.declare_queue(self.__queue_name, durable=True)
+            await channel.close()
+
+            self.__channel_pool = Pool(
+                self.__create_channel, max_size=self.__channel_pool_size
+            )
+            self.__connection = connection
+            logging.info(
+                f"[connect] RabbitMQ connection opened with a pool of {self.__channel_pool_size} channels."
+            )
+
+    async def close(self) -> None:
+        """
+        Closes the channel pool and the connection.
+        """
+        async with self.__lock:
+            if self.__channel_pool is not None:
+                await self.__channel_pool.close()
+                self.__channel_pool = None
+            if self.__connection is not None:
+                await self.__connection.close()
+                self.__connection = None
+            logging.info("[close] RabbitMQ connection closed.")
+
+    async def __create_channel(self) -> AbstractRobustChannel:
+        # Publisher confirms let publish_batch know when the broker has taken the messages.
+        return await self.__connection.channel(publisher_confirms=True)
+
+    def is_healthy(self) -> bool:
+        """
+        Returns True if the connection is open. The robust connection reconnects on its own when it is lost.
+        """
+        return self.__connection is not None and not self.__connection.is_closed
+
+    async def publish(self, body: bytes) -> None:
+        """
+        Publishes a single message to the queue and waits for the broker to confirm it.
+        """
+        await self.publish_batch([body])
+
+    async def publish_batch(self, bodies: list[bytes]) -> None:
+        """
+        Publishes all messages on one channel without waiting between them, then waits for every confirm.
+        Raises if the broker rejects any message of the batch or doesn't confirm it within the publish timeout.
+        """
+        if not bodies:
+            return
+
+        await self.connect()
+
+        async with self.__channel_pool.acquire() as channel:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    *[
+                        channel.default_exchange.publish(
+                            Message(body, delivery_mode=DeliveryMode.PERSISTENT),
+                            routing_key=self.__queue_name,
+                        )
+                        for body in bodies
+                    ]
+                ),
+                timeout=self.__publish_timeout,
+            )
+
+        logging.info(f"[publish_batch] {len(bodies)} messages confirmed by RabbitMQ.")
@@ -0,0 +1,292 @@
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import time
+import uuid
+import zlib
+import orjson
+from pathlib import Path
+from publisher import RabbitMQPublisher
+
+# Each record is the length and the CRC32 of the payload followed by the payload.
+RECORD_HEADER = struct.Struct(">II")
+SEGMENT_SUFFIX = ".spool"
+# Held by the process writing to a spool subdirectory for as long as it is running.
+OWNER_LOCK_FILE = "owner.lock"
+
+
+class Spool:
+    """
+    Append-only on-disk spool where the webhook writes the messages of a block when RabbitMQ is unavailable.
+    Records are written to segment files, a new segment is started once the current one reaches segment_size bytes.
+    Concurrent appends share one fsync, done at most every fsync_interval seconds.
+    The writes and the fsyncs run in a thread, so the event loop keeps serving requests while the disk is slow.
+    Several workers can share the same directory: each spool writes to its own subdirectory, locked with flock,
+    and adopts the subdirectories whose owner stopped.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 16 * 1024 * 1024,
+        fsync_interval: float = 0.05,
+    ):
+        self.__root_directory = Path(directory)
+        self.__directory = self.__root_directory / f"{os.getpid()}-{uuid.uuid4().hex}"
+        self.__directory.mkdir(parents=True, exist_ok=True)
+        # The lock is released by the OS if the process dies, its subdirectory can then be adopted by another worker.
+        self.__owner_lock_file = open(self.__directory / OWNER_LOCK_FILE, "wb")
+        fcntl.flock(self.__owner_lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.__segment_size = segment_size
+        self.__fsync_interval = fsync_interval
+        self.__segment_file = None
+        self.__segment_path: Path | None = None
+        self.__pending_sync: asyncio.Future | None = None
+        # Serializes the writes, fsyncs and rolls of the current segment, which run in a thread.
+        self.__lock = asyncio.Lock()
+
+    def __segment_paths(self) -> list[Path]:
+        # Segment names are zero-padded sequence numbers, sorting them gives the write order.
+        return sorted(self.__directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def __open_segment(self) -> None:
+        segments = self.__segment_paths()
+        sequence = int(segments[-1].stem) + 1 if segments else 0
+        self.__segment_path = self.__directory / f"{sequence:012d}{SEGMENT_SUFFIX}"
+        self.__segment_file = open(self.__segment_path, "ab")
+        fcntl.flock(self.__segment_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        logging.info(f"[__open_segment] Opened spool segment {self.__segment_path}.")
+
+    def __sync(self) -> None:
+        if self.__segment_file is not None:
+            self.__segment_file.flush()
+            os.fsync(self.__segment_file.fileno())
+
+    def __close_segment(self) -> None:
+        self.__sync()
+        self.__segment_file.close()
+
+    async def roll(self) -> None:
+        """
+        Closes the current segment so it can be replayed, the next append starts a new segment.
+        """
+        async with self.__lock:
+            if self.__segment_file is None:
+                return
+
+            await asyncio.to_thread(self.__close_segment)
+            # The segment is only seen as closed once it is synced and closed.
+            self.__segment_file = None
+            self.__segment_path = None
+
+    @staticmethod
+    def __is_locked(path: Path) -> bool:
+        with open(path, "rb") as locked_file:
+            try:
+                fcntl.flock(locked_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(locked_file.fileno(), fcntl.LOCK_UN)
+            return False
+
+    def closed_segments(self) -> list[Path]:
+        """
+        Returns the segments that are not written to anymore, in write order.
+        A segment still locked by a writer is skipped.
+        """
+        return [
+            path
+            for path in self.__segment_paths()
+            if path != self.__segment_path and not self.__is_locked(path)
+        ]
+
+    def __adopt_orphans(self) -> int:
+        adopted_segments = 0
+        for directory in sorted(self.__root_directory.iterdir()):
+            if directory == self.__directory or not directory.is_dir():
+                continue
+
+            try:
+                owner_lock_file = open(directory / OWNER_LOCK_FILE, "rb")
+            except FileNotFoundError:
+                # The owner is removing its subdirectory after a clean shutdown.
+                continue
+
+            with owner_lock_file:
+                try:
+                    fcntl.flock(owner_lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # The owner is still running.
+                    continue
+
+                # The segments are moved after the ones of this spool, keeping their write order.
+                segments = self.__segment_paths()
+                sequence = int(segments[-1].stem) + 1 if segments else 0
+                for path in sorted(directory.glob(f"*{SEGMENT_SUFFIX}")):
+                    path.rename(self.__directory / f"{sequence:012d}{SEGMENT_SUFFIX}")
+                    sequence += 1
+                    adopted_segments += 1
+
+                (directory / OWNER_LOCK_FILE).unlink(missing_ok=True)
+                try:
+                    directory.rmdir()
+                except OSError as e:
+                    logging.warning(
+                        f"[__adopt_orphans] Could not remove spool directory {directory}: {e}"
+                    )
+            logging.info(
+                f"[__adopt_orphans] Adopted the spool segments of the stopped writer {directory}."
+            )
+
+        return adopted_segments
+
+    async def adopt_orphans(self) -> int:
+        """
+        Moves the segments of the subdirectories whose owner stopped, for example after a restart, to this spool
+        so they are replayed. Returns the number of segments adopted.
+        """
+        async with self.__lock:
+            return await asyncio.to_thread(self.__adopt_orphans)
+
+    def is_empty(self) -> bool:
+        return not self.__segment_paths()
+
+    async def append(self, messages: list[bytes]) -> None:
+        """
+        Writes the messages of a block to the spool and returns once they are on disk.
+        """
+        payload = orjson.dumps([message.decode("utf-8") for message in messages])
+
+        async with self.__lock:
+            if self.__segment_file is None:
+                self.__open_segment()
+            await asyncio.to_thread(
+                self.__segment_file.write,
+                RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload,
+            )
+
+        # Wait for the next fsync, the appends made in the meantime are synced together.
+        if self.__pending_sync is None or self.__pending_sync.done():
+            self.__pending_sync = asyncio.ensure_future(self.__sync_later())
+        await asyncio.shield(self.__pending_sync)
+
+        # The segment may have been rolled by the replayer while waiting for the fsync.
+        if (
+            self.__segment_file is not None
+            and self.__segment_file.tell() >= self.__segment_size
+        ):
+            await self.roll()
+
+    async def __sync_later(self) -> None:
+        await asyncio.sleep(self.__fsync_interval)
+        async with self.__lock:
+            await asyncio.to_thread(self.__sync)
+
+    async def close(self) -> None:
+        """
+        Closes the current segment and releases the subdirectory of this spool.
+        The segments not replayed yet are adopted by another worker, or by this one after a restart.
+        """
+        await self.roll()
+        if self.__owner_lock_file.closed:
+            return
+
+        if self.is_empty():
+            (self.__directory / OWNER_LOCK_FILE).unlink(missing_ok=True)
+            self.__directory.rmdir()
+        self.__owner_lock_file.close()
+
+    @staticmethod
+    def read_segment(path: Path):
+        """
+        Yields the messages of each record of a segment.
+        A record that was only partly written, because the process stopped during the write, ends the segment.
+        """
+        with open(path, "rb") as segment_file:
+            while True:
+                header = segment_file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+
+                length, checksum = RECORD_HEADER.unpack(header)
+                payload = segment_file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    logging.error(
+                        f"[read_segment] Incomplete record found in spool segment {path}, the rest of the segment is skipped."
+                    )
+                    return
+
+                yield [message.encode("utf-8") for message in orjson.loads(payload)]
+
+
+class SpoolReplayer:
+    """
+    Background task sending the spooled blocks to RabbitMQ, in the order they were written, once it is available again.
+    A segment is deleted after all its records were confirmed by RabbitMQ.
+    """
+
+    def __init__(self, spool: Spool, publisher: RabbitMQPublisher, interval: float = 5):
+        self.__spool = spool
+        self.__publisher = publisher
+        self.__interval = interval
+        self.__task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is None:
+            return
+
+        self.__task.cancel()
+        try:
+            await self.__task
+        except asyncio.CancelledError:
+            pass
+        self.__task = None
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                await self.replay()
+            except Exception as e:
+                logging.warning(
+                    f"[__run] Spool replay stopped, retrying in {self.__interval} seconds: {e}"
+                )
+            await asyncio.sleep(self.__interval)
+
+    async def replay(self) -> int:
+        """
+        Sends every spooled block to RabbitMQ and returns the number of blocks sent.
+        Raises if RabbitMQ is still unavailable, the segment is then replayed again from the start on the next try.
+        """
+        await self.__spool.adopt_orphans()
+        if self.__spool.is_empty():
+            return 0
+
+        await self.__publisher.connect()
+
+        segments = self.__spool.closed_segments()
+        if not segments:
+            # New blocks are written to a new segment while the current one is replayed.
+            await self.__spool.roll()
+            segments = self.__spool.closed_segments()
+
+        replayed_blocks = 0
+        for path in segments:
+            start_time = time.monotonic()
+            segment_blocks = 0
+            for messages in Spool.read_segment(path):
+                await self.__publisher.publish_batch(messages)
+                segment_blocks += 1
+
+            path.unlink()
+            replayed_blocks += segment_blocks
+            logging.info(
+                f"[replay] Replayed {segment_blocks} blocks from spool segment {path} in {time.monotonic() - start_time:.2f} seconds."
+            )
+
+        return replayed_blocks